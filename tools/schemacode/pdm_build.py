@@ -2,6 +2,7 @@ import sys
 
 sys.path.insert(0, "src")
 
+import bidsschematools.expressions
 import bidsschematools.schema
 from bidsschematools.types._generator import generate_module
 
@@ -24,6 +25,10 @@ def pdm_build_initialize(context):
     schema_json.parent.mkdir(parents=True, exist_ok=True)
     schema_json.write_text(schema.to_json())
 
+    # Write parsed expressions to JSON, so expressions are not parsed again at runtime
+    expressions_json = base_dir / "bidsschematools/data/expressions.json"
+    expressions_json.write_text(bidsschematools.expressions.export_expression_table(schema))
+
     # Write generated code for types
     # Limit to wheel to avoid duplication while allowing building
     # the wheel directly from source
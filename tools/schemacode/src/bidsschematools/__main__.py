@@ -1,17 +1,16 @@
 import json
 import logging
 import os
-import re
 import sys
 from itertools import chain
 from pathlib import Path
 
 import click
 
-from .rules import regexify_filename_rules
+from .rules import FilenameMatcher, regexify_all
 from .schema import load_schema
 from .utils import configure_logger, get_logger
-from .validator import _bidsignore_check
+from .validator import BidsIgnore
 
 lgr = get_logger()
 
@@ -102,8 +101,6 @@ def pre_receive_hook(schema_path: Path | None, input_: Path | str, output: Path
 
     This is intended to be used in a git pre-receive hook.
     """
-    schema = load_schema(schema_path)
-
     # Slurp inputs for now; we can think about streaming later
     if input_ == "-":
         stream = sys.stdin
@@ -139,35 +136,26 @@ def pre_receive_hook(schema_path: Path | None, input_: Path | str, output: Path
             break
         ignore.append(line.strip())
     lgr.info("Ignore patterns found: %d", len(ignore))
+    bidsignore = BidsIgnore(ignore)
 
-    all_rules = chain.from_iterable(
-        regexify_filename_rules(group, schema, level=2)
-        for group in (schema.rules.files.common, schema.rules.files.raw)
-    )
-    if dataset_type == "derivative":
-        all_rules = chain(
-            all_rules,
-            regexify_filename_rules(schema.rules.files.derivatives, schema, level=2),
-        )
+    # Regexes are cached on disk, so later invocations do not construct them again
+    all_rules, _ = regexify_all(schema_path, derivatives=dataset_type == "derivative", cache=True)
 
-    regexes = [rule["regex"] for rule in all_rules]
+    # Paths are relative to the dataset root, so rules must match from the start
+    matcher = FilenameMatcher(all_rules, prefix="")
 
     out_stream = sys.stdout if output == "-" else open(output, "w")
 
     rc = 0
     any_files = False
     valid_files = 0
+    filenames = (line.strip() for line in stream)
     with out_stream:
-        for filename in stream:
+        for filename in bidsignore.filter(name for name in filenames if not name.startswith(".")):
             if not any_files:
                 lgr.debug("Validating files, first file: %s", filename)
                 any_files = True
-            filename = filename.strip()
-            if filename.startswith(".") or any(
-                _bidsignore_check(pattern, filename, "") for pattern in ignore
-            ):
-                continue
-            if not any(re.match(regex, filename) for regex in regexes):
+            if matcher.match(filename) is None:
                 print(filename, file=out_stream)
                 rc = 1
             else:
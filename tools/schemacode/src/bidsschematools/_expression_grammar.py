@@ -0,0 +1,110 @@
+"""Reference pyparsing grammar for the BIDS schema expression language
+
+:func:`bidsschematools.expressions.parse` uses a hand-written parser, which produces
+the same syntax trees. This grammar is kept as its reference implementation, and its
+elements remain accessible as attributes of :mod:`bidsschematools.expressions`,
+importing pyparsing only on first access.
+"""
+
+from functools import partial
+
+from pyparsing import (
+    DelimitedList,
+    Forward,
+    Literal,
+    Optional,
+    StringEnd,
+    StringStart,
+    Suppress,
+    common,
+    one_of,
+    quoted_string,
+)
+
+from .expressions import Array, BinOp, Element, Function, Object, Property, RightOp
+
+orOp = Literal("||")
+andOp = Literal("&&")
+notOp = Literal("!")
+compOp = one_of(("==", "!=", "<", "<=", ">", ">=", "in"))
+addOp = one_of(("+", "-"))
+mulOp = one_of(("*", "/", "%"))
+expOp = Literal("**")
+
+lpar, rpar = Suppress("("), Suppress(")")
+lsqr, rsqr = Suppress("["), Suppress("]")
+dot = Suppress(".")
+
+# Right-associative expressions need to be recursively defined
+factor = Forward()
+notTest = Forward()
+andTest = Forward()
+test = Forward()
+
+testlist = DelimitedList(test)
+
+# Numbers and strings are base types, this could be expanded with bools and null
+# if it seems useful
+literal = common.number | quoted_string
+
+# Items are units that operations can be done on, including arithmetic, comparison,
+# function calls, index lookups and attribute lookups
+array = lsqr + Optional(testlist) + rsqr
+parenthetical = lpar + test + rpar
+# If object literals ever occur in real expressions, we'll need to define this
+obj_literal = Literal("{}")
+item = parenthetical | array | obj_literal | common.identifier | literal
+
+# Trailers are function calls, array indexes, and object attributes
+function_call = lpar + Optional(testlist) + rpar
+array_lookup = lsqr + test + rsqr
+object_lookup = dot + common.identifier
+trailer = function_call | array_lookup | object_lookup
+
+# An atom might have some lookups done, but now it can be part of an arithmetic
+# expression
+atom = item + (trailer)[...]
+
+# Arithmetic expressions
+factor <<= atom + (expOp + factor)[...]  # Right-associative
+term = factor + (mulOp + factor)[...]
+expr = term + (addOp + term)[...]
+
+# Logic expressions (tests, to avoid name collision)
+comparison = expr + (compOp + expr)[...]
+notTest <<= notOp + notTest | comparison
+andTest <<= notTest + (andOp + andTest)[...]  # Right-associative
+test <<= andTest + (orOp + test)[...]  # Right-associative
+
+# Schema expressions must parse from start to finish
+expression = StringStart() + test + StringEnd()
+
+
+array.set_parse_action(Array)
+obj_literal.set_parse_action(Object)
+
+# Function calls and item lookups need to be constructed partially
+function_call.set_parse_action(lambda t: partial(Function, args=list(t)))
+array_lookup.set_parse_action(lambda t: partial(Element, index=t[0]))
+object_lookup.set_parse_action(lambda t: partial(Property, field=t[0]))
+
+
+# Once the atom is complete, we can build the left-associative tree by completing application
+def atomize(tokens):
+    item = tokens.pop(0)
+    for trailer in tokens:
+        item = trailer(item)
+    return item
+
+
+atom.set_parse_action(atomize)
+
+# Arithmetic expressions can all be degenerate, so use maybe to pass through
+factor.set_parse_action(BinOp.maybe)
+term.set_parse_action(BinOp.maybe)
+expr.set_parse_action(BinOp.maybe)
+
+comparison.set_parse_action(BinOp.maybe)
+notTest.set_parse_action(RightOp.maybe)
+andTest.set_parse_action(BinOp.maybe)
+test.set_parse_action(BinOp.maybe)
@@ -1,6 +1,7 @@
+import json
 import logging
 import tempfile
-from collections.abc import Generator
+from collections.abc import Generator, Mapping
 from pathlib import Path
 from subprocess import run
 
@@ -34,6 +35,36 @@ BIDS_ERROR_SELECTION = [
 ]
 
 
+def write_tree(root, files):
+    """Write a tree of files, creating directories as needed
+
+    Parameters
+    ----------
+    root : str or os.PathLike
+        The directory to write files to.
+    files : Mapping or iterable of str
+        The contents of files by path, relative to `root`, as text, bytes,
+        or objects written as JSON, or paths of empty files.
+    """
+    if not isinstance(files, Mapping):
+        files = dict.fromkeys(files, "")
+    for path, content in files.items():
+        full_path = Path(root) / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, bytes):
+            full_path.write_bytes(content)
+        else:
+            full_path.write_text(content if isinstance(content, str) else json.dumps(content))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """Keep on-disk caches written by tests out of the user's cache directory"""
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("BIDSSCHEMATOOLS_CACHE_DIR", str(path))
+    return path
+
+
 @pytest.fixture(scope="session")
 def tests_data_dir():
     try:
@@ -1,22 +1,22 @@
-"""Parsing utilities for BIDS Schema expression language"""
-
-from functools import partial
-
-from pyparsing import (
-    DelimitedList,
-    Forward,
-    Literal,
-    Optional,
-    StringEnd,
-    StringStart,
-    Suppress,
-    common,
-    one_of,
-    quoted_string,
-)
+"""Parsing and evaluation utilities for BIDS Schema expression language"""
+
+from __future__ import annotations
+
+import json
+import math
+import operator
+import posixpath
+import re
+from collections.abc import Mapping, Sequence
+from functools import cache, lru_cache
+from itertools import chain
 
+from . import _lazytypes as lt
+from . import data
 
-def parse(expression_string: str) -> "ASTNode":
+
+@lru_cache(maxsize=4096)
+def parse(expression_string: str) -> ASTNode:
     """Convert a BIDS schema expression into an abstract syntax tree
 
     EBNF-ish grammar::
@@ -46,6 +46,14 @@ def parse(expression_string: str) -> "ASTNode":
         testList   :: test [ ',' test ]*
 
         expression :: ^ test $
+
+    Expressions are parsed by a recursive descent parser, which produces the same trees
+    as the reference pyparsing grammar, available as ``expressions.expression``.
+    Invalid expressions raise :class:`ValueError`.
+
+    Parsed expressions are cached, and the returned trees are shared, so they must not
+    be modified. Expressions found in the schema are read from a table generated when
+    the package is built (see :func:`expression_table`), rather than parsed.
     """
     # Alternative: (possibly with 'null' as additional literal)
     # This makes things like '1(a, b, c)' or '"string"[0]' syntax errors
@@ -54,67 +62,13 @@ def parse(expression_string: str) -> "ASTNode":
     # item    :: '(' test ')' | '[' testList '] | NAME
     # atom    :: literal | item trailer*
 
-    return expression.parse_string(expression_string)[0]
-
-
-orOp = Literal("||")
-andOp = Literal("&&")
-notOp = Literal("!")
-compOp = one_of(("==", "!=", "<", "<=", ">", ">=", "in"))
-addOp = one_of(("+", "-"))
-mulOp = one_of(("*", "/", "%"))
-expOp = Literal("**")
-
-lpar, rpar = Suppress("("), Suppress(")")
-lsqr, rsqr = Suppress("["), Suppress("]")
-dot = Suppress(".")
-
-# Right-associative expressions need to be recursively defined
-factor = Forward()
-notTest = Forward()
-andTest = Forward()
-test = Forward()
+    serialized = _bundled_expressions().get(expression_string)
+    if serialized is not None:
+        return ast_from_json(serialized)
+    return _Parser(expression_string).parse()
 
-testlist = DelimitedList(test)
 
-# Numbers and strings are base types, this could be expanded with bools and null
-# if it seems useful
-literal = common.number | quoted_string
-
-# Items are units that operations can be done on, including arithmetic, comparison,
-# function calls, index lookups and attribute lookups
-array = lsqr + Optional(testlist) + rsqr
-parenthetical = lpar + test + rpar
-# If object literals ever occur in real expressions, we'll need to define this
-obj_literal = Literal("{}")
-item = parenthetical | array | obj_literal | common.identifier | literal
-
-# Trailers are function calls, array indexes, and object attributes
-function_call = lpar + Optional(testlist) + rpar
-array_lookup = lsqr + test + rsqr
-object_lookup = dot + common.identifier
-trailer = function_call | array_lookup | object_lookup
-
-# An atom might have some lookups done, but now it can be part of an arithmetic
-# expression
-atom = item + (trailer)[...]
-
-# Arithmetic expressions
-factor <<= atom + (expOp + factor)[...]  # Right-associative
-term = factor + (mulOp + factor)[...]
-expr = term + (addOp + term)[...]
-
-# Logic expressions (tests, to avoid name collision)
-comparison = expr + (compOp + expr)[...]
-notTest <<= notOp + notTest | comparison
-andTest <<= notTest + (andOp + andTest)[...]  # Right-associative
-test <<= andTest + (orOp + test)[...]  # Right-associative
-
-# Schema expressions must parse from start to finish
-expression = StringStart() + test + StringEnd()
-
-
-# With the grammar defined, we need the following syntax elements
+# Syntax tree elements
 class ASTNode:
     """AST superclass
 
@@ -227,31 +181,871 @@ class Object(ASTNode):
         return "{}"
 
 
-array.set_parse_action(Array)
-obj_literal.set_parse_action(Object)
+# Parsing
+#
+# Tokens are matched as they are reached, with the same patterns as the reference grammar,
+# in which, for example, a sign is part of a number only where a value is expected.
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_IDENTIFIER = re.compile(r"[^\W\d]\w*")
+_FLOAT = re.compile(r"[+-]?(?:\d+(?:[eE][+-]?\d+)|(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?)")
+_INTEGER = re.compile(r"[+-]?\d+")
+_STRING_BODY = {
+    '"': re.compile(r'"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*'),
+    "'": re.compile(r"'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*"),
+}
+_COMP_OP = re.compile(r"==|!=|<=|<|>=|>|in")
+_ADD_OP = re.compile(r"[+-]")
+_MUL_OP = re.compile(r"[*/%]")
+
+
+class _Parser:
+    """Recursive descent parser for a single expression
+
+    Each method parses one rule of the grammar documented in :func:`parse`.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def _skip(self):
+        self.pos = _WHITESPACE.match(self.text, self.pos).end()
+
+    def _accept(self, literal):
+        self._skip()
+        if self.text.startswith(literal, self.pos):
+            self.pos += len(literal)
+            return True
+        return False
+
+    def _accept_regex(self, regex):
+        self._skip()
+        match = regex.match(self.text, self.pos)
+        if match is None:
+            return None
+        self.pos = match.end()
+        return match.group()
+
+    def _expect(self, literal):
+        if not self._accept(literal):
+            self._error(f"expected {literal!r}")
+
+    def _error(self, message):
+        raise ValueError(f"Invalid expression {self.text!r}: {message} at position {self.pos}")
+
+    def parse(self):
+        node = self.test()
+        self._skip()
+        if self.pos != len(self.text):
+            self._error("unexpected input")
+        return node
+
+    def test(self):
+        lh = self.and_test()
+        if self._accept("||"):
+            return BinOp([lh, "||", self.test()])
+        return lh
+
+    def and_test(self):
+        lh = self.not_test()
+        if self._accept("&&"):
+            return BinOp([lh, "&&", self.and_test()])
+        return lh
+
+    def not_test(self):
+        if self._accept("!"):
+            return RightOp(["!", self.not_test()])
+        return self.comparison()
+
+    def _left_associative(self, operand, operator_regex):
+        node = operand()
+        while (op := self._accept_regex(operator_regex)) is not None:
+            node = BinOp([node, op, operand()])
+        return node
+
+    def comparison(self):
+        return self._left_associative(self.expr, _COMP_OP)
+
+    def expr(self):
+        return self._left_associative(self.term, _ADD_OP)
+
+    def term(self):
+        return self._left_associative(self.factor, _MUL_OP)
+
+    def factor(self):
+        lh = self.atom()
+        if self._accept("**"):
+            return BinOp([lh, "**", self.factor()])
+        return lh
+
+    def atom(self):
+        node = self.item()
+        while True:
+            if self._accept("("):
+                node = Function(node, self.testlist(")"))
+            elif self._accept("["):
+                node = Element(node, self.test())
+                self._expect("]")
+            elif self._accept("."):
+                field = self._accept_regex(_IDENTIFIER)
+                if field is None:
+                    self._error("expected a property name")
+                node = Property(node, field)
+            else:
+                return node
+
+    def item(self):
+        if self._accept("("):
+            node = self.test()
+            self._expect(")")
+            return node
+        if self._accept("["):
+            return Array(self.testlist("]"))
+        if self._accept("{}"):
+            return Object([])
+        if (identifier := self._accept_regex(_IDENTIFIER)) is not None:
+            return identifier
+        if (number := self._accept_regex(_FLOAT)) is not None:
+            return float(number)
+        if (number := self._accept_regex(_INTEGER)) is not None:
+            return int(number)
+        body_regex = _STRING_BODY.get(self.text[self.pos : self.pos + 1])
+        if body_regex is not None:
+            quote = self.text[self.pos]
+            body = self._accept_regex(body_regex)
+            if self.text.startswith(quote, self.pos):
+                self.pos += 1
+                return body + quote
+        self._error("expected a value")
+
+    def testlist(self, close):
+        if self._accept(close):
+            return []
+        items = [self.test()]
+        while self._accept(","):
+            items.append(self.test())
+        self._expect(close)
+        return items
+
+
+#: Elements of the reference grammar, which are loaded on first access
+_GRAMMAR_ELEMENTS = frozenset(
+    """
+    orOp andOp notOp compOp addOp mulOp expOp lpar rpar lsqr rsqr dot
+    factor notTest andTest test testlist literal array parenthetical obj_literal item
+    function_call array_lookup object_lookup trailer atom term expr comparison expression
+    atomize
+    """.split()
+)
+
+
+def __getattr__(name: str) -> lt.Any:
+    if name in _GRAMMAR_ELEMENTS:
+        try:
+            from . import _expression_grammar
+        except ImportError as e:
+            raise RuntimeError(
+                "The `pyparsing` package is required for the reference expression grammar. "
+                "Please install it with `pip install pyparsing`."
+            ) from e
+        return getattr(_expression_grammar, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Serialization
+#
+# Trees are serialized to JSON as arrays tagged with the node type, for example
+# ``["BinOp", "x", "+", 1]``. Numbers and strings, including the quotes of string
+# literals, are serialized as themselves.
+
+
+def ast_to_json(node: ASTNode | str | int | float) -> lt.Any:
+    """Convert an abstract syntax tree to a JSON-serializable structure
+
+    >>> serialized = ast_to_json(parse("length(sidecar.SliceTiming) > 0"))
+    >>> serialized
+    ['BinOp', ['Function', 'length', [['Property', 'sidecar', 'SliceTiming']]], '>', 0]
+    >>> str(ast_from_json(serialized))
+    '(length((sidecar.SliceTiming)) > 0)'
+    """
+    if isinstance(node, BinOp):
+        return ["BinOp", ast_to_json(node.lh), node.op, ast_to_json(node.rh)]
+    if isinstance(node, RightOp):
+        return ["RightOp", node.op, ast_to_json(node.rh)]
+    if isinstance(node, Function):
+        return ["Function", ast_to_json(node.name), [ast_to_json(arg) for arg in node.args]]
+    if isinstance(node, Element):
+        return ["Element", ast_to_json(node.name), ast_to_json(node.index)]
+    if isinstance(node, Property):
+        return ["Property", ast_to_json(node.name), node.field]
+    if isinstance(node, Array):
+        return ["Array", [ast_to_json(element) for element in node.elements]]
+    if isinstance(node, Object):
+        return ["Object"]
+    return node
+
+
+def ast_from_json(data: lt.Any) -> ASTNode | str | int | float:
+    """Convert the output of :func:`ast_to_json` back to an abstract syntax tree"""
+    if not isinstance(data, list):
+        return data
+    node_type, *fields = data
+    if node_type == "BinOp":
+        lh, op, rh = fields
+        return BinOp([ast_from_json(lh), op, ast_from_json(rh)])
+    if node_type == "RightOp":
+        op, rh = fields
+        return RightOp([op, ast_from_json(rh)])
+    if node_type == "Function":
+        name, args = fields
+        return Function(ast_from_json(name), [ast_from_json(arg) for arg in args])
+    if node_type == "Element":
+        name, index = fields
+        return Element(ast_from_json(name), ast_from_json(index))
+    if node_type == "Property":
+        name, field = fields
+        return Property(ast_from_json(name), field)
+    if node_type == "Array":
+        return Array([ast_from_json(element) for element in fields[0]])
+    if node_type == "Object":
+        return Object([])
+    raise ValueError(f"Unknown expression node type: {node_type!r}")
+
+
+def _find_expressions(namespace):
+    for value in namespace.values():
+        if isinstance(value, Mapping):
+            for key in ("selectors", "checks"):
+                expressions = value.get(key)
+                if isinstance(expressions, list):
+                    yield from expressions
+            yield from _find_expressions(value)
+
+
+def expression_table(schema: Mapping) -> dict[str, ASTNode | str | int | float]:
+    """Parse all expressions in a schema
+
+    Expressions are collected from the ``selectors`` and ``checks`` of
+    ``schema.rules``, and the ``selectors`` of ``schema.meta.associations``.
+
+    Parameters
+    ----------
+    schema : Namespace
+        The BIDS schema, as returned by :func:`bidsschematools.schema.load_schema`.
+
+    Returns
+    -------
+    dict
+        Abstract syntax trees, keyed by expression string.
+    """
+    expressions = chain(
+        _find_expressions(schema["rules"]),
+        _find_expressions(schema["meta"]["associations"]),
+    )
+    return {expr: parse(expr) for expr in expressions}
+
+
+def export_expression_table(schema: Mapping) -> str:
+    """Serialize all expressions in a schema, parsed, to JSON
 
-# Function calls and item lookups need to be constructed partially
-function_call.set_parse_action(lambda t: partial(Function, args=list(t)))
-array_lookup.set_parse_action(lambda t: partial(Element, index=t[0]))
-object_lookup.set_parse_action(lambda t: partial(Property, field=t[0]))
+    The serialized table maps expression strings to the output of :func:`ast_to_json`.
+    When bundled with the package as ``data/expressions.json``, it is used by
+    :func:`parse` in place of the parser.
+    """
+    table = expression_table(schema)
+    return json.dumps({expr: ast_to_json(ast) for expr, ast in sorted(table.items())})
+
+
+@cache
+def _bundled_expressions() -> dict[str, lt.Any]:
+    """Load the serialized expression table bundled with the package, if built"""
+    table_file = data.load.readable("expressions.json")
+    if not table_file.is_file():
+        return {}
+    return json.loads(table_file.read_text())
+
+
+# Evaluation
+#
+# Values follow JSON types: None (null), bool, int/float, str, list and mappings.
+# Context objects may also be any object with attributes, such as the dataclasses of
+# bidsschematools.types.context.
+#
+# Missing values are null, and most operations on null resolve to null.
+# Logical operators follow Javascript, short-circuiting and returning one of their
+# operands, and null is treated as false.
+# Type errors, such as arithmetic on strings, also resolve to null, so evaluation never
+# raises for any values found in a context.
+
+_NUMERIC = re.compile(r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?")
+_CONSTANTS = {"null": None, "true": True, "false": False}
+_SCALARS = (str, int, float, list, tuple)
+
+
+def truthy(value: lt.Any) -> bool:
+    """Interpret a value as a boolean, following Javascript
+
+    ``null``, ``false``, zero, NaN and the empty string are false.
+    All other values, including empty arrays and objects, are true.
+
+    >>> [truthy(value) for value in (None, False, 0, float("nan"), "", [], {}, "0")]
+    [False, False, False, False, False, True, True, True]
+    """
+    if value is True or value is False or value is None:
+        return value is True
+    if isinstance(value, (int, float, str)):
+        return bool(value) and value == value
+    return True
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _to_number(value):
+    """Convert numbers and numeric strings to numbers, and other values to None"""
+    if _is_number(value):
+        return value
+    if isinstance(value, str) and _NUMERIC.fullmatch(value):
+        return float(value) if any(c in value for c in ".eE") else int(value)
+    return None
+
+
+def _is_array(value):
+    """Lists, tuples and other sequences except strings, such as TSV columns, are arrays"""
+    if isinstance(value, (list, tuple)):
+        return True
+    return isinstance(value, Sequence) and not isinstance(value, (str, bytes))
+
+
+def _get_property(obj, name):
+    if type(obj) is dict:
+        return obj.get(name)
+    if obj is None or isinstance(obj, _SCALARS) or not isinstance(name, str):
+        return None
+    if isinstance(obj, Mapping):
+        return obj.get(name)
+    if isinstance(obj, Sequence):
+        return None
+    return getattr(obj, name, None)
+
+
+def _get_element(obj, index):
+    if isinstance(obj, str) or _is_array(obj):
+        if isinstance(index, int) and 0 <= index < len(obj):
+            return obj[index]
+        return None
+    if isinstance(obj, Mapping):
+        return obj.get(index)
+    return None
+
+
+def _contains(item, container):
+    if container is None:
+        return None
+    if isinstance(container, str):
+        return isinstance(item, str) and item in container
+    if isinstance(container, Mapping) or _is_array(container):
+        return item in container
+    return _get_property(container, item) is not None
+
+
+def _add(lh, rh):
+    if _is_number(lh) and _is_number(rh):
+        return lh + rh
+    if isinstance(lh, str) and isinstance(rh, str):
+        return lh + rh
+    return None
 
 
-# Once the atom is complete, we can build the left-associative tree by completing application
-def atomize(tokens):
-    item = tokens.pop(0)
-    for trailer in tokens:
-        item = trailer(item)
-    return item
+def _arithmetic(op):
+    def func(lh, rh):
+        if _is_number(lh) and _is_number(rh):
+            return op(lh, rh)
+        return None
 
+    return func
 
-atom.set_parse_action(atomize)
 
-# Arithmetic expressions can all be degenerate, so use maybe to pass through
-factor.set_parse_action(BinOp.maybe)
-term.set_parse_action(BinOp.maybe)
-expr.set_parse_action(BinOp.maybe)
+def _divide(lh, rh):
+    return None if rh == 0 else lh / rh
 
-comparison.set_parse_action(BinOp.maybe)
-notTest.set_parse_action(RightOp.maybe)
-andTest.set_parse_action(BinOp.maybe)
-test.set_parse_action(BinOp.maybe)
+
+def _remainder(lh, rh):
+    # The sign of the result follows the dividend, as in Javascript and C
+    if rh == 0:
+        return None
+    result = math.fmod(lh, rh)
+    return int(result) if isinstance(lh, int) and isinstance(rh, int) else result
+
+
+def _power(lh, rh):
+    if lh == 0 and rh < 0:
+        return None
+    result = lh**rh
+    return None if isinstance(result, complex) else result
+
+
+def _comparison(op):
+    def func(lh, rh):
+        if (_is_number(lh) and _is_number(rh)) or (isinstance(lh, str) and isinstance(rh, str)):
+            return op(lh, rh)
+        return False
+
+    return func
+
+
+BINARY_OPERATORS: dict[str, lt.Callable[[lt.Any, lt.Any], lt.Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": _comparison(operator.lt),
+    "<=": _comparison(operator.le),
+    ">": _comparison(operator.gt),
+    ">=": _comparison(operator.ge),
+    "in": _contains,
+    "+": _add,
+    "-": _arithmetic(operator.sub),
+    "*": _arithmetic(operator.mul),
+    "/": _arithmetic(_divide),
+    "%": _arithmetic(_remainder),
+    "**": _arithmetic(_power),
+}
+
+
+def _match(target, regex):
+    if not isinstance(target, str):
+        return None
+    if not isinstance(regex, str):
+        return False
+    return _compile_regex(regex).search(target) is not None
+
+
+@lru_cache(maxsize=1024)
+def _compile_regex(regex):
+    return re.compile(regex)
+
+
+def _type(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if _is_array(value):
+        return "array"
+    return "object"
+
+
+def _as_list(value):
+    return list(value) if _is_array(value) else [value]
+
+
+def _intersects(a, b):
+    b = _as_list(b)
+    intersection = [value for value in _as_list(a) if value in b]
+    return intersection or False
+
+
+def _allequal(a, b):
+    if not _is_array(a) or not _is_array(b):
+        return False
+    return len(a) == len(b) and all(x == y for x, y in zip(a, b))
+
+
+def _length(value):
+    return len(value) if isinstance(value, str) or _is_array(value) else None
+
+
+def _count(values, value):
+    if not _is_array(values):
+        return None
+    return sum(1 for item in values if item == value)
+
+
+def _index(values, value):
+    if not _is_array(values) or value not in values:
+        return None
+    return values.index(value)
+
+
+def _numbers(values):
+    if not _is_array(values):
+        values = [values]
+    return [number for number in map(_to_number, values) if number is not None]
+
+
+def _min(values):
+    numbers = _numbers(values)
+    return min(numbers) if numbers else None
+
+
+def _max(values):
+    numbers = _numbers(values)
+    return max(numbers) if numbers else None
+
+
+def _sorted(values, method="auto"):
+    if not _is_array(values):
+        return None
+    if method == "lexical":
+        return sorted(values, key=str)
+    if method == "numeric":
+        # Non-numeric values, such as "n/a", keep their positions
+        numbers = [_to_number(value) for value in values]
+        positions = [idx for idx, number in enumerate(numbers) if number is not None]
+        result = list(values)
+        for idx, source in zip(positions, sorted(positions, key=numbers.__getitem__)):
+            result[idx] = values[source]
+        return result
+    if all(_is_number(value) for value in values):
+        return sorted(values)
+    return sorted(values, key=str)
+
+
+def _unique(values):
+    if not _is_array(values):
+        return None
+    try:
+        # Equal values, such as 1 and 1.0, share a hash, and the first is kept
+        return list(dict.fromkeys(values))
+    except TypeError:  # Unhashable elements, such as arrays
+        unique = []
+        for value in values:
+            if value not in unique:
+                unique.append(value)
+        return unique
+
+
+def _substr(value, start, end):
+    if not isinstance(value, str) or not _is_number(start) or not _is_number(end):
+        return None
+    return value[max(int(start), 0) : max(int(end), 0)]
+
+
+def _exists(context, paths, rule):
+    """Count the paths that exist in ``context.dataset.tree``, relative to a location"""
+    if paths is None or rule is None:
+        return 0
+    tree = _get_property(_get_property(context, "dataset"), "tree")
+    current_path = _get_property(context, "path") or ""
+    count = 0
+    for path in _as_list(paths):
+        if not isinstance(path, str):
+            continue
+        if rule == "dataset":
+            relpath = path
+        elif rule == "subject":
+            subject_dir = current_path.lstrip("/").partition("/")[0]
+            relpath = f"{subject_dir}/{path}"
+        elif rule == "stimuli":
+            relpath = f"stimuli/{path}"
+        elif rule == "file":
+            relpath = f"{current_path.rpartition('/')[0]}/{path}"
+        elif rule == "bids-uri":
+            # Only URIs referring to the current dataset can be resolved
+            if not path.startswith("bids::"):
+                continue
+            relpath = path[6:]
+        else:
+            continue
+        relpath = posixpath.normpath(relpath.lstrip("/"))
+        if relpath == "." or relpath.startswith(".."):
+            continue
+        node = tree
+        for component in relpath.split("/"):
+            node = _get_element(node, component)
+        count += node is not None
+    return count
+
+
+#: Built-in functions of the expression language, by name
+FUNCTIONS: dict[str, lt.Callable[..., lt.Any]] = {
+    "match": _match,
+    "type": _type,
+    "intersects": _intersects,
+    "allequal": _allequal,
+    "length": _length,
+    "count": _count,
+    "index": _index,
+    "min": _min,
+    "max": _max,
+    "sorted": _sorted,
+    "unique": _unique,
+    "substr": _substr,
+}
+
+#: Built-in functions that take the evaluation context as their first argument
+CONTEXT_FUNCTIONS: dict[str, lt.Callable[..., lt.Any]] = {
+    "exists": _exists,
+}
+
+
+def evaluate(node: ASTNode | str | int | float, context: lt.Any) -> lt.Any:
+    """Evaluate a parsed expression in a context
+
+    Parameters
+    ----------
+    node : ASTNode, str, int or float
+        An expression as returned by :func:`parse`. Strings are identifiers,
+        unless they are quoted string literals.
+    context : Mapping or object
+        The namespaces available to the expression, such as ``sidecar`` and ``dataset``,
+        as keys or attributes.
+
+    Returns
+    -------
+    Any
+        The value of the expression. ``None`` represents ``null``.
+        When used as a selector or check, the value should be interpreted
+        with :func:`truthy`.
+
+    Examples
+    --------
+    >>> evaluate(parse("sidecar.RepetitionTime * 1000"), {"sidecar": {"RepetitionTime": 2}})
+    2000
+    >>> evaluate(parse("sidecar.MissingValue * 1000"), {"sidecar": {}}) is None
+    True
+    >>> evaluate(parse('intersects(["a", "b"], datatypes)'), {"datatypes": ["b", "c"]})
+    ['b']
+    """
+    evaluator = _EVALUATORS.get(type(node))
+    if evaluator is None:
+        return node
+    return evaluator(node, context)
+
+
+def _evaluate_token(token, context):
+    if token[0] in "\"'":
+        return token[1:-1]
+    if token in _CONSTANTS:
+        return _CONSTANTS[token]
+    return _get_property(context, token)
+
+
+def _evaluate_binop(node, context):
+    op = node.op
+    lh = evaluate(node.lh, context)
+    if op == "&&":
+        return evaluate(node.rh, context) if truthy(lh) else lh
+    if op == "||":
+        return lh if truthy(lh) else evaluate(node.rh, context)
+    return BINARY_OPERATORS[op](lh, evaluate(node.rh, context))
+
+
+def _evaluate_rightop(node, context):
+    return not truthy(evaluate(node.rh, context))
+
+
+def _evaluate_function(node, context):
+    args = [evaluate(arg, context) for arg in node.args]
+    if node.name in CONTEXT_FUNCTIONS:
+        return CONTEXT_FUNCTIONS[node.name](context, *args)
+    func = FUNCTIONS.get(node.name) if isinstance(node.name, str) else None
+    if func is None:
+        raise ValueError(f"Unknown function in expression: {node}")
+    return func(*args)
+
+
+_EVALUATORS: dict[type, lt.Callable[[lt.Any, lt.Any], lt.Any]] = {
+    str: _evaluate_token,
+    BinOp: _evaluate_binop,
+    RightOp: _evaluate_rightop,
+    Function: _evaluate_function,
+    Element: lambda node, context: _get_element(
+        evaluate(node.name, context), evaluate(node.index, context)
+    ),
+    Property: lambda node, context: _get_property(evaluate(node.name, context), node.field),
+    Array: lambda node, context: [evaluate(element, context) for element in node.elements],
+    Object: lambda node, context: {},
+}
+
+
+# Compilation
+#
+# Expressions are compiled to closures taking a context. Constant subexpressions are folded
+# during compilation and represented by _Constant, and only wrapped in a closure if the
+# entire expression is constant.
+
+
+class _Constant:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+@lru_cache(maxsize=4096)
+def compile(expression_string: str) -> lt.Callable[[lt.Any], lt.Any]:
+    """Compile a BIDS schema expression into a function of a context
+
+    Subexpressions that do not depend on the context are evaluated once, during
+    compilation, and the patterns of ``match()`` calls with literal patterns are
+    compiled once. Compiled functions are cached by expression string.
+
+    Parameters
+    ----------
+    expression_string : str
+        A BIDS schema expression.
+
+    Returns
+    -------
+    Callable
+        A function that takes a context, as in :func:`evaluate`, and returns the value
+        of the expression.
+
+    Examples
+    --------
+    >>> check = compile("sidecar.RepetitionTime * 10 ** -3 < 0.1")
+    >>> check({"sidecar": {"RepetitionTime": 50}})
+    True
+    >>> check({"sidecar": {}})
+    False
+    """
+    return _as_function(_compile_node(parse(expression_string)))
+
+
+def _as_function(compiled):
+    if not isinstance(compiled, _Constant):
+        return compiled
+    value = compiled.value
+    if isinstance(value, (list, dict)):
+        # Avoid sharing mutable values between evaluations
+        return lambda context: value.copy()
+    return lambda context: value
+
+
+def _compile_node(node):
+    compiler = _COMPILERS.get(type(node))
+    if compiler is None:
+        return _Constant(node)
+    return compiler(node)
+
+
+def _compile_token(token):
+    if token[0] in "\"'":
+        return _Constant(token[1:-1])
+    if token in _CONSTANTS:
+        return _Constant(_CONSTANTS[token])
+    return lambda context: _get_property(context, token)
+
+
+def _compile_binop(node):
+    op = node.op
+    lh = _compile_node(node.lh)
+    rh = _compile_node(node.rh)
+
+    if op == "&&" or op == "||":
+        if isinstance(lh, _Constant):
+            return rh if truthy(lh.value) == (op == "&&") else lh
+        rh = _as_function(rh)
+        if op == "&&":
+
+            def func(context):
+                value = lh(context)
+                return rh(context) if truthy(value) else value
+        else:
+
+            def func(context):
+                value = lh(context)
+                return value if truthy(value) else rh(context)
+
+        return func
+
+    binary = BINARY_OPERATORS[op]
+    if isinstance(lh, _Constant):
+        if isinstance(rh, _Constant):
+            return _Constant(binary(lh.value, rh.value))
+        lh_value = lh.value
+        return lambda context: binary(lh_value, rh(context))
+    if isinstance(rh, _Constant):
+        rh_value = rh.value
+        return lambda context: binary(lh(context), rh_value)
+    return lambda context: binary(lh(context), rh(context))
+
+
+def _compile_rightop(node):
+    rh = _compile_node(node.rh)
+    if isinstance(rh, _Constant):
+        return _Constant(not truthy(rh.value))
+    return lambda context: not truthy(rh(context))
+
+
+def _match_pattern(target, pattern):
+    if not isinstance(target, str):
+        return None
+    return pattern.search(target) is not None
+
+
+def _compile_function(node):
+    name = node.name
+    args = [_compile_node(arg) for arg in node.args]
+    if isinstance(name, str) and name in CONTEXT_FUNCTIONS:
+        context_func = CONTEXT_FUNCTIONS[name]
+        arg_funcs = [_as_function(arg) for arg in args]
+        return lambda context: context_func(context, *[arg(context) for arg in arg_funcs])
+
+    func = FUNCTIONS.get(name) if isinstance(name, str) else None
+    if func is None:
+        raise ValueError(f"Unknown function in expression: {node}")
+
+    # Functions are pure, so calls with constant arguments are constant
+    if all(isinstance(arg, _Constant) for arg in args):
+        return _Constant(func(*[arg.value for arg in args]))
+
+    if name == "match" and isinstance(args[1], _Constant) and isinstance(args[1].value, str):
+        pattern = _compile_regex(args[1].value)
+        target = args[0]
+        return lambda context: _match_pattern(target(context), pattern)
+
+    arg_funcs = [_as_function(arg) for arg in args]
+    if len(arg_funcs) == 1:
+        (arg,) = arg_funcs
+        return lambda context: func(arg(context))
+    if len(arg_funcs) == 2:
+        arg1, arg2 = arg_funcs
+        return lambda context: func(arg1(context), arg2(context))
+    return lambda context: func(*[arg(context) for arg in arg_funcs])
+
+
+def _compile_element(node):
+    name = _compile_node(node.name)
+    index = _compile_node(node.index)
+    if isinstance(name, _Constant) and isinstance(index, _Constant):
+        return _Constant(_get_element(name.value, index.value))
+    name = _as_function(name)
+    if isinstance(index, _Constant):
+        index_value = index.value
+        return lambda context: _get_element(name(context), index_value)
+    return lambda context: _get_element(name(context), index(context))
+
+
+def _compile_property(node):
+    name = _compile_node(node.name)
+    field = node.field
+    if isinstance(name, _Constant):
+        return _Constant(_get_property(name.value, field))
+    return lambda context: _get_property(name(context), field)
+
+
+def _compile_array(node):
+    elements = [_compile_node(element) for element in node.elements]
+    if all(isinstance(element, _Constant) for element in elements):
+        return _Constant([element.value for element in elements])
+    element_funcs = [_as_function(element) for element in elements]
+    return lambda context: [element(context) for element in element_funcs]
+
+
+_COMPILERS = {
+    str: _compile_token,
+    BinOp: _compile_binop,
+    RightOp: _compile_rightop,
+    Function: _compile_function,
+    Element: _compile_element,
+    Property: _compile_property,
+    Array: _compile_array,
+    Object: lambda node: _Constant({}),
+}
@@ -1,16 +1,27 @@
 """Utilities for implementing ``schema.rules``
 
-This module is currently limited to constructing filename rules from
-``schema.rules.files``.
+This module constructs and matches filename rules from ``schema.rules.files``,
+and indexes the rules in other sections of ``schema.rules`` by their selectors.
 """
 
 import fnmatch
+import hashlib
+import json
 import re
+from collections import defaultdict
 from collections.abc import Mapping
-from functools import lru_cache
+from functools import cache, lru_cache
+from pathlib import Path
 
 import bidsschematools as bst
+import bidsschematools.expressions
+import bidsschematools.schema
 import bidsschematools.types
+import bidsschematools.utils
+
+from . import _lazytypes as lt
+
+lgr = bst.utils.get_logger()
 
 # The list of which entities create directories could be dynamically specified by the YAML, but for
 # now, it is not.
@@ -18,6 +29,9 @@ import bidsschematools.types
 # above it.
 DIR_ENTITIES = ["subject", "session"]
 
+#: Version of the layout of the on-disk cache of regexes written by `regexify_all`
+_CACHE_FORMAT = 1
+
 
 def _capture_regex(name, pattern, backref):
     """Capture pattern to name or match back-reference to name
@@ -193,6 +207,11 @@ def _stem_rule(rule: bst.types.Namespace):
     return {"regex": dir_regex + stem_regex + ext_regex, "mandatory": rule.level == "required"}
 
 
+def _is_literal_stem(stem: str) -> bool:
+    """Whether a stem matches only itself, and so cannot contain an extension"""
+    return not any(char in stem for char in "*?[.")
+
+
 def _path_rule(rule: bst.types.Namespace):
     path_match = re.escape(rule.path)
     # Exact path matches may be files or opaque directories
@@ -220,6 +239,9 @@ def regexify_filename_rules(
     -------
     rules : list of dict
         A list of dictionaries, with keys including 'regex' and 'mandatory'.
+        Rules that can only match a fixed set of extensions also have an 'extensions' key,
+        and rules constructed from entities additionally have a 'suffixes' key.
+        These are used by :class:`FilenameIndex`.
     """
     regex_schema = []
     for rule_template in rule_group.values(level=level):
@@ -227,17 +249,26 @@ def regexify_filename_rules(
         if "path" in rule_template:
             regex_schema.append(_path_rule(rule_template))
         elif "stem" in rule_template:
-            regex_schema.append(_stem_rule(rule_template))
+            regex_schema.append(
+                {**_stem_rule(rule_template), "extensions": list(rule_template.extensions)}
+                if _is_literal_stem(rule_template.stem)
+                else _stem_rule(rule_template)
+            )
         else:
             regex_schema.extend(
-                _entity_rule(rule, schema) for rule in _split_inheritance_rules(rule_template)
+                {
+                    **_entity_rule(rule, schema),
+                    "suffixes": list(rule["suffixes"]),
+                    "extensions": list(rule["extensions"]),
+                }
+                for rule in _split_inheritance_rules(rule_template)
             )
 
     return regex_schema
 
 
 @lru_cache
-def regexify_all(schema_dir=None):
+def regexify_all(schema_dir=None, derivatives=False, cache=False):
     """
     Create full path regexes for all BIDS specification files.
 
@@ -245,6 +276,11 @@ def regexify_all(schema_dir=None):
     ----------
     schema_dir : str, optional
         A string pointing to a BIDS directory for which paths should be validated.
+    derivatives : bool, optional
+        Whether to include the regexes of ``rules.files.deriv``, for derivative datasets.
+    cache : bool, optional
+        Whether to reuse regexes cached on disk by earlier processes, and cache them.
+        By default, regexes are only cached in memory.
 
     Returns
     -------
@@ -252,11 +288,565 @@ def regexify_all(schema_dir=None):
         A list of dictionaries, with keys including 'regex' and 'mandatory'.
     my_schema : Mapping
         Nested dictionaries representing the full schema.
+
+    Notes
+    -----
+    With `cache`, the regexes are cached in the directory given by
+    :func:`bidsschematools.utils.get_cache_dir`, and reused by later processes
+    loading the same schema, such as invocations of the pre-receive hook.
     """
 
     schema = bst.schema.load_schema(schema_dir)
-    all_regex = []
-    for group in (schema.rules.files.common, schema.rules.files.raw):
-        all_regex.extend(regexify_filename_rules(group, schema, level=2))
+    groups = ("common", "raw", "deriv") if derivatives else ("common", "raw")
+    cache_path = _regex_cache_path(schema, groups) if cache else None
+    if cache_path is not None:
+        try:
+            cached = json.loads(cache_path.read_text())
+        except (OSError, ValueError):
+            cached = None
+        if _is_regex_list(cached):
+            return cached, schema
+        if cached is not None:
+            lgr.debug("Ignoring malformed cache file %s", cache_path)
 
+    all_regex = []
+    for group in groups:
+        all_regex.extend(regexify_filename_rules(schema.rules.files[group], schema, level=2))
+
+    if cache_path is not None:
+        try:
+            bst.utils.write_text_atomic(cache_path, json.dumps(all_regex))
+        except OSError as e:
+            lgr.debug("Could not write cache file %s: %s", cache_path, e)
     return all_regex, schema
+
+
+def _is_regex_list(value):
+    """Whether a value has the structure of the regexes returned by `regexify_all`"""
+    return isinstance(value, list) and all(
+        isinstance(rule, dict)
+        and isinstance(rule.get("regex"), str)
+        and isinstance(rule.get("mandatory"), bool)
+        for rule in value
+    )
+
+
+@cache
+def _source_digest():
+    """Hash the source of this module, which determines how regexes are constructed"""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def _regex_cache_path(schema, groups=("common", "raw")):
+    """Locate the on-disk cache of the filename regexes of groups of ``rules.files``
+
+    The cache key combines the schema and BIDS versions, the version of this package,
+    and a hash of the cache format, of the source of this module, which determines how
+    regexes are constructed, and of the parts of the schema that regexes are constructed
+    from, so that development schemas and checkouts sharing a version string do not collide.
+
+    Returns ``None`` if caching is disabled.
+    """
+    cache_dir = bst.utils.get_cache_dir()
+    if cache_dir is None:
+        return None
+    content = json.dumps(
+        [
+            _CACHE_FORMAT,
+            _source_digest(),
+            groups,
+            *(schema.rules.files[group].to_dict() for group in groups),
+            schema.rules.entities,
+            schema.objects.entities.to_dict(),
+            schema.objects.formats.to_dict(),
+        ],
+        sort_keys=True,
+    )
+    digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+    key = f"{schema.schema_version}-{schema.bids_version}-{bst.__version__}-{digest}"
+    return cache_dir / "rules" / f"regexes-{key}.json"
+
+
+def split_filename(path: str) -> tuple[str, str]:
+    """Split the suffix and extension from the final component of a path
+
+    The extension begins at the first dot of the final component, and a trailing
+    slash, which marks a directory, is retained.
+    The suffix is the part of the remaining stem following the last underscore.
+
+    >>> split_filename("sub-01/anat/sub-01_acq-mprage_T1w.nii.gz")
+    ('T1w', '.nii.gz')
+    >>> split_filename("sub-01/micr/sub-01_sample-A_SEM.ome.zarr/")
+    ('SEM', '.ome.zarr/')
+    >>> split_filename("task-rest_bold.json")
+    ('bold', '.json')
+    >>> split_filename("README")
+    ('README', '')
+    """
+    trailing = "/" if path.endswith("/") else ""
+    name = path.rstrip("/").rsplit("/", 1)[-1]
+    stem, dot, ext = name.partition(".")
+    return stem.rsplit("_", 1)[-1], f"{dot}{ext}{trailing}"
+
+
+def parse_entities(path: str, entity_keys: Mapping[str, str] | None = None) -> dict[str, str]:
+    """Parse the entities from the final component of a path
+
+    Entities are the ``name-value`` pairs preceding the suffix.
+
+    Parameters
+    ----------
+    path : str
+        The path of a file.
+    entity_keys : Mapping, optional
+        A mapping of entity names, as found in filenames, to the keys used to refer
+        to entities, such as the keys of ``schema.objects.entities``.
+        Names that are not found are used as keys.
+
+    Returns
+    -------
+    dict
+        The values of the entities, by key.
+
+    >>> parse_entities("sub-01/func/sub-01_task-rest_acq-fast_bold.nii.gz", {"acq": "acquisition"})
+    {'sub': '01', 'task': 'rest', 'acquisition': 'fast'}
+    >>> parse_entities("participants.tsv")
+    {}
+    """
+    stem = path.rstrip("/").rsplit("/", 1)[-1].partition(".")[0]
+    entity_keys = entity_keys or {}
+    entities = {}
+    for part in stem.split("_")[:-1]:
+        name, sep, value = part.partition("-")
+        if sep:
+            entities[entity_keys.get(name, name)] = value
+    return entities
+
+
+class FilenameIndex:
+    """Index of filename rules by the suffixes and extensions they can match
+
+    Rules constructed from entities end in a fixed suffix and extension,
+    so only the few rules whose suffix and extension could match a filename
+    need to be tried.
+    Rules with a wildcard extension are indexed by suffix alone, rules with a
+    literal stem by extension alone, and the remaining rules (such as paths,
+    which may match directory contents) are candidates for every filename.
+
+    Parameters
+    ----------
+    regex_schema : list of dict
+        A list of dictionaries as generated by :func:`regexify_all`.
+
+    Examples
+    --------
+    >>> index = FilenameIndex(
+    ...     [
+    ...         {"regex": "...", "suffixes": ["T1w", "T2w"], "extensions": [".nii", ".json"]},
+    ...         {"regex": "...", "extensions": [".tsv"]},
+    ...         {"regex": "..."},
+    ...         {"regex": "...", "suffixes": ["physio"], "extensions": [".*"]},
+    ...     ]
+    ... )
+    >>> index.candidates("sub-01/anat/sub-01_T2w.nii")
+    (0, 2)
+    >>> index.candidates("participants.tsv")
+    (1, 2)
+    >>> index.candidates("sub-01/func/sub-01_task-rest_physio.tsv.gz")
+    (2, 3)
+    """
+
+    def __init__(self, regex_schema):
+        self._by_key = defaultdict(list)
+        self._by_suffix = defaultdict(list)
+        self._by_extension = defaultdict(list)
+        self._unindexed = []
+        for idx, regex_entry in enumerate(regex_schema):
+            suffixes = regex_entry.get("suffixes")
+            extensions = regex_entry.get("extensions")
+            if extensions is None or (".*" in extensions and suffixes is None):
+                self._unindexed.append(idx)
+            elif suffixes is None:
+                for ext in extensions:
+                    self._by_extension[ext].append(idx)
+            else:
+                for suffix in suffixes:
+                    if ".*" in extensions:
+                        self._by_suffix[suffix].append(idx)
+                    for ext in extensions:
+                        self._by_key[suffix, ext].append(idx)
+        self._unindexed = tuple(self._unindexed)
+        self._candidates = {}
+
+    def candidates(self, path: str) -> tuple[int, ...]:
+        """Find the rules that may match a path
+
+        Parameters
+        ----------
+        path : str
+            The path to look up.
+
+        Returns
+        -------
+        tuple of int
+            The indices of the candidate rules, in their original order.
+        """
+        key = split_filename(path)
+        try:
+            return self._candidates[key]
+        except KeyError:
+            pass
+        suffix, ext = key
+        indexed = self._by_key.get(key, []) + self._by_suffix.get(suffix, [])
+        indexed += self._by_extension.get(ext, [])
+        if not indexed:
+            # Do not let unrecognized filenames grow the cache
+            return self._unindexed
+        candidates = tuple(sorted({*indexed, *self._unindexed}))
+        self._candidates[key] = candidates
+        return candidates
+
+
+class FilenameMatcher:
+    """Match paths against a list of filename rules
+
+    Each rule is compiled once, with a common prefix, when the matcher is created.
+    Only the candidate rules found in a :class:`FilenameIndex` are tried for each path,
+    in order, so the first rule to match a path is found.
+
+    Parameters
+    ----------
+    regex_schema : list of dict
+        A list of dictionaries as generated by :func:`regexify_all`.
+    prefix : str, optional
+        A regular expression to prepend to each rule.
+        By default, rules may match at any directory level.
+
+    Examples
+    --------
+    >>> matcher = FilenameMatcher(
+    ...     [
+    ...         {"regex": r"(?P<path>README)\\Z", "mandatory": True},
+    ...         {"regex": r"sub-(?P<subject>[0-9]+)/anat/sub-(?P=subject)_T1w\\.nii\\Z"},
+    ...     ]
+    ... )
+    >>> matcher.match("/data/sub-01/anat/sub-01_T1w.nii")
+    (1, {'subject': '01'})
+    >>> matcher.match("/data/README")
+    (0, {'path': 'README'})
+    >>> matcher.match("/data/sub-01/anat/sub-02_T1w.nii") is None
+    True
+    """
+
+    def __init__(self, regex_schema, prefix=r"(?:.*/)?"):
+        self.regex_schema = regex_schema
+        self.prefix = prefix
+        self.index = FilenameIndex(regex_schema)
+        self._patterns = [
+            re.compile(prefix + regex_entry["regex"]) for regex_entry in regex_schema
+        ]
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def match(self, path: str) -> tuple[int, dict[str, str | None]] | None:
+        """Find the first rule matching a path
+
+        Parameters
+        ----------
+        path : str
+            The path to match.
+
+        Returns
+        -------
+        tuple of (int, dict) or None
+            The index of the matching rule in ``regex_schema`` and the named groups
+            captured by the rule, or ``None`` if no rule matches.
+        """
+        for idx in self.index.candidates(path):
+            matched = self._patterns[idx].match(path)
+            if matched is not None:
+                return idx, matched.groupdict()
+        return None
+
+
+@lru_cache
+def filename_matcher(schema_dir=None):
+    """
+    Create a :class:`FilenameMatcher` for all BIDS specification files.
+
+    Parameters
+    ----------
+    schema_dir : str, optional
+        A string pointing to a BIDS directory for which paths should be validated.
+
+    Returns
+    -------
+    FilenameMatcher
+        A matcher built from the rules returned by :func:`regexify_all`.
+    """
+    regex_schema, _ = regexify_all(schema_dir)
+    return FilenameMatcher(regex_schema)
+
+
+# Selectors
+#
+# Most selectors of checks, sidecar and tabular data rules begin by testing the datatype,
+# suffix or extension of a file, for example ``suffix == "bold"``,
+# ``intersects([suffix], ["asl", "m0scan"])`` or ``match(extension, "^\.nii(\.gz)?$")``.
+# These tests are extracted from the parsed selectors, so that rules can be looked up by
+# the datatype, suffix and extension of a file, and the remaining selectors only need to
+# be evaluated for the few candidate rules.
+
+SELECTOR_FIELDS = ("datatype", "suffix", "extension")
+
+
+def _string_literal(node):
+    if isinstance(node, str) and node[:1] in ("'", '"'):
+        return node[1:-1]
+    return None
+
+
+def _selector_field(node):
+    """Find the selector field tested by a node, either ``field`` or ``[field]``"""
+    if isinstance(node, bst.expressions.Array) and len(node.elements) == 1:
+        node = node.elements[0]
+    return node if isinstance(node, str) and node in SELECTOR_FIELDS else None
+
+
+def _selector_constraints(node):
+    """Find the constraints on selector fields that must hold for a node to be truthy
+
+    Constraints are ``(values, patterns)`` pairs, satisfied by a string field that is
+    one of ``values`` or is matched by any of ``patterns``.
+    Constraints are necessary conditions, and the node is exact if they are also
+    sufficient, that is, if the node is truthy if and only if they hold.
+
+    Returns
+    -------
+    constraints : dict
+        Mapping of field names to constraints.
+    exact : bool
+        Whether the constraints determine the value of the node.
+
+    Examples
+    --------
+    >>> _selector_constraints(bst.expressions.parse('suffix == "bold"'))
+    ({'suffix': (frozenset({'bold'}), ())}, True)
+    >>> _selector_constraints(bst.expressions.parse('match(extension, "tsv$")'))
+    ({'extension': (frozenset(), ('tsv$',))}, True)
+    >>> _selector_constraints(bst.expressions.parse('datatype == "dwi" && sidecar.EchoTime'))
+    ({'datatype': (frozenset({'dwi'}), ())}, False)
+    >>> _selector_constraints(bst.expressions.parse('suffix != "bold"'))
+    ({}, False)
+    """
+    if isinstance(node, bst.expressions.BinOp):
+        if node.op == "==":
+            for lh, rh in ((node.lh, node.rh), (node.rh, node.lh)):
+                field = lh if isinstance(lh, str) and lh in SELECTOR_FIELDS else None
+                value = _string_literal(rh)
+                if field is not None and value is not None:
+                    return {field: (frozenset([value]), ())}, True
+        elif node.op == "&&":
+            lh, _ = _selector_constraints(node.lh)
+            rh, _ = _selector_constraints(node.rh)
+            # Either side is a necessary condition, so keep one constraint per field
+            return {**rh, **lh}, False
+        elif node.op == "||":
+            lh, lh_exact = _selector_constraints(node.lh)
+            rh, rh_exact = _selector_constraints(node.rh)
+            constraints = {
+                field: (lh[field][0] | rh[field][0], lh[field][1] + rh[field][1])
+                for field in lh.keys() & rh.keys()
+            }
+            exact = lh_exact and rh_exact and len(constraints) == len(lh) == len(rh) == 1
+            return constraints, exact
+    elif isinstance(node, bst.expressions.Function) and len(node.args) == 2:
+        if node.name == "intersects":
+            for lh, rh in (node.args, node.args[::-1]):
+                field = _selector_field(lh)
+                if field is None or not isinstance(rh, bst.expressions.Array):
+                    continue
+                values = [_string_literal(element) for element in rh.elements]
+                if None not in values:
+                    return {field: (frozenset(values), ())}, True
+        elif node.name == "match":
+            target, pattern = node.args
+            pattern = _string_literal(pattern)
+            if _selector_field(target) == target and pattern is not None:
+                return {target: (frozenset(), (pattern,))}, True
+    return {}, False
+
+
+class SelectorIndex:
+    """Index of schema rules by the datatypes, suffixes and extensions they select
+
+    Tests of the ``datatype``, ``suffix`` and ``extension`` of a file are extracted
+    from the ``selectors`` of each rule.
+    A rule is a candidate for a file if the datatype, suffix and extension of the file
+    satisfy these tests, and selectors that are fully decided by these tests are not
+    evaluated again by :meth:`select`.
+    Rules without such tests are candidates for every file.
+
+    Parameters
+    ----------
+    rules : Mapping
+        A mapping of rule names to rules with an optional list of ``selectors``.
+
+    Examples
+    --------
+    >>> index = SelectorIndex(
+    ...     {
+    ...         "BoldTime": {"selectors": ['suffix == "bold"', "sidecar.RepetitionTime"]},
+    ...         "NiftiHeader": {"selectors": ['match(extension, ".nii(.gz)?$")']},
+    ...         "Events": {"selectors": ['intersects([suffix], ["events", "beh"])']},
+    ...         "Everything": {"selectors": []},
+    ...     }
+    ... )
+    >>> index.candidates("func", "bold", ".nii.gz")
+    ('BoldTime', 'NiftiHeader', 'Everything')
+    >>> index.candidates(None, "events", ".tsv")
+    ('Events', 'Everything')
+    >>> index.select({"datatype": "func", "suffix": "bold", "extension": ".json", "sidecar": {}})
+    ['Everything']
+    """
+
+    def __init__(self, rules: Mapping[str, Mapping]):
+        self.rules = dict(rules)
+        self._residual = {}
+        self._values = {field: defaultdict(set) for field in SELECTOR_FIELDS}
+        self._patterns = {field: defaultdict(set) for field in SELECTOR_FIELDS}
+        self._any = {field: set() for field in SELECTOR_FIELDS}
+        self._order = {name: idx for idx, name in enumerate(self.rules)}
+        for name, rule in self.rules.items():
+            selectors = list(rule.get("selectors") or [])
+            indexed = {}
+            for selector in selectors:
+                constraints, exact = _selector_constraints(bst.expressions.parse(selector))
+                for field, constraint in constraints.items():
+                    indexed.setdefault(field, []).append((constraint, exact, selector))
+            decided = set()
+            for field in SELECTOR_FIELDS:
+                if field not in indexed:
+                    self._any[field].add(name)
+                    continue
+                values, patterns = self._combine(indexed[field], decided)
+                for value in values:
+                    self._values[field][value].add(name)
+                for pattern in patterns:
+                    self._patterns[field][pattern].add(name)
+            self._residual[name] = tuple(
+                bst.expressions.compile(selector)
+                for selector in selectors
+                if selector not in decided
+            )
+        self._patterns = {
+            field: [(re.compile(pattern), names) for pattern, names in patterns.items()]
+            for field, patterns in self._patterns.items()
+        }
+        self._candidates = {}
+
+    @staticmethod
+    def _combine(constraints, decided):
+        """Combine the constraints of several selectors on one field
+
+        Constraints that list values are intersected, and otherwise the first constraint
+        is used. Exact selectors whose constraints are used are added to ``decided``.
+        """
+        if all(not patterns for (_, patterns), _, _ in constraints):
+            values = frozenset.intersection(*(values for (values, _), _, _ in constraints))
+            decided.update(selector for _, exact, selector in constraints if exact)
+            return values, ()
+        (values, patterns), exact, selector = constraints[0]
+        if exact:
+            decided.add(selector)
+        return values, patterns
+
+    @classmethod
+    def from_schema(
+        cls,
+        schema: Mapping,
+        sections: tuple[str, ...] = ("checks", "sidecars", "tabular_data"),
+    ) -> "SelectorIndex":
+        """Index the rules in sections of ``schema.rules``
+
+        Rules are named by their path in ``schema.rules``, for example
+        ``"checks.func.RepetitionTimeGreaterThan"``.
+        Groups of rules may be nested, as in ``tabular_data.derivatives``.
+
+        Parameters
+        ----------
+        schema : Mapping
+            The BIDS schema.
+        sections : tuple of str, optional
+            The sections of ``schema.rules`` to index.
+        """
+        rules = {}
+
+        def add_rules(prefix, group):
+            for name, rule in group.items():
+                if "selectors" in rule or not all(
+                    isinstance(value, Mapping) for value in rule.values()
+                ):
+                    rules[f"{prefix}.{name}"] = rule
+                else:
+                    add_rules(f"{prefix}.{name}", rule)
+
+        for section in sections:
+            add_rules(section, schema["rules"][section])
+        return cls(rules)
+
+    def candidates(
+        self, datatype: str | None, suffix: str | None, extension: str | None
+    ) -> tuple[str, ...]:
+        """Find the rules that may apply to a file
+
+        Parameters
+        ----------
+        datatype, suffix, extension : str or None
+            The datatype, suffix and extension of the file, or ``None`` if undefined.
+
+        Returns
+        -------
+        tuple of str
+            The names of the candidate rules, in their original order.
+        """
+        key = (datatype, suffix, extension)
+        try:
+            return self._candidates[key]
+        except KeyError:
+            pass
+        candidates = None
+        for field, value in zip(SELECTOR_FIELDS, key):
+            names = set(self._any[field])
+            if isinstance(value, str):
+                names.update(self._values[field].get(value, ()))
+                for pattern, pattern_names in self._patterns[field]:
+                    if pattern.search(value):
+                        names.update(pattern_names)
+            candidates = names if candidates is None else candidates & names
+        candidates = tuple(sorted(candidates, key=self._order.__getitem__))
+        self._candidates[key] = candidates
+        return candidates
+
+    def select(self, context: lt.Any) -> list[str]:
+        """Find the rules whose selectors are all truthy in a context
+
+        Parameters
+        ----------
+        context : Mapping or object
+            The context of a file, as in :func:`bidsschematools.expressions.evaluate`.
+
+        Returns
+        -------
+        list of str
+            The names of the selected rules, in their original order.
+        """
+        get_property = bst.expressions._get_property
+        candidates = self.candidates(*(get_property(context, field) for field in SELECTOR_FIELDS))
+        truthy = bst.expressions.truthy
+        return [
+            name
+            for name in candidates
+            if all(truthy(selector(context)) for selector in self._residual[name])
+        ]
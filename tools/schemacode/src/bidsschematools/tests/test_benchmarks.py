@@ -0,0 +1,182 @@
+"""Benchmarks of the filename validator over synthetic datasets
+
+The benchmarks are not run by default. To run them, and print a report of the
+throughput, time and peak memory of each stage::
+
+    export BIDSSCHEMATOOLS_BENCHMARK=1
+    pytest -s src/bidsschematools/tests/test_benchmarks.py
+
+Dataset sizes, in number of files, may be set as a comma-separated list in
+``BIDSSCHEMATOOLS_BENCHMARK_SIZES`` (default: ``1000,10000,100000``).
+Peak memory is measured with :mod:`tracemalloc` in a separate run of each stage,
+so that tracing does not distort the timings.
+"""
+
+import os
+import time
+import tracemalloc
+from itertools import count, islice
+
+import pytest
+from click.testing import CliRunner
+
+from bidsschematools.__main__ import cli
+from bidsschematools.conftest import write_tree
+from bidsschematools.rules import filename_matcher, regexify_all
+from bidsschematools.validator import (
+    BidsIgnore,
+    _get_directory_suffixes,
+    _get_paths,
+    validate_all,
+    validate_bids,
+)
+
+from .test_make_testdata import require_env
+
+BENCHMARK_SIZES = [
+    int(size)
+    for size in os.environ.get("BIDSSCHEMATOOLS_BENCHMARK_SIZES", "1000,10000,100000").split(",")
+]
+IGNORE_PATTERNS = ["*.log", "tmp/", "sourcedata/**", "!sourcedata/README"]
+TOP_LEVEL_FILES = ["dataset_description.json", "README", "CHANGES", "participants.tsv"]
+
+
+def _file_templates(schema):
+    """Build filename templates from the entity rules in ``schema.rules.files.raw``
+
+    Templates include the subject, session and run entities when the rule allows them,
+    and any other entities only if the rule requires them.
+    Rules for directories and for wildcard extensions are skipped.
+    """
+    values = {"index": "1", "label": "x1"}
+    templates = []
+    for group in schema.rules.files.raw.values():
+        for rule in group.values():
+            if "entities" not in rule or not rule.get("datatypes"):
+                continue
+            entities = []
+            for ent in schema.rules.entities:
+                if ent not in rule["entities"]:
+                    continue
+                ent_obj = rule["entities"][ent]
+                if isinstance(ent_obj, str):
+                    ent_obj = {"level": ent_obj}
+                entity = {**schema.objects.entities[ent], **ent_obj}
+                if ent in ("subject", "session", "run"):
+                    entities.append(f"{entity['name']}-{{{ent}}}")
+                elif entity["level"] == "required":
+                    if "enum" in entity:
+                        value = entity["enum"][0]
+                        value = value if isinstance(value, str) else value["name"]
+                    else:
+                        value = values[entity["format"]]
+                    entities.append(f"{entity['name']}-{value}")
+
+            directory = "sub-{subject}"
+            if "session" in rule["entities"]:
+                directory += "/ses-{session}"
+            for datatype in rule["datatypes"]:
+                for suffix in rule["suffixes"]:
+                    for ext in rule["extensions"]:
+                        if ext == ".*" or ext.endswith("/"):
+                            continue
+                        templates.append(
+                            f"{directory}/{datatype}/{'_'.join([*entities, suffix])}{ext}"
+                        )
+    return templates
+
+
+def synthetic_paths(schema, n_files, n_sessions=2, n_runs=2):
+    """Generate relative paths of a synthetic dataset from the filename rules of a schema
+
+    Each subject has `n_sessions` sessions, each of which contains one file for every
+    datatype, suffix and extension, with `n_runs` runs where allowed.
+    Each subject also has one log file, which is not valid BIDS.
+
+    Parameters
+    ----------
+    schema : Namespace
+        The BIDS schema.
+    n_files : int
+        The number of paths to generate.
+    n_sessions, n_runs : int, optional
+        The numbers of sessions per subject and runs per acquisition.
+
+    Returns
+    -------
+    list of str
+    """
+    templates = _file_templates(schema)
+
+    def generate():
+        yield from TOP_LEVEL_FILES
+        for subject in count(1):
+            yield f"sub-{subject:05d}/sub-{subject:05d}_scans.log"
+            for session in range(1, n_sessions + 1):
+                for template in templates:
+                    if "{session}" not in template and session > 1:
+                        continue
+                    for run in range(1, n_runs + 1 if "{run}" in template else 2):
+                        yield template.format(subject=f"{subject:05d}", session=session, run=run)
+
+    return list(dict.fromkeys(islice(generate(), n_files)))
+
+
+def _measure(func, *args, **kwargs):
+    """Time a call, and repeat it under tracemalloc to find its peak memory use"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def test_synthetic_paths(schema_obj):
+    paths = synthetic_paths(schema_obj, 5000)
+    assert len(paths) == 5000
+    assert paths[: len(TOP_LEVEL_FILES)] == TOP_LEVEL_FILES
+    assert any("/ses-2/" in path for path in paths)
+    assert any("_run-2_" in path for path in paths)
+
+    regex_schema, _ = regexify_all()
+    result = validate_all(paths, regex_schema, matcher=filename_matcher())
+    assert result["path_tracking"] == [path for path in paths if path.endswith(".log")]
+    assert not [entry for entry in result["schema_tracking"] if entry["mandatory"]]
+
+
+@require_env("BIDSSCHEMATOOLS_BENCHMARK")
+@pytest.mark.parametrize("n_files", BENCHMARK_SIZES)
+def test_benchmark_validator(tmp_path, schema_obj, n_files):
+    regex_schema, _ = regexify_all()
+    matcher = filename_matcher()
+    pseudofile_suffixes = _get_directory_suffixes(schema_obj)
+    paths = synthetic_paths(schema_obj, n_files)
+    write_tree(tmp_path, paths)
+    write_tree(tmp_path, {".bidsignore": "\n".join(IGNORE_PATTERNS) + "\n"})
+    root = str(tmp_path)
+
+    hook_input = "bids-hook-v2\n{}\n" + "".join(
+        f"{line}\n" for line in [*IGNORE_PATTERNS, "0001", *paths]
+    )
+    bidsignore = BidsIgnore(IGNORE_PATTERNS)
+
+    stages = {}
+    walked, *stages["walk"] = _measure(_get_paths, [root], pseudofile_suffixes=pseudofile_suffixes)
+    _, *stages["ignore filtering"] = _measure(lambda: list(bidsignore.filter(paths)))
+    _, *stages["matching"] = _measure(validate_all, walked, regex_schema, matcher=matcher)
+    _, *stages["pre-receive-hook"] = _measure(
+        CliRunner().invoke, cli, ["pre-receive-hook"], input=hook_input
+    )
+    result, *stages["validate_bids"] = _measure(validate_bids, root)
+    assert len(result["path_listing"]) == len(walked)
+
+    print(f"\n{len(paths)} files")
+    print(f"{'stage':<20} {'seconds':>10} {'files/s':>12} {'peak MiB':>10}")
+    for stage, (elapsed, peak) in stages.items():
+        print(f"{stage:<20} {elapsed:>10.3f} {len(paths) / elapsed:>12,.0f} {peak / 2**20:>10.1f}")
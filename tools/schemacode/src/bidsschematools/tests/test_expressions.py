@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import json
+import subprocess
+import sys
 from collections.abc import Mapping
+from dataclasses import dataclass
 from functools import singledispatch
 
 import pytest
 from pyparsing.exceptions import ParseException
 
+from .. import expressions
 from ..expressions import (
     Array,
     ASTNode,
@@ -14,7 +19,15 @@ from ..expressions import (
     Function,
     Property,
     RightOp,
+    ast_from_json,
+    ast_to_json,
+    compile,
+    evaluate,
+    export_expression_table,
     expression,
+    expression_table,
+    parse,
+    truthy,
 )
 from ..types import Namespace
 
@@ -83,6 +96,153 @@ def test_checks(schema_obj):
         assert isinstance(ast, ASTNode)
 
 
+def test_evaluate_expression_tests(schema_obj):
+    for testexp in schema_obj.meta.expression_tests:
+        expr, expected = testexp["expression"], testexp["result"]
+        result = evaluate(parse(expr), {"sidecar": {}})
+        assert result == expected, expr
+        # Distinguish false from 0 and null
+        assert type(result) is type(expected) or not isinstance(expected, bool | None), expr
+
+
+def test_evaluate_context():
+    @dataclass
+    class Dataset:
+        tree: dict
+
+    context = {
+        "path": "/sub-01/func/sub-01_task-rest_bold.nii.gz",
+        "sidecar": {"RepetitionTime": 2, "SliceTiming": [0, 0.5, 1.0, 1.5]},
+        "columns": {"onset": ["1.5", "n/a", "0.5"]},
+        "dataset": Dataset(
+            tree={
+                "participants.tsv": {},
+                "stimuli": {"beep.wav": {}},
+                "sub-01": {"anat": {"sub-01_T1w.nii.gz": {}}},
+            },
+        ),
+    }
+    for expr, expected in [
+        ("sidecar.RepetitionTime * 1000", 2000),
+        ("max(sidecar.SliceTiming) < sidecar.RepetitionTime", True),
+        ("sidecar.SliceTiming[4]", None),
+        ('"SliceTiming" in sidecar', True),
+        ('"VolumeTiming" in sidecar', False),
+        ("!(sidecar.MissingValue > 0)", True),
+        ("sidecar.MissingValue + 1", None),
+        ("1 / 0", None),
+        ("-7 % 3", -1),
+        ("min(columns.onset)", 0.5),
+        ('sorted(columns.onset, "numeric")', ["0.5", "n/a", "1.5"]),
+        ("dataset.tree.stimuli", {"beep.wav": {}}),
+        ('exists("participants.tsv", "dataset")', 1),
+        ('exists(["participants.tsv", "README"], "dataset")', 1),
+        ('exists("beep.wav", "stimuli")', 1),
+        ('exists("anat/sub-01_T1w.nii.gz", "subject")', 1),
+        ('exists("../anat/sub-01_T1w.nii.gz", "file")', 1),
+        ('exists("../../../participants.tsv", "file")', 0),
+        ('exists("bids::sub-01/anat/sub-01_T1w.nii.gz", "bids-uri")', 1),
+        ('exists("bids:other:sub-01/anat/sub-01_T1w.nii.gz", "bids-uri")', 0),
+    ]:
+        assert evaluate(parse(expr), context) == expected, expr
+
+    with pytest.raises(ValueError, match="Unknown function"):
+        evaluate(parse("undefined(1)"), context)
+
+
+def test_evaluate_schema_rules(schema_obj):
+    # Selectors and checks should evaluate without error, even on an empty context
+    for _, rule in walk_schema(
+        schema_obj.rules, lambda k, v: isinstance(v, Mapping) and v.get("selectors")
+    ):
+        for expr in rule.get("selectors", []) + rule.get("checks", []):
+            assert truthy(evaluate(parse(expr), {})) in (True, False)
+
+
+def test_compile(schema_obj):
+    contexts = [
+        {},
+        {"sidecar": {}},
+        {
+            "suffix": "bold",
+            "datatype": "func",
+            "extension": ".nii.gz",
+            "sidecar": {"RepetitionTime": 2, "SliceTiming": [0, 1], "Units": "rad"},
+            "entities": {"subject": "01", "part": "phase"},
+        },
+    ]
+    expressions = [testexp["expression"] for testexp in schema_obj.meta.expression_tests]
+    for _, rule in walk_schema(
+        schema_obj.rules, lambda k, v: isinstance(v, Mapping) and v.get("selectors")
+    ):
+        expressions.extend(rule.get("selectors", []) + rule.get("checks", []))
+
+    # Compiled expressions agree with the interpreter
+    for expr in expressions:
+        func = compile(expr)
+        assert compile(expr) is func
+        for context in contexts:
+            result = func(context)
+            expected = evaluate(parse(expr), context)
+            assert result == expected and type(result) is type(expected), expr
+
+
+def test_compile_folding():
+    class RecordingContext(dict):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.accessed = []
+
+        def get(self, key, default=None):
+            self.accessed.append(key)
+            return super().get(key, default)
+
+    for expr, expected in [
+        ("1 + 2 * 3", 7),
+        ('type(length(["a", "b"]) - 1)', "number"),
+        ('substr("sub-01", 0, 3)', "sub"),
+        ("false && sidecar.Units", False),
+        ("!(true || sidecar.Units)", False),
+        ('intersects([], ["a"]) && sidecar.Units == "rad"', False),
+    ]:
+        context = RecordingContext(sidecar={"Units": "rad"})
+        assert compile(expr)(context) == expected, expr
+        assert context.accessed == [], expr
+
+    # Mutable constants are not shared between evaluations
+    func = compile("[1, 2]")
+    func({}).append(3)
+    assert func({}) == [1, 2]
+
+    with pytest.raises(ValueError, match="Unknown function"):
+        compile("undefined(sidecar.Units)")
+
+
+def test_expression_table(schema_obj):
+    table = expression_table(schema_obj)
+    # Includes selectors, checks and association selectors
+    assert "extension != '.json'" in table
+    assert 'intersects([sidecar.Units], ["rad", "arbitrary"])' in table
+    assert all(parse(expr) is ast for expr, ast in table.items())
+
+    # Serialized trees are equivalent to parsed trees
+    exported = json.loads(export_expression_table(schema_obj))
+    assert exported.keys() == table.keys()
+    for expr, serialized in exported.items():
+        ast = ast_from_json(serialized)
+        assert str(ast) == str(table[expr])
+        assert ast_to_json(ast) == serialized
+
+
+def test_parse_bundled_table(monkeypatch):
+    monkeypatch.setattr(
+        expressions, "_bundled_expressions", lambda: {"a + b": ["BinOp", "x", "-", "y"]}
+    )
+    parse_uncached = parse.__wrapped__
+    assert str(parse_uncached("a + b")) == "(x - y)"
+    assert str(parse_uncached("a * b")) == "(a * b)"
+
+
 @pytest.mark.parametrize(
     "expr",
     (
@@ -94,6 +254,47 @@ def test_checks(schema_obj):
 def test_expected_failures(expr):
     with pytest.raises(ParseException):
         expression.parse_string(expr)
+    with pytest.raises(ValueError, match="Invalid expression"):
+        parse.__wrapped__(expr)
+
+
+@pytest.mark.parametrize(
+    "expr",
+    (
+        "x-1",
+        "x - -1",
+        "10 ** -3 * +2.5e1",
+        "[1.] + [.5] + [1e3]",
+        "a.b.c[0][1][2].d(3, 4)",
+        "f()(1)[2]",
+        "[[], {}, []][0]",
+        '\'it\'\'s\' + "say ""hi""" + "a\\"b"',  # Escaped quotes
+        "a inb",
+        "!!a",
+        "a <= b < c != d",
+        " x  ==\ty ",
+    ),
+)
+def test_parser_edge_cases(expr):
+    reference = expression.parse_string(expr)[0]
+    assert ast_to_json(parse.__wrapped__(expr)) == ast_to_json(reference)
+
+
+def test_parser_matches_reference(schema_obj):
+    # The recursive descent parser produces the same trees as the reference grammar
+    exprs = set(expression_table(schema_obj))
+    exprs.update(testexp["expression"] for testexp in schema_obj.meta.expression_tests)
+    for expr in exprs:
+        reference = expression.parse_string(expr)[0]
+        assert ast_to_json(parse.__wrapped__(expr)) == ast_to_json(reference), expr
+
+
+def test_no_pyparsing_import():
+    code = (
+        "import sys; from bidsschematools.expressions import compile; "
+        "compile('length(sidecar.x) > 0'); assert 'pyparsing' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
 
 
 def walk_schema(schema_obj, predicate):
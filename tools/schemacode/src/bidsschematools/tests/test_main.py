@@ -0,0 +1,30 @@
+import json
+
+from click.testing import CliRunner
+
+from bidsschematools import __main__, rules
+from bidsschematools.__main__ import cli
+
+
+def test_pre_receive_hook_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("BIDSSCHEMATOOLS_CACHE_DIR", str(tmp_path))
+    # Each invocation reads the cache, as separate hook processes would
+    monkeypatch.setattr(__main__, "regexify_all", rules.regexify_all.__wrapped__)
+    description = json.dumps({"Name": "Example", "DatasetType": "derivative"})
+    files = ["dataset_description.json", "sub-01/anat/sub-01_desc-preproc_T1w.nii.gz"]
+    hook_input = "\n".join(["bids-hook-v2", description, "0001", *files, ""])
+
+    result = CliRunner().invoke(cli, ["pre-receive-hook"], input=hook_input)
+    assert (result.exit_code, result.output) == (0, "")
+    (cache_file,) = (tmp_path / "rules").glob("regexes-*.json")
+
+    # A second invocation reads the regexes of derivative datasets from the cache
+    cache_file.write_text('[{"regex": "dataset_description\\\\.json\\\\Z", "mandatory": false}]')
+    result = CliRunner().invoke(cli, ["pre-receive-hook"], input=hook_input)
+    assert (result.exit_code, result.output) == (1, f"{files[1]}\n")
+
+    # Raw datasets use other regexes
+    hook_input = hook_input.replace("derivative", "raw")
+    result = CliRunner().invoke(cli, ["pre-receive-hook"], input=hook_input)
+    assert result.exit_code == 1
+    assert len(list((tmp_path / "rules").glob("regexes-*.json"))) == 2
@@ -1,6 +1,6 @@
 import re
 
-from bidsschematools import rules
+from bidsschematools import expressions, rules
 
 from ..types import Namespace
 
@@ -154,3 +154,137 @@ def test_regexify_all():
     for entry in schema_all:
         assert "regex" in entry
         assert "mandatory" in entry
+
+
+def test_regexify_all_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("BIDSSCHEMATOOLS_CACHE_DIR", str(tmp_path))
+
+    def regexify_all():
+        return rules.regexify_all.__wrapped__(cache=True)
+
+    # Caching on disk is opt-in
+    schema_all, schema = rules.regexify_all.__wrapped__()
+    assert not (tmp_path / "rules").exists()
+
+    assert regexify_all()[0] == schema_all
+    (cache_file,) = (tmp_path / "rules").glob("regexes-*.json")
+    assert schema.schema_version in cache_file.name
+    assert schema.bids_version in cache_file.name
+    assert regexify_all()[0] == schema_all
+
+    # Cached regexes are used in preference to regenerating them
+    cache_file.write_text('[{"regex": "x", "mandatory": false}]')
+    assert regexify_all()[0] == [{"regex": "x", "mandatory": False}]
+
+    # Unreadable and malformed caches are regenerated
+    for content in ("[{", '{"regex": "x"}', '[{"regex": 1, "mandatory": false}]', "[1]"):
+        cache_file.write_text(content)
+        assert regexify_all()[0] == schema_all
+        assert regexify_all()[0] == schema_all
+
+    # Changes to how regexes are constructed invalidate the cache
+    with monkeypatch.context() as patch:
+        patch.setattr(rules, "_source_digest", lambda: "changed")
+        assert rules._regex_cache_path(schema) != cache_file
+
+    # An empty cache directory disables caching
+    monkeypatch.setenv("BIDSSCHEMATOOLS_CACHE_DIR", "")
+    cache_file.unlink()
+    assert regexify_all()[0] == schema_all
+    assert not cache_file.exists()
+
+
+def test_filename_matcher():
+    regex_schema, _ = rules.regexify_all()
+    matcher = rules.filename_matcher()
+    assert len(matcher) == len(regex_schema)
+
+    paths = [
+        "/data/dataset_description.json",
+        "/data/README.md",
+        "/data/participants.tsv",
+        "/data/code/script.py",
+        "/data/task-rest_bold.json",
+        "/data/sub-01/anat/sub-01_T1w.nii.gz",
+        "/data/sub-01/ses-1/anat/sub-01_ses-1_acq-mp2rage_T1w.json",
+        "/data/sub-01/ses-1/func/sub-01_ses-1_task-rest_run-1_bold.nii.gz",
+        "/data/sub-01/ses-1/func/sub-01_ses-2_task-rest_bold.nii.gz",
+        "/data/sub-01/dwi/sub-01_dwi.bval",
+        "/data/sub-01/micr/sub-01_sample-A_SEM.ome.zarr/",
+        "/data/sub-01/anat/sub-01_T1w.nii.gz.bak",
+        "/data/phenotype/measure.tsv",
+    ]
+    for path in paths:
+        for idx, regex_entry in enumerate(regex_schema):
+            expected = re.match(r"(?:.*/)?" + regex_entry["regex"], path)
+            if expected:
+                assert matcher.match(path) == (idx, expected.groupdict())
+                break
+        else:
+            assert matcher.match(path) is None
+
+
+def test_filename_index():
+    regex_schema, _ = rules.regexify_all()
+    index = rules.FilenameIndex(regex_schema)
+
+    paths = [
+        "dataset_description.json",
+        "README",
+        "participants.tsv",
+        "code/script.py",
+        "task-rest_bold.json",
+        "sub-01/anat/sub-01_T1w.nii.gz",
+        "sub-01/func/sub-01_task-rest_physio.tsv.gz",
+        "sub-01/micr/sub-01_sample-A_SEM.ome.zarr/",
+        "phenotype/measure.v2.tsv",
+    ]
+    for path in paths:
+        candidates = index.candidates(path)
+        # Every rule that matches the path must be a candidate
+        for idx, regex_entry in enumerate(regex_schema):
+            if re.match(r"(?:.*/)?" + regex_entry["regex"], path):
+                assert idx in candidates, (path, regex_entry["regex"])
+        assert list(candidates) == sorted(candidates)
+
+    # Indexed filenames require only a handful of attempts
+    assert len(index.candidates("sub-01/anat/sub-01_T1w.nii.gz")) < len(regex_schema) // 4
+
+
+def test_selector_index(schema_obj):
+    index = rules.SelectorIndex.from_schema(schema_obj)
+    assert "checks.func.RepetitionTimeGreaterThan" in index.rules
+
+    keys = {(None, "participants", ".tsv"), (None, "description", ".json"), ("anat", "T1w", None)}
+    for group in schema_obj.rules.files.raw.values():
+        for rule in group.values():
+            for datatype in rule.get("datatypes", [None]):
+                for suffix in rule.get("suffixes", [None]):
+                    for ext in rule.get("extensions", [None]):
+                        keys.add((datatype, suffix, ext))
+
+    n_candidates = 0
+    for datatype, suffix, extension in sorted(keys, key=str):
+        context = {
+            "datatype": datatype,
+            "suffix": suffix,
+            "extension": extension,
+            "sidecar": {},
+            "entities": {},
+            "dataset": {"dataset_description": {}, "modalities": [], "datatypes": []},
+        }
+        expected = [
+            name
+            for name, rule in index.rules.items()
+            if all(
+                expressions.truthy(expressions.evaluate(expressions.parse(selector), context))
+                for selector in rule.get("selectors", [])
+            )
+        ]
+        candidates = index.candidates(datatype, suffix, extension)
+        assert set(expected) <= set(candidates)
+        assert index.select(context) == expected
+        n_candidates += len(candidates)
+
+    # Most rules are excluded by datatype, suffix or extension alone
+    assert n_candidates / len(keys) < len(index.rules) / 4
@@ -0,0 +1,87 @@
+import pytest
+
+from bidsschematools import expressions
+from bidsschematools.conftest import write_tree
+from bidsschematools.types import context as ctx
+from bidsschematools.validation import DatasetContext
+
+FILES = {
+    "dataset_description.json": {"Name": "Test", "BIDSVersion": "1.10.0"},
+    "task-rest_events.tsv": "onset\tduration\n0\t1\n5\t1\n",
+    "task-rest_events.json": {"onset": {"Units": "s"}},
+    "sub-01/func/sub-01_task-rest_bold.nii.gz": "",
+    "sub-01/func/sub-01_task-rest_run-1_physio.tsv.gz": "",
+    "sub-01/func/sub-01_task-rest_run-1_bold.nii.gz": "",
+    "sub-01/func/sub-01_task-rest_run-1_events.tsv": "onset\tduration\n1\t1\n",
+    "sub-01/func/sub-01_task-nback_bold.nii.gz": "",
+    "sub-01/perf/sub-01_asl.nii.gz": "",
+    "sub-01/perf/sub-01_aslcontext.tsv": "volume_type\ncontrol\nlabel\nm0scan\n",
+    "sub-01/perf/sub-01_m0scan.nii.gz": "",
+    "sub-01/dwi/sub-01_dwi.nii.gz": "",
+    "sub-01/dwi/sub-01_dwi.bvec": "0 1 0\n0 0 1\n1 0 0\n",
+    "dwi.bval": "0 1000 1000\n",
+    "sub-01/eeg/sub-01_task-rest_eeg.edf": "",
+    "sub-01/eeg/sub-01_task-rest_channels.tsv": "name\ttype\tunits\nFp1\tEEG\tuV\n",
+    "sub-01/eeg/sub-01_space-CapTrak_electrodes.tsv": "name\tx\ty\tz\n",
+    "sub-01/eeg/sub-01_space-CapTrak_coordsystem.json": {"EEGCoordinateSystem": "CapTrak"},
+}
+
+
+@pytest.fixture
+def dataset(tmp_path, schema_obj):
+    write_tree(tmp_path, FILES)
+    return DatasetContext(tmp_path, schema=schema_obj)
+
+
+def test_associations(dataset):
+    associations = dataset.context("sub-01/func/sub-01_task-rest_bold.nii.gz").associations
+    assert associations.events == ctx.Events(
+        path="/task-rest_events.tsv", onset=["0", "5"], sidecar={"onset": {"Units": "s"}}
+    )
+    assert associations.physio is None
+    assert associations.aslcontext is None
+
+    # The most specific and deepest file takes precedence
+    associations = dataset.context("sub-01/func/sub-01_task-rest_run-1_bold.nii.gz").associations
+    assert associations.events.path == "/sub-01/func/sub-01_task-rest_run-1_events.tsv"
+    assert associations.physio.path == "/sub-01/func/sub-01_task-rest_run-1_physio.tsv.gz"
+    assert dataset.context("sub-01/func/sub-01_task-nback_bold.nii.gz").associations.events is None
+
+    associations = dataset.context("sub-01/perf/sub-01_asl.nii.gz").associations
+    assert associations.aslcontext == ctx.Aslcontext(
+        path="/sub-01/perf/sub-01_aslcontext.tsv",
+        n_rows=3,
+        volume_type=["control", "label", "m0scan"],
+    )
+    assert associations.m0scan == ctx.M0scan(path="/sub-01/perf/sub-01_m0scan.nii.gz")
+
+    associations = dataset.context("sub-01/dwi/sub-01_dwi.nii.gz").associations
+    assert associations.bval == ctx.Bval(
+        path="/dwi.bval", n_cols=3, n_rows=1, values=[0.0, 1000.0, 1000.0]
+    )
+    assert associations.bvec == ctx.Bvec(path="/sub-01/dwi/sub-01_dwi.bvec", n_cols=3, n_rows=3)
+
+    # Electrodes and coordinate systems may have a space entity that the data file does not
+    associations = dataset.context("sub-01/eeg/sub-01_task-rest_eeg.edf").associations
+    assert associations.channels.type == ["EEG"]
+    assert associations.electrodes.path == "/sub-01/eeg/sub-01_space-CapTrak_electrodes.tsv"
+    assert associations.coordsystem is None
+
+    full_associations = associations.to_context()
+    assert isinstance(full_associations, ctx.Associations)
+    assert full_associations.channels == associations.channels
+
+
+def test_association_selectors(dataset):
+    context = dataset.context("sub-01/perf/sub-01_asl.nii.gz")
+    volume_types = expressions.compile("associations.aslcontext.volume_type")
+    assert volume_types(context) == ["control", "label", "m0scan"]
+    assert expressions.compile('type(associations.m0scan) != "null"')(context) is True
+    assert "events" not in vars(context.associations)
+
+    context = dataset.context("sub-01/func/sub-01_task-rest_bold.nii.gz")
+    assert expressions.compile("length(associations.events.onset)")(context) == 2
+
+    # JSON files do not have associations
+    context = dataset.context("task-rest_events.json")
+    assert context.associations.events is None
@@ -0,0 +1,103 @@
+import json
+import zlib
+
+import pytest
+
+from bidsschematools.validation import (
+    CheckRunner,
+    DatasetContext,
+    Issue,
+    IssueReport,
+    TabularValidator,
+)
+
+
+def test_issue_report():
+    report = IssueReport(max_locations=3)
+    report.update(Issue("A", "warning", location=f"/{idx}.json") for idx in range(1000))
+    report.add(Issue("A", "warning", location="/0.json"))
+    report.add(Issue("B", "error"))
+    assert list(report) == ["A", "B"]
+    assert report["A"].count == 1001
+    assert report["A"].locations == ["/0.json", "/1.json", "/2.json"]
+    assert report["B"].locations == []
+    assert report.counts() == {"error": 1, "warning": 1001}
+    assert repr(report) == "<IssueReport 2 codes, 1 errors, 1001 warnings>"
+
+
+def test_check_runner(tmp_path, schema_obj):
+    (tmp_path / "dataset_description.json").write_text(
+        json.dumps({"Name": "Example", "BIDSVersion": "1.10.0"})
+    )
+    (tmp_path / "participants.tsv").write_text("participant_id\nsub-01\nsub-01\n")
+    (tmp_path / "task-rest_bold.json").write_text(
+        json.dumps({"TaskName": "rest", "RepetitionTime": 2000})
+    )
+    paths = ["dataset_description.json", "participants.tsv", "task-rest_bold.json"]
+    for sub in range(1, 6):
+        func = tmp_path / f"sub-0{sub}" / "func"
+        func.mkdir(parents=True)
+        (func / f"sub-0{sub}_task-rest_bold.nii.gz").write_bytes(b"")
+        paths.append(f"sub-0{sub}/func/sub-0{sub}_task-rest_bold.nii.gz")
+    dataset = DatasetContext(tmp_path, schema=schema_obj, paths=paths)
+    runner = CheckRunner(schema_obj, validators=[TabularValidator(schema_obj)])
+
+    batches = list(runner.iter_batches(dataset, batch_size=3))
+    assert [len(batch) for batch, _ in batches] == [3, 3, 2]
+
+    report = runner.run(dataset, report=IssueReport(max_locations=2))
+    summary = report["REPETITION_TIME_GREATER_THAN"]
+    assert summary.count == 5
+    assert summary.level == "warning"
+    assert summary.locations == [
+        "/sub-01/func/sub-01_task-rest_bold.nii.gz",
+        "/sub-02/func/sub-02_task-rest_bold.nii.gz",
+    ]
+    assert report["TSV_INDEX_VALUE_NOT_UNIQUE"].locations == ["/participants.tsv"]
+    assert report.counts()["warning"] >= 5
+
+    # Files that cannot be read are reported, and do not stop the run
+    (tmp_path / "participants.tsv").write_bytes(b"participant_id\n\xff\n")
+    report = runner.run(dataset, ["participants.tsv"])
+    assert list(report) == ["FILE_READ"]
+    assert report["FILE_READ"].locations == ["/participants.tsv"]
+
+
+class _FailingValidator:
+    """A validator that cannot read some files, and has a bug for others"""
+
+    def validate(self, context):
+        if "sub-02" in context.path:
+            raise zlib.error("Error -3 while decompressing data")
+        if "sub-03" in context.path:
+            raise KeyError(5)
+        return []
+
+
+class _EveryFileValidator:
+    def validate(self, context):
+        return [Issue("EVERY_FILE", "warning", location=context.path)]
+
+
+def test_check_runner_errors(tmp_path, schema_obj):
+    paths = []
+    for sub in range(1, 4):
+        anat = tmp_path / f"sub-0{sub}" / "anat"
+        anat.mkdir(parents=True)
+        (anat / f"sub-0{sub}_T1w.nii.gz").write_bytes(b"")
+        paths.append(f"sub-0{sub}/anat/sub-0{sub}_T1w.nii.gz")
+    dataset = DatasetContext(tmp_path, schema=schema_obj, paths=paths)
+    runner = CheckRunner(schema_obj, validators=[_FailingValidator(), _EveryFileValidator()])
+
+    # Unreadable files are reported, and keep the issues of the other validators
+    issues = runner.validate(dataset.context(paths[1]))
+    assert [(issue.code, issue.detail) for issue in issues] == [
+        ("EVERY_FILE", None),
+        ("FILE_READ", "error: Error -3 while decompressing data"),
+    ]
+    report = runner.run(dataset, paths[:2])
+    assert (report["FILE_READ"].count, report["EVERY_FILE"].count) == (1, 2)
+
+    # Bugs are not reported as unreadable files
+    with pytest.raises(KeyError):
+        runner.validate(dataset.context(paths[2]))
@@ -0,0 +1,127 @@
+import pytest
+
+from bidsschematools import expressions
+from bidsschematools.conftest import write_tree
+from bidsschematools.types import context as ctx
+from bidsschematools.validation.context import DatasetContext
+from bidsschematools.validator import _get_directory_suffixes, _get_paths
+
+FILES = {
+    "dataset_description.json": {"Name": "Test", "BIDSVersion": "1.10.0"},
+    "participants.tsv": "participant_id\tage\nsub-01\t34\nsub-02\tn/a\n",
+    "task-rest_bold.json": {"RepetitionTime": 2, "TaskName": "rest"},
+    "sub-01/sub-01_sessions.tsv": "session_id\nses-1\n",
+    "sub-01/ses-1/func/sub-01_ses-1_task-rest_bold.json": {"RepetitionTime": 1.5},
+    "sub-01/ses-1/func/sub-01_ses-1_task-rest_bold.nii.gz": "",
+    "sub-01/ses-1/anat/sub-01_ses-1_T1w.nii.gz": "",
+    "sub-02/func/sub-02_task-rest_bold.nii.gz": "",
+    "sub-02/eeg/sub-02_task-rest_eeg.edf": "",
+    "extra/notes.txt": "notes",
+    ".bidsignore": "extra/\n",
+}
+
+
+@pytest.fixture
+def dataset(tmp_path, schema_obj):
+    write_tree(tmp_path, FILES)
+    return DatasetContext(tmp_path, schema=schema_obj)
+
+
+def test_dataset_context(dataset):
+    # Hidden files are not listed
+    assert sorted(dataset.paths) == sorted(set(FILES) - {".bidsignore"})
+    assert dataset.ignored == ["extra/notes.txt"]
+    assert "extra/notes.txt" not in dataset.files
+    assert dataset.tree["sub-01"]["ses-1"]["func"]["sub-01_ses-1_task-rest_bold.nii.gz"] == {}
+    assert dataset.dataset_description["Name"] == "Test"
+    assert dataset.datatypes == ["anat", "eeg", "func"]
+    assert dataset.modalities == ["eeg", "mri"]
+    assert dataset.subjects == ctx.Subjects(
+        sub_dirs=["sub-01", "sub-02"], participant_id=["sub-01", "sub-02"]
+    )
+    assert dataset.subject("sub-01").sessions == ctx.Sessions(
+        ses_dirs=["ses-1"], session_id=["ses-1"]
+    )
+    assert dataset.subject("sub-02").sessions == ctx.Sessions(ses_dirs=[])
+
+
+def test_dataset_files(tmp_path, schema_obj):
+    """Files are listed as they are by the validator"""
+    write_tree(
+        tmp_path,
+        {
+            "dataset_description.json": {},
+            "sub-01/micr/sub-01_sample-A_SPIM.ome.zarr/.zattrs": {},
+            "sub-01/micr/sub-01_sample-A_SPIM.json": {},
+            "derivatives/pipeline/dataset_description.json": {},
+            "sourcedata/raw.dat": "",
+            ".bidsignore": "sourcedata/\n",
+        },
+    )
+
+    dataset = DatasetContext(tmp_path, schema=schema_obj, max_workers=2)
+    assert "sub-01/micr/sub-01_sample-A_SPIM.ome.zarr/" in dataset.paths
+    assert not any(path.startswith("derivatives/pipeline/") for path in dataset.paths)
+    assert dataset.ignored == ["sourcedata/raw.dat"]
+    expected = _get_paths([str(tmp_path)], _get_directory_suffixes(schema_obj))
+    assert [f"{tmp_path.as_posix()}/{path}" for path in dataset.files] == expected
+
+
+def test_file_context(dataset):
+    context = dataset.context("sub-01/ses-1/func/sub-01_ses-1_task-rest_bold.nii.gz")
+    assert context.path == "/sub-01/ses-1/func/sub-01_ses-1_task-rest_bold.nii.gz"
+    assert context.entities == {"subject": "01", "session": "1", "task": "rest"}
+    assert (context.datatype, context.suffix, context.extension) == ("func", "bold", ".nii.gz")
+    assert context.modality == "mri"
+    assert context.size == 0
+    # The most specific sidecar takes precedence
+    assert context.sidecar == {"RepetitionTime": 1.5, "TaskName": "rest"}
+    assert context.subject.sessions.ses_dirs == ["ses-1"]
+    assert context.json is None
+    assert context.columns is None
+
+    context = dataset.context("sub-02/func/sub-02_task-rest_bold.nii.gz")
+    assert context.sidecar == {"RepetitionTime": 2, "TaskName": "rest"}
+    assert dataset.context("sub-02/eeg/sub-02_task-rest_eeg.edf").sidecar == {}
+
+    context = dataset.context("participants.tsv")
+    assert context.subject is None
+    assert context.datatype is None
+    assert context.columns == {"participant_id": ["sub-01", "sub-02"], "age": ["34", "n/a"]}
+
+    context = dataset.context("task-rest_bold.json")
+    assert context.json == {"RepetitionTime": 2, "TaskName": "rest"}
+    assert context.sidecar == {}
+
+    full_context = context.to_context()
+    assert isinstance(full_context, ctx.Context)
+    assert full_context.dataset is dataset.dataset
+    assert full_context.associations == ctx.Associations()
+
+
+def test_file_context_is_lazy(dataset, monkeypatch):
+    loaded = []
+    load_json = DatasetContext.load_json
+    monkeypatch.setattr(
+        DatasetContext,
+        "load_json",
+        lambda self, path: loaded.append(path) or load_json(self, path),
+    )
+
+    context = dataset.context("sub-01/ses-1/func/sub-01_ses-1_task-rest_bold.nii.gz")
+    assert expressions.evaluate(expressions.parse('suffix == "bold"'), context) is True
+    assert expressions.compile('match(extension, "^\\.nii")')(context) is True
+    assert not loaded
+    assert "sidecar" not in vars(context)
+
+    assert expressions.compile("sidecar.RepetitionTime > 1")(context) is True
+    assert len(loaded) == 2
+    # Namespaces are computed only once
+    assert expressions.compile("sidecar.RepetitionTime < 2")(context) is True
+    assert len(loaded) == 2
+
+    # Dataset namespaces are computed once for all files
+    exists = expressions.compile('exists("participants.tsv", "dataset")')
+    assert exists(context) == 1
+    assert exists(dataset.context("sub-02/func/sub-02_task-rest_bold.nii.gz")) == 1
+    assert loaded.count("dataset_description.json") == 1
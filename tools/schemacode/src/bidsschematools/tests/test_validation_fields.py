@@ -0,0 +1,139 @@
+import pytest
+
+from bidsschematools.validation import DatasetContext, FieldValidator, compile_definition
+
+VALUES = [
+    None,
+    True,
+    False,
+    0,
+    -1,
+    1.0,
+    2.5,
+    "",
+    "n/a",
+    "raw",
+    [],
+    [0, 1],
+    [1.5, -1],
+    ["a", "b"],
+    {},
+]
+VALUES += [{"Type": "docker"}, {"Dataset": 1}, {"a": [1]}]
+
+
+@pytest.fixture(scope="module")
+def validator(schema_obj):
+    return FieldValidator(schema_obj)
+
+
+def _without_formats(definition):
+    if isinstance(definition, dict):
+        return {
+            key: _without_formats(value) for key, value in definition.items() if key != "format"
+        }
+    if isinstance(definition, list):
+        return [_without_formats(value) for value in definition]
+    return definition
+
+
+def test_compile_definition(schema_obj):
+    """Compiled definitions accept the same values as JSON Schema"""
+    jsonschema = pytest.importorskip("jsonschema")
+    for key, definition in schema_obj.objects.metadata.items():
+        definition = _without_formats(definition.to_dict())
+        check = compile_definition(definition, schema_obj.objects.formats)
+        expected = jsonschema.Draft202012Validator(definition)
+        for value in VALUES:
+            assert (check(value) is None) == expected.is_valid(value), (key, value)
+
+
+def test_compile_formats(schema_obj):
+    check = compile_definition({"type": "string", "format": "uri"}, schema_obj.objects.formats)
+    assert check("https://example.com") is None
+    check = compile_definition({"type": "string", "format": "rrid"}, schema_obj.objects.formats)
+    assert check("SCR_002881") == "must match the format 'rrid'"
+    check = compile_definition({"type": "string", "enum": ["a"], "pattern": "a"}, {})
+    assert check("b") == "must be one of ['a']"
+    # Booleans are not numbers, as in JSON
+    check = compile_definition({"enum": [0, 1]}, {})
+    assert check(True) == "must be one of [0, 1]"
+    assert check(False) == "must be one of [0, 1]"
+    assert check(1.0) is None
+    assert compile_definition({"enum": [[1]]}, {})([True]) == "must be one of [[1]]"
+    check = compile_definition({"anyOf": [{"type": "number"}, {"enum": ["n/a"]}]}, {})
+    assert check("x") == "must be a number or must be one of ['n/a']"
+
+
+def test_validate_json(validator):
+    context = {
+        "path": "/dataset_description.json",
+        "json": {
+            "Name": "Example",
+            "BIDSVersion": "1.10.0",
+            "DatasetType": "processed",
+            "Authors": ["A", 1],
+            "License": "CC0",
+        },
+    }
+    issues = validator.validate(context)
+    invalid = [(issue.subcode, issue.detail) for issue in issues if issue.level == "error"]
+    assert invalid == [
+        ("DatasetType", "DatasetType must be one of ['raw', 'derivative', 'study']"),
+        ("Authors", "Authors item 1 must be a string"),
+    ]
+    assert {issue.code for issue in issues} == {
+        "JSON_SCHEMA_VALIDATION_ERROR",
+        "JSON_KEY_RECOMMENDED",
+    }
+
+    del context["json"]["Name"]
+    context["json"]["Authors"] = []
+    codes = [issue.code for issue in validator.validate(context)]
+    assert "JSON_KEY_REQUIRED" in codes
+    # Issues defined by rules take precedence
+    assert "NO_AUTHORS" not in codes
+    context["json"].pop("Authors")
+    assert "NO_AUTHORS" in [issue.code for issue in validator.validate(context)]
+
+
+def test_validate_sidecar(tmp_path, validator):
+    func = tmp_path / "sub-01" / "func"
+    func.mkdir(parents=True)
+    (tmp_path / "task-rest_bold.json").write_text('{"TaskName": "rest", "RepetitionTime": -2}')
+    (func / "sub-01_task-rest_bold.nii.gz").write_bytes(b"")
+    (func / "sub-01_task-rest_bold.json").write_text('{"RepetitionTime": 2}')
+    dataset = DatasetContext(tmp_path, schema=validator.schema)
+
+    context = dataset.context("sub-01/func/sub-01_task-rest_bold.nii.gz")
+    issues = validator.validate(context)
+    assert not [issue for issue in issues if issue.level == "error"]
+    assert all(issue.location == context.path for issue in issues)
+    assert ("SIDECAR_KEY_RECOMMENDED", "TaskDescription") in [
+        (issue.code, issue.subcode) for issue in issues
+    ]
+
+    (func / "sub-01_task-rest_bold.json").write_text('{"RepetitionTime": 0}')
+    dataset = DatasetContext(tmp_path, schema=validator.schema)
+    context = dataset.context("sub-01/func/sub-01_task-rest_bold.nii.gz")
+    errors = [issue for issue in validator.validate(context) if issue.level == "error"]
+    assert [(issue.code, issue.detail) for issue in errors] == [
+        ("SIDECAR_FIELD_VALUE_INVALID", "RepetitionTime must be greater than 0")
+    ]
+    assert validator.check("RepetitionTime", 0) == "must be greater than 0"
+
+
+def test_validate_redefined_fields(validator):
+    context = {
+        "path": "/sub-01/fmap/sub-01_echo-1_phase1.nii.gz",
+        "datatype": "fmap",
+        "suffix": "phase1",
+        "extension": ".nii.gz",
+        "entities": {"subject": "01", "echo": "1"},
+        "sidecar": {"EchoTime": [0.01, 0.02]},
+    }
+    # The array is a valid EchoTime, but not a valid EchoTime__fmap
+    issues = validator.validate(context)
+    assert [(issue.rule, issue.detail) for issue in issues if issue.level == "error"] == [
+        ("sidecars.fmap.MRIFieldmapTwoPhase", "EchoTime must be a number")
+    ]
@@ -0,0 +1,119 @@
+import gzip
+import io
+import os
+import struct
+
+import pytest
+
+from bidsschematools import expressions
+from bidsschematools.types import context as ctx
+from bidsschematools.validation import (
+    DatasetContext,
+    parse_gzip_header,
+    read_gzip_header,
+    read_gzip_headers,
+)
+
+
+def _compress(data, filename=None, mtime=0):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(filename=filename or "", mode="wb", fileobj=buffer, mtime=mtime) as fobj:
+        fobj.write(data)
+    return buffer.getvalue()
+
+
+def _header(flags=0, mtime=0, extra=None, filename=None, comment=None):
+    header = struct.pack("<BBBBIBB", 0x1F, 0x8B, 8, flags, mtime, 0, 3)
+    if extra is not None:
+        header += struct.pack("<H", len(extra)) + extra
+    for field in (filename, comment):
+        if field is not None:
+            header += field.encode("latin-1") + b"\x00"
+    if flags & 0x02:
+        header += b"\x00\x00"
+    return header
+
+
+def test_parse_gzip_header():
+    assert parse_gzip_header(_compress(b"data")) == ctx.Gzip(timestamp=0)
+    header = parse_gzip_header(_compress(b"data", filename="sub-01_T1w.nii", mtime=1700000000))
+    assert header == ctx.Gzip(timestamp=1700000000, filename="sub-01_T1w.nii")
+
+    data = _header(
+        flags=0x02 | 0x04 | 0x08 | 0x10,
+        mtime=1,
+        extra=b"\x00" * 300,
+        filename="café.nii",
+        comment="converted",
+    )
+    assert parse_gzip_header(data) == ctx.Gzip(
+        timestamp=1, filename="café.nii", comment="converted"
+    )
+    # Headers are complete only with the header CRC
+    with pytest.raises(ValueError, match="ends before"):
+        parse_gzip_header(data[:-1])
+    with pytest.raises(ValueError, match="ends before"):
+        parse_gzip_header(data[:320])
+
+    with pytest.raises(ValueError, match="does not start"):
+        parse_gzip_header(b"\x89PNG\r\n\x1a\n")
+    with pytest.raises(ValueError, match="does not start"):
+        parse_gzip_header(b"\x1f\x00")
+    with pytest.raises(ValueError, match="method"):
+        parse_gzip_header(b"\x1f\x8b\x07" + b"\x00" * 7)
+
+
+def test_read_gzip_header(tmp_path):
+    # Only the header is read, so truncated and corrupt data is not noticed
+    compressed = _compress(os.urandom(1 << 16), filename="sub-01_bold.nii", mtime=5)
+    path = tmp_path / "sub-01_bold.nii.gz"
+    path.write_bytes(compressed[: len(compressed) // 2])
+    header = read_gzip_header(path)
+    assert header == ctx.Gzip(timestamp=5, filename="sub-01_bold.nii")
+    assert read_gzip_header(str(path)) is header
+
+    # Long comments are read in several chunks
+    comment = "x" * 5000
+    path = tmp_path / "comment.gz"
+    path.write_bytes(_header(flags=0x10, comment=comment))
+    assert read_gzip_header(path).comment == comment
+
+    (tmp_path / "empty.gz").write_bytes(b"")
+    with pytest.raises(ValueError):
+        read_gzip_header(tmp_path / "empty.gz")
+    (tmp_path / "unterminated.gz").write_bytes(_header(flags=0x08) + b"name")
+    with pytest.raises(ValueError):
+        read_gzip_header(tmp_path / "unterminated.gz")
+
+    headers = read_gzip_headers(
+        [tmp_path / "sub-01_bold.nii.gz", tmp_path / "comment.gz", tmp_path / "empty.gz"]
+    )
+    assert headers == {
+        tmp_path / "sub-01_bold.nii.gz": header,
+        tmp_path / "comment.gz": ctx.Gzip(timestamp=0, comment=comment),
+        tmp_path / "empty.gz": None,
+    }
+    assert read_gzip_headers([tmp_path / "missing.gz"]) == {tmp_path / "missing.gz": None}
+
+
+def test_gzip_context(tmp_path, schema_obj):
+    (tmp_path / "sub-01" / "anat").mkdir(parents=True)
+    files = {
+        "sub-01/anat/sub-01_T1w.nii.gz": _compress(b"", filename="T1w.nii", mtime=10),
+        "sub-01/anat/sub-01_T2w.nii.gz": _compress(b""),
+        "sub-01/anat/sub-01_FLAIR.nii.gz": b"not compressed",
+        "sub-01/anat/sub-01_T1w.json": b"{}",
+    }
+    for path, content in files.items():
+        (tmp_path / path).write_bytes(content)
+    dataset = DatasetContext(tmp_path, schema=schema_obj)
+
+    context = dataset.context("sub-01/anat/sub-01_T1w.nii.gz")
+    assert context.gzip == ctx.Gzip(timestamp=10, filename="T1w.nii")
+    assert list(dataset.gzip_headers) == sorted(path for path in files if path.endswith(".gz"))
+    assert dataset.context("sub-01/anat/sub-01_T2w.nii.gz").gzip == ctx.Gzip(timestamp=0)
+    assert dataset.context("sub-01/anat/sub-01_FLAIR.nii.gz").gzip is None
+    assert dataset.context("sub-01/anat/sub-01_T1w.json").gzip is None
+
+    assert expressions.compile("gzip.timestamp == 0")(context) is False
+    assert expressions.compile('gzip.filename == ""')(context) is False
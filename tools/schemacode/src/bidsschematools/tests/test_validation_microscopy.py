@@ -0,0 +1,217 @@
+import json
+import struct
+
+import pytest
+
+from bidsschematools import expressions
+from bidsschematools.types import context as ctx
+from bidsschematools.validation import (
+    DatasetContext,
+    parse_ome_xml,
+    parse_tiff_header,
+    read_ome_tiff,
+    read_ome_zarr,
+    read_tiff_header,
+)
+
+OME_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<OME xmlns="http://www.openmicroscopy.org/Schemas/OME/2016-06">'
+    '<Instrument ID="Instrument:0"/>'
+    '<Image ID="Image:0"><Pixels ID="Pixels:0" DimensionOrder="XYZCT" Type="uint8" '
+    'PhysicalSizeX="0.25" PhysicalSizeY="0.25" PhysicalSizeXUnit="µm" PhysicalSizeYUnit="µm"'
+    ' SizeX="1" SizeY="1" SizeZ="1" SizeC="1" SizeT="1"/></Image>'
+    "</OME>"
+)
+
+
+def _tiff(description=None, bigtiff=False, byteorder="<", image_size=1 << 16):
+    """Build a TIFF file with one image, whose data follows its description"""
+    magic = b"II" if byteorder == "<" else b"MM"
+    if bigtiff:
+        header = magic + struct.pack(byteorder + "HHHQ", 43, 8, 0, 16)
+        count_format, entry_format, inline_size = "Q", "HHQQ", 8
+    else:
+        header = magic + struct.pack(byteorder + "HI", 42, 8)
+        count_format, entry_format, inline_size = "H", "HHII", 4
+    tags = [(256, 3, 1, 1), (257, 3, 1, 1)]
+    extra = b""
+    if description is not None:
+        description = description.encode() + b"\x00"
+        entry_size = struct.calcsize(byteorder + entry_format)
+        ifd_end = len(header) + struct.calcsize(count_format) + 3 * entry_size + 8
+        if len(description) <= inline_size:
+            # Inline values are stored in file order, so as a number of the file byte order
+            padded = description.ljust(inline_size, b"\x00")
+            value = int.from_bytes(padded, "little" if byteorder == "<" else "big")
+        else:
+            value, extra = ifd_end, description
+        tags.insert(2, (270, 2, len(description), value))
+    ifd = struct.pack(byteorder + count_format, len(tags))
+    for tag in tags:
+        ifd += struct.pack(byteorder + entry_format, *tag)
+    return header + ifd + bytes(8) + extra + bytes(image_size)
+
+
+def test_parse_tiff_header():
+    assert parse_tiff_header(_tiff()) == ctx.Tiff(version=42)
+    assert parse_tiff_header(_tiff(bigtiff=True, byteorder=">")) == ctx.Tiff(version=43)
+    with pytest.raises(ValueError):
+        parse_tiff_header(b"\x89PNG\r\n\x1a\n")
+    with pytest.raises(ValueError):
+        parse_tiff_header(b"II\x2a")
+    with pytest.raises(ValueError):
+        parse_tiff_header(b"II\x2c\x00" + bytes(12))
+
+
+def test_parse_ome_xml():
+    assert parse_ome_xml(OME_XML) == ctx.Ome(
+        PhysicalSizeX=0.25, PhysicalSizeY=0.25, PhysicalSizeXUnit="µm", PhysicalSizeYUnit="µm"
+    )
+    assert parse_ome_xml('<OME><Image><Pixels SizeX="1"/></Image></OME>') == ctx.Ome()
+    assert parse_ome_xml("<OME><Instrument/></OME>") is None
+
+    # Parsing stops at the first Pixels element, so later chunks are neither read nor parsed
+    def chunks():
+        yield OME_XML[:100].encode()
+        yield OME_XML[100:].encode()
+        raise AssertionError("Read past the Pixels element")
+
+    assert parse_ome_xml(chunks()).PhysicalSizeX == 0.25
+
+    with pytest.raises(ValueError):
+        parse_ome_xml("ImageJ=1.54f\nimages=1\n")
+    with pytest.raises(ValueError):
+        parse_ome_xml("<OME><Image>")
+
+
+@pytest.mark.parametrize("bigtiff", [False, True])
+@pytest.mark.parametrize("byteorder", ["<", ">"])
+def test_read_ome_tiff(tmp_path, monkeypatch, bigtiff, byteorder):
+    monkeypatch.setattr("bidsschematools.validation.microscopy.CHUNK_SIZE", 64)
+    path = tmp_path / "sub-01_SPIM.ome.tif"
+    path.write_bytes(_tiff(OME_XML, bigtiff=bigtiff, byteorder=byteorder))
+    assert read_tiff_header(path) == ctx.Tiff(version=43 if bigtiff else 42)
+    assert read_ome_tiff(path).PhysicalSizeY == 0.25
+    assert read_ome_tiff(str(path)) is read_ome_tiff(path)
+
+    # Short descriptions are stored in the entry itself
+    path = tmp_path / "short.tif"
+    path.write_bytes(_tiff("<a/>", bigtiff=True, byteorder=byteorder))
+    assert read_ome_tiff(path) is None
+    path = tmp_path / "imagej.tif"
+    path.write_bytes(_tiff("a=1", byteorder=byteorder))
+    with pytest.raises(ValueError):
+        read_ome_tiff(path)
+
+    path = tmp_path / "plain.tif"
+    path.write_bytes(_tiff(bigtiff=bigtiff, byteorder=byteorder))
+    assert read_ome_tiff(path) is None
+
+
+def test_read_ome_zarr(tmp_path):
+    zarr = tmp_path / "sub-01_SEM.ome.zarr"
+    zarr.mkdir()
+    assert read_ome_zarr(zarr) is None
+
+    multiscales = [
+        {
+            "version": "0.4",
+            "axes": [
+                {"name": "c", "type": "channel"},
+                {"name": "z", "type": "space", "unit": "micrometer"},
+                {"name": "y", "type": "space", "unit": "micrometer"},
+                {"name": "x", "type": "space", "unit": "nanometer"},
+            ],
+            "datasets": [
+                {
+                    "path": "0",
+                    "coordinateTransformations": [{"type": "scale", "scale": [1, 2, 1, 5]}],
+                },
+                {
+                    "path": "1",
+                    "coordinateTransformations": [{"type": "scale", "scale": [1, 4, 2, 10]}],
+                },
+            ],
+            "coordinateTransformations": [{"type": "scale", "scale": [1, 1, 0.5, 0.5]}],
+        }
+    ]
+    (zarr / ".zattrs").write_text(json.dumps({"multiscales": multiscales}))
+    assert read_ome_zarr(zarr) == ctx.Ome(
+        PhysicalSizeX=2.5,
+        PhysicalSizeY=0.5,
+        PhysicalSizeZ=2.0,
+        PhysicalSizeXUnit="nm",
+        PhysicalSizeYUnit="µm",
+        PhysicalSizeZUnit="µm",
+    )
+
+    # OME-Zarr 0.5 stores its metadata in zarr.json
+    (zarr / ".zattrs").unlink()
+    (zarr / "zarr.json").write_text(
+        json.dumps({"zarr_format": 3, "attributes": {"ome": {"multiscales": multiscales}}})
+    )
+    assert read_ome_zarr(zarr).PhysicalSizeX == 2.5
+
+    # Metadata without the structure of OME-Zarr is invalid
+    (zarr / "zarr.json").unlink()
+    scale = {"type": "scale", "scale": 2}
+    for attributes in (
+        [],
+        {"multiscales": {"version": "0.4"}},
+        {"multiscales": [[]]},
+        {"multiscales": [{"axes": "zyx"}]},
+        {"multiscales": [{"axes": [1], "datasets": []}]},
+        {"multiscales": [{"datasets": [{"coordinateTransformations": [scale]}]}]},
+        {"multiscales": [{"coordinateTransformations": {"type": "scale"}}]},
+    ):
+        (zarr / ".zattrs").write_text(json.dumps(attributes))
+        with pytest.raises(ValueError, match="Invalid OME-Zarr metadata"):
+            read_ome_zarr(zarr)
+    (zarr / ".zattrs").unlink()
+    (zarr / "zarr.json").write_text(json.dumps({"attributes": {"ome": []}}))
+    with pytest.raises(ValueError, match="Invalid OME-Zarr metadata"):
+        read_ome_zarr(zarr)
+
+    # Images converted by bioformats2raw store OME-XML next to the image groups
+    (zarr / "zarr.json").unlink()
+    (zarr / ".zattrs").write_text(json.dumps({"bioformats2raw.layout": 3}))
+    (zarr / "OME").mkdir()
+    (zarr / "OME" / "METADATA.ome.xml").write_text(OME_XML, encoding="utf-8")
+    assert read_ome_zarr(zarr).PhysicalSizeX == 0.25
+
+
+def test_microscopy_context(tmp_path, schema_obj):
+    micr = tmp_path / "sub-01" / "micr"
+    micr.mkdir(parents=True)
+    (micr / "sub-01_sample-A_SPIM.ome.tif").write_bytes(_tiff(OME_XML))
+    (micr / "sub-01_sample-A_SPIM.json").write_text(
+        json.dumps({"PixelSize": [0.25, 0.25, 1], "PixelSizeUnits": "um"})
+    )
+    (micr / "sub-01_sample-B_SPIM.ome.btf").write_bytes(_tiff(OME_XML))
+    (micr / "sub-01_sample-C_SPIM.ome.tif").write_bytes(b"not a tiff")
+    (micr / "sub-01_sample-A_SEM.ome.zarr").mkdir()
+    (micr / "sub-01_sample-A_SEM.ome.zarr" / "OME").mkdir()
+    (micr / "sub-01_sample-A_SEM.ome.zarr" / "OME" / "METADATA.ome.xml").write_text(OME_XML)
+    dataset = DatasetContext(tmp_path, schema=schema_obj)
+
+    context = dataset.context("sub-01/micr/sub-01_sample-A_SPIM.ome.tif")
+    assert context.tiff == ctx.Tiff(version=42)
+    assert context.ome.PhysicalSizeX == 0.25
+    check = expressions.compile(
+        'ome.PhysicalSizeX * 10 ** (-3 * index(["mm", "µm", "nm"], ome.PhysicalSizeXUnit))'
+        ' - sidecar.PixelSize[0] * 10 ** (-3 * index(["mm", "um", "nm"], sidecar.PixelSizeUnits))'
+        ' < 0.001 * 10 ** (-3 * index(["mm", "um", "nm"], sidecar.PixelSizeUnits))'
+    )
+    assert check(context) is True
+
+    context = dataset.context("sub-01/micr/sub-01_sample-B_SPIM.ome.btf")
+    assert (
+        expressions.compile("(extension == '.ome.btf') == (tiff.version == 43)")(context) is False
+    )
+    assert dataset.context("sub-01/micr/sub-01_sample-C_SPIM.ome.tif").tiff is None
+    assert dataset.context("sub-01/micr/sub-01_sample-C_SPIM.ome.tif").ome is None
+    context = dataset.context("sub-01/micr/sub-01_sample-A_SEM.ome.zarr/")
+    assert context.ome.PhysicalSizeY == 0.25
+    assert context.tiff is None
+    assert dataset.context("sub-01/micr/sub-01_sample-A_SPIM.json").ome is None
@@ -0,0 +1,154 @@
+import gzip
+import json
+import math
+import os
+import struct
+
+import pytest
+
+from bidsschematools.types import context as ctx
+from bidsschematools.validation import DatasetContext, parse_nifti_header, read_nifti_header
+
+
+def _nifti1(
+    dim=(3, 64, 64, 30, 1, 1, 1, 1),
+    pixdim=(1, 2, 2, 2.5, 1, 1, 1, 1),
+    xyzt_units=2 | 8,
+    qform=(0, None),
+    sform=(0, None),
+    dim_info=0,
+    extensions=b"",
+    byteorder="<",
+):
+    header = bytearray(352)
+    vox_offset = 352 + len(extensions)
+    struct.pack_into(byteorder + "i", header, 0, 348)
+    struct.pack_into(byteorder + "B", header, 39, dim_info)
+    struct.pack_into(byteorder + "8h", header, 40, *dim)
+    struct.pack_into(byteorder + "8f", header, 76, *pixdim)
+    struct.pack_into(byteorder + "f", header, 108, vox_offset)
+    struct.pack_into(byteorder + "B", header, 123, xyzt_units)
+    struct.pack_into(byteorder + "2h", header, 252, qform[0], sform[0])
+    if qform[1] is not None:
+        struct.pack_into(byteorder + "6f", header, 256, *qform[1], 0, 0, 0)
+    if sform[1] is not None:
+        struct.pack_into(byteorder + "12f", header, 280, *sform[1])
+    header[344:348] = b"n+1\x00"
+    header[348] = bool(extensions)
+    return bytes(header) + extensions
+
+
+def _nifti2(
+    dim=(4, 64, 64, 30, 100, 1, 1, 1), pixdim=(1, 2, 2, 2.5, 1.5, 1, 1, 1), extensions=b""
+):
+    header = bytearray(544)
+    struct.pack_into("<i", header, 0, 540)
+    header[4:12] = b"n+2\x00\r\n\x1a\n"
+    struct.pack_into("<8q", header, 16, *dim)
+    struct.pack_into("<8d", header, 104, *pixdim)
+    struct.pack_into("<q", header, 168, 544 + len(extensions))
+    struct.pack_into("<2i", header, 344, 1, 0)
+    struct.pack_into("<6d", header, 352, 0, 0, 0, 0, 0, 0)
+    struct.pack_into("<i", header, 500, 2 | 16)
+    struct.pack_into("<B", header, 524, 1 | 2 << 2 | 3 << 4)
+    header[540] = bool(extensions)
+    return bytes(header) + extensions
+
+
+def _extension(code, content):
+    content += b"\x00" * (-(len(content) + 8) % 16)
+    return struct.pack("<2i", len(content) + 8, code) + content
+
+
+def test_parse_nifti1():
+    header = parse_nifti_header(
+        _nifti1(sform=(1, [-2, 0, 0, 90, 0, 2, 0, -126, 0, 0, 2.5, -72]), dim_info=1 | 2 << 2)
+    )
+    assert header.dim == [3, 64, 64, 30, 1, 1, 1, 1]
+    assert header.shape == [64, 64, 30]
+    assert header.voxel_sizes == [2, 2, 2.5]
+    assert header.xyzt_units == ctx.XyztUnits(xyz="mm", t="sec")
+    assert header.dim_info == ctx.DimInfo(freq=1, phase=2, slice=0)
+    assert (header.qform_code, header.sform_code) == (0, 1)
+    assert header.axis_codes == ["L", "A", "S"]
+    assert header.mrs is None
+
+    # A rotation of 90 degrees around the z axis, in big-endian byte order
+    rotation = (0, 0, math.sin(math.pi / 4))
+    header = parse_nifti_header(_nifti1(qform=(1, rotation), byteorder=">"))
+    assert header.axis_codes == ["A", "L", "S"]
+    assert header.shape == [64, 64, 30]
+
+    # Without transforms, the x axis is flipped
+    assert parse_nifti_header(_nifti1()).axis_codes == ["L", "A", "S"]
+
+    # Non-standard unit codes are unknown
+    header = parse_nifti_header(_nifti1(xyzt_units=5 | 0x28))
+    assert header.xyzt_units == ctx.XyztUnits(xyz="unknown", t="unknown")
+
+    with pytest.raises(ValueError):
+        parse_nifti_header(b"\x00" * 348)
+    with pytest.raises(ValueError):
+        parse_nifti_header(_nifti1(dim=(9, 1, 1, 1, 1, 1, 1, 1)))
+
+
+def test_parse_nifti2():
+    mrs = {"SpectrometerFrequency": [123.2], "ResonantNucleus": ["1H"]}
+    data = _nifti2(extensions=_extension(6, b"comment") + _extension(44, json.dumps(mrs).encode()))
+    header = parse_nifti_header(data[:544], data[544:])
+    assert header.shape == [64, 64, 30, 100]
+    assert header.voxel_sizes == [2, 2, 2.5, 1.5]
+    assert header.xyzt_units == ctx.XyztUnits(xyz="mm", t="msec")
+    assert header.dim_info == ctx.DimInfo(freq=1, phase=2, slice=3)
+    assert header.axis_codes == ["R", "A", "S"]
+    assert header.mrs == mrs
+
+    # Extensions are only parsed if passed separately
+    assert parse_nifti_header(data).mrs is None
+
+
+def test_read_nifti_header(tmp_path):
+    mrs = {"ResonantNucleus": ["1H"]}
+    extensions = _extension(44, json.dumps(mrs).encode())
+
+    nii = tmp_path / "sub-01_svs.nii"
+    nii.write_bytes(_nifti2(extensions=extensions) + b"\x00" * 1000)
+    header = read_nifti_header(nii)
+    assert header.mrs == mrs
+    assert header.shape == [64, 64, 30, 100]
+    # Headers are cached until the file changes
+    assert read_nifti_header(str(nii)) is header
+    nii.write_bytes(_nifti1() + b"\x00" * 1000)
+    stat = nii.stat()
+    os.utime(nii, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert read_nifti_header(nii).shape == [64, 64, 30]
+
+    # Only the start of compressed images is decompressed, so corrupt data is not noticed
+    niigz = tmp_path / "sub-01_T1w.nii.gz"
+    compressed = gzip.compress(_nifti1() + os.urandom(1 << 16))
+    niigz.write_bytes(compressed[: len(compressed) // 2])
+    assert read_nifti_header(niigz).shape == [64, 64, 30]
+
+    (tmp_path / "empty.nii").write_bytes(b"")
+    with pytest.raises(ValueError):
+        read_nifti_header(tmp_path / "empty.nii")
+    (tmp_path / "plain.nii.gz").write_bytes(_nifti1())
+    with pytest.raises(OSError):
+        read_nifti_header(tmp_path / "plain.nii.gz")
+
+
+def test_nifti_header_context(tmp_path, schema_obj):
+    (tmp_path / "sub-01" / "anat").mkdir(parents=True)
+    (tmp_path / "sub-01" / "anat" / "sub-01_T1w.nii.gz").write_bytes(gzip.compress(_nifti1()))
+    (tmp_path / "sub-01" / "anat" / "sub-01_T2w.nii").write_bytes(b"")
+    (tmp_path / "sub-01" / "anat" / "sub-01_T1w.json").write_text("{}")
+    # A gzip header followed by data that cannot be decompressed
+    compressed = gzip.compress(_nifti1())
+    corrupt = compressed[:10] + b"\xff" * (len(compressed) - 10)
+    (tmp_path / "sub-01" / "anat" / "sub-01_FLAIR.nii.gz").write_bytes(corrupt)
+    dataset = DatasetContext(tmp_path, schema=schema_obj)
+
+    assert dataset.context("sub-01/anat/sub-01_T1w.nii.gz").nifti_header.dim[0] == 3
+    assert dataset.context("sub-01/anat/sub-01_T2w.nii").nifti_header is None
+    assert dataset.context("sub-01/anat/sub-01_T1w.json").nifti_header is None
+    assert dataset.context("sub-01/anat/sub-01_FLAIR.nii.gz").nifti_header is None
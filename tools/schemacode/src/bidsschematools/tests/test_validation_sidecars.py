@@ -0,0 +1,80 @@
+import posixpath
+from collections import Counter
+
+from bidsschematools.rules import parse_entities, split_filename
+from bidsschematools.validation.sidecars import SidecarResolver
+
+SIDECARS = {
+    "task-rest_bold.json": {"RepetitionTime": 2, "TaskName": "rest", "Level": "root"},
+    "task-rest_acq-fast_bold.json": {"RepetitionTime": 1, "Level": "root-acq"},
+    "sub-01/sub-01_task-rest_bold.json": {"Level": "subject"},
+    "sub-01/ses-1/func/sub-01_ses-1_task-rest_bold.json": {"Level": "session"},
+    "sub-01/ses-1/func/sub-01_ses-1_task-rest_run-2_bold.json": {"Level": "run"},
+    "sub-02/func/sub-02_task-rest_physio.json": {"SamplingFrequency": 100},
+    "sub-02/func/sub-02_task-rest_run-1_physio.json": {"StartTime": 0},
+}
+DATA_FILES = [
+    f"sub-{sub}/{ses}func/sub-{sub}_{ses.replace('/', '_')}task-rest{acq}_run-{run}_{suffix}"
+    for sub in ("01", "02")
+    for ses in (("ses-1/", "ses-2/") if sub == "01" else ("",))
+    for acq in ("", "_acq-fast")
+    for run in (1, 2)
+    for suffix in ("bold.nii.gz", "physio.tsv.gz")
+]
+
+
+def _naive_sidecar_paths(path, entities):
+    """Find applicable sidecars by testing every JSON file in the dataset"""
+    suffix, _ = split_filename(path)
+    found = []
+    for sidecar in SIDECARS:
+        directory = posixpath.dirname(sidecar)
+        if sidecar == path or split_filename(sidecar)[0] != suffix:
+            continue
+        if directory and not path.startswith(f"{directory}/"):
+            continue
+        sidecar_entities = parse_entities(sidecar, {"sub": "subject", "ses": "session"})
+        if all(entities.get(key) == value for key, value in sidecar_entities.items()):
+            found.append((directory.count("/") + bool(directory), len(sidecar_entities), sidecar))
+    return [sidecar for *_, sidecar in sorted(found)]
+
+
+def test_sidecar_resolver():
+    loaded = Counter()
+
+    def load_json(path):
+        loaded[path] += 1
+        return SIDECARS[path]
+
+    resolver = SidecarResolver(
+        [*SIDECARS, *DATA_FILES],
+        load_json,
+        entity_keys={"sub": "subject", "ses": "session"},
+        entity_order=["subject", "session", "task", "acquisition", "run"],
+    )
+    for path in [*DATA_FILES, *SIDECARS]:
+        entities = parse_entities(path, {"sub": "subject", "ses": "session"})
+        sidecar_paths = _naive_sidecar_paths(path, entities)
+        assert resolver.sidecar_paths(path) == sidecar_paths
+        expected = {}
+        for sidecar in sidecar_paths:
+            expected.update(SIDECARS[sidecar])
+        assert resolver.resolve(path) == expected, path
+        assert resolver.resolve(f"/{path}", entities) == expected
+
+    assert resolver.resolve("sub-01/ses-1/func/sub-01_ses-1_task-rest_run-2_bold.nii.gz") == {
+        "RepetitionTime": 2,
+        "TaskName": "rest",
+        "Level": "run",
+    }
+    assert resolver.resolve("sub-01/ses-2/func/sub-01_ses-2_task-rest_acq-fast_bold.nii.gz") == {
+        "RepetitionTime": 1,
+        "TaskName": "rest",
+        "Level": "subject",
+    }
+
+    # Each JSON file is parsed once
+    assert set(loaded.values()) == {1}
+    # Returned sidecars may be modified without affecting later results
+    resolver.resolve(DATA_FILES[0])["Level"] = "modified"
+    assert resolver.resolve(DATA_FILES[0])["Level"] != "modified"
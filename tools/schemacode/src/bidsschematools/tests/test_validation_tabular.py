@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from bidsschematools.validation import DatasetContext, Issue, TabularValidator, TsvTable
+
+
+@pytest.fixture(scope="module")
+def validator(schema_obj):
+    return TabularValidator(schema_obj)
+
+
+def _issues(validator, context):
+    return [(issue.code, issue.subcode) for issue in validator.validate(context)]
+
+
+def test_issue_from_schema(schema_obj):
+    issue = Issue.from_schema(schema_obj, "TsvColumnMissing", location="/x.tsv", subcode="a")
+    assert issue == Issue(
+        code="TSV_COLUMN_MISSING",
+        level="error",
+        location="/x.tsv",
+        message="A required column is missing from this TSV file.",
+        subcode="a",
+    )
+    assert Issue.from_schema(schema_obj, "TsvValueIncorrectTypeNonrequired").level == "warning"
+
+
+def test_tabular_rules(validator):
+    # Nested groups of rules are indexed
+    assert "tabular_data.derivatives.common_derivatives.Descriptions" in validator.index.rules
+
+    def context(path, text, sidecar=None):
+        return {
+            "path": path,
+            "datatype": path.split("/")[2] if path.count("/") > 2 else None,
+            "suffix": path.rpartition("_")[2].partition(".")[0],
+            "extension": ".tsv",
+            "sidecar": sidecar or {},
+            "columns": TsvTable(text),
+        }
+
+    participants = "participant_id\tage\tsex\nsub-01\t34\tF\nsub-02\tn/a\tn/a\n"
+    assert _issues(validator, context("/participants.tsv", participants)) == []
+    assert _issues(validator, context("/participants.tsv", "age\tage\n1\t2\n")) == [
+        ("TSV_COLUMN_HEADER_DUPLICATE", "age"),
+        ("TSV_COLUMN_MISSING", "participant_id"),
+    ]
+    invalid = "participant_id\tage\tsex\tgroup\n01\t34\tfemale\tA\nsub-02\t90\tX\tB\n"
+    issues = validator.validate(context("/participants.tsv", invalid))
+    assert [(issue.code, issue.subcode, issue.detail) for issue in issues] == [
+        ("TSV_VALUE_INCORRECT_TYPE", "participant_id", "Line 2: '01'"),
+        ("TSV_VALUE_INCORRECT_TYPE_NONREQUIRED", "age", "Line 3: '90'"),
+        ("TSV_VALUE_INCORRECT_TYPE_NONREQUIRED", "sex", "Line 3: 'X'"),
+    ]
+    assert {issue.rule for issue in issues} == {"tabular_data.modality_agnostic.Participants"}
+
+    # Definitions in sidecars replace those of the schema
+    sidecar = {"age": {"Units": "months"}, "sex": {"Levels": {"X": "Unknown"}}}
+    assert _issues(validator, context("/participants.tsv", invalid, sidecar)) == [
+        ("TSV_VALUE_INCORRECT_TYPE", "participant_id"),
+        ("TSV_VALUE_INCORRECT_TYPE_NONREQUIRED", "sex"),
+    ]
+    # Levels are compared with the text of numbers
+    ages = "participant_id\tage\nsub-01\t1.50\nsub-02\t2.00\n"
+    sidecar = {"age": {"Levels": {"1.50": "One and a half", "2.00": "Two"}}}
+    assert _issues(validator, context("/participants.tsv", ages, sidecar)) == []
+    sidecar = {"age": {"Levels": {"1.5": "One and a half", "2.00": "Two"}}}
+    issues = validator.validate(context("/participants.tsv", ages, sidecar))
+    assert [(issue.subcode, issue.detail) for issue in issues] == [("age", "Line 2: '1.50'")]
+
+    events = "onset\tduration\ttrial_type\n0\t1.5\tgo\n2.5\tn/a\tstop\n"
+    assert _issues(validator, context("/sub-01/func/sub-01_events.tsv", events)) == []
+    events = "duration\tonset\n-1\tx\n"
+    assert _issues(validator, context("/sub-01/func/sub-01_events.tsv", events)) == [
+        ("TSV_COLUMN_ORDER_INCORRECT", "onset"),
+        ("TSV_COLUMN_ORDER_INCORRECT", "duration"),
+        ("TSV_VALUE_INCORRECT_TYPE", "onset"),
+        ("TSV_VALUE_INCORRECT_TYPE", "duration"),
+    ]
+
+    aslcontext = "volume_type\textra\ncontrol\t1\nlabel\t2\n"
+    assert _issues(validator, context("/sub-01/perf/sub-01_aslcontext.tsv", aslcontext)) == [
+        ("TSV_ADDITIONAL_COLUMNS_NOT_ALLOWED", "extra")
+    ]
+    samples = "sample_id\tparticipant_id\tsample_type\n"
+    rows = "sample-01\tsub-01\ttissue\nsample-02\tsub-01\ttissue\nsample-01\tsub-01\tcell line\n"
+    issues = validator.validate(context("/samples.tsv", samples + rows))
+    assert [(issue.code, issue.detail) for issue in issues] == [
+        ("TSV_INDEX_VALUE_NOT_UNIQUE", "Lines 2 and 4: 'sample-01', 'sub-01'")
+    ]
+
+
+def test_additional_columns(tmp_path, validator):
+    (tmp_path / "sub-01" / "eeg").mkdir(parents=True)
+    prefix = "sub-01/eeg/sub-01_task-rest_"
+    columns = "name\ttype\tunits\textra\nFp1\tEEG\tuV\t1\n"
+    (tmp_path / f"{prefix}channels.tsv").write_text(columns)
+    (tmp_path / f"{prefix}electrodes.tsv").write_text("name\tx\ty\tz\textra\nFp1\t1\t2\t3\t0\n")
+    dataset = DatasetContext(tmp_path, schema=validator.schema)
+
+    assert _issues(validator, dataset.context(f"{prefix}channels.tsv")) == [
+        ("TSV_ADDITIONAL_COLUMNS_MUST_DEFINE", "extra")
+    ]
+    (tmp_path / f"{prefix}channels.json").write_text(json.dumps({"extra": {"Description": "x"}}))
+    dataset = DatasetContext(tmp_path, schema=validator.schema)
+    assert _issues(validator, dataset.context(f"{prefix}channels.tsv")) == []
+    assert _issues(validator, dataset.context(f"{prefix}electrodes.tsv")) == [
+        ("TSV_ADDITIONAL_COLUMNS_MUST_DEFINE", "extra")
+    ]
+    assert validator.validate(dataset.context(f"{prefix}channels.json")) == []
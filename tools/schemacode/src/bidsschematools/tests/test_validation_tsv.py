@@ -0,0 +1,117 @@
+import math
+from array import array
+
+import pytest
+
+from bidsschematools import expressions
+from bidsschematools.validation import Column, TsvTable, load_tsv
+
+
+def test_column_types():
+    column = Column(["1", "-2", "30"])
+    assert column.dtype == "integer"
+    assert column.data == array("q", [1, -2, 30])
+    assert column.text is None
+    assert column == ["1", "-2", "30"]
+    assert column[1:] == ["-2", "30"]
+
+    column = Column(["1", "n/a", "3"])
+    assert (column.dtype, column.data.typecode) == ("integer", "d")
+    assert column == ["1", "n/a", "3"]
+
+    column = Column(["1.5", "2", "1e-3", "n/a"])
+    assert column.dtype == "number"
+    assert math.isnan(column.data[3])
+    assert column == ["1.5", "2", "1e-3", "n/a"]
+    assert column[0] == "1.5"
+
+    # Cells are kept only if the numbers do not format back to them
+    assert Column(["0.5", "1.25"]).text is None
+    assert Column(["+1", "2"]).text == ["+1", "2"]
+    column = Column(["1.50", "2.00"])
+    assert (column.data, column.text) == (array("d", [1.5, 2.0]), ["1.50", "2.00"])
+
+    # Conversions would lose leading zeros or precision
+    assert Column(["01", "02"]).dtype == "string"
+    assert Column([str(2**63), "1"]).dtype == "string"
+    assert Column([str(2**53 + 1), "n/a"]).dtype == "string"
+    column = Column([str(2**53 + 1)])
+    assert (column.data, column) == (array("q", [2**53 + 1]), [str(2**53 + 1)])
+    assert Column(["1-2", "e", "n/a"]).dtype == "string"
+    assert Column(["n/a", "n/a"]).dtype == "string"
+
+    column = Column(["go", "stop", "go", "n/a", None])
+    assert column.dtype == "string"
+    assert column.categories == ["go", "stop", "n/a", None]
+    assert column.data == array("I", [0, 1, 0, 2, 3])
+    assert column == ("go", "stop", "go", "n/a", None)
+    assert column != ["go"]
+    assert column != "go"
+
+    assert Column(["1", None]) == ["1", None]
+    assert Column([]) == []
+
+
+def test_column_to_numpy():
+    np = pytest.importorskip("numpy")
+    assert Column(["1", "2"]).to_numpy().dtype == np.int64
+    values = Column(["1", "n/a"]).to_numpy()
+    assert values[0] == 1 and np.isnan(values[1])
+    assert list(Column(["a", "b", "a"]).to_numpy()) == ["a", "b", "a"]
+
+
+def test_tsv_table():
+    table = TsvTable("a\tb\tc\r\n1\tx\n\n2\ty\tz\r\n")
+    assert table.header == ["a", "b", "c"]
+    assert (table.n_rows, table.truncated) == (2, False)
+    assert list(table) == ["a", "b", "c"]
+    assert "d" not in table
+    assert table.get("d") is None
+
+    # Columns are parsed when first accessed
+    assert table._columns == {}
+    assert table["c"] == [None, "z"]
+    assert list(table._columns) == ["c"]
+    assert table["c"] is table["c"]
+    assert dict(table) == {"a": ["1", "2"], "b": ["x", "y"], "c": [None, "z"]}
+
+    assert TsvTable("").header == []
+    assert TsvTable("a\n").n_rows == 0
+    assert TsvTable("a\n1\n2\n", max_rows=2).truncated is False
+
+
+def test_load_tsv(tmp_path):
+    path = tmp_path / "sub-01_task-rest_events.tsv"
+    path.write_text("onset\tduration\n" + "".join(f"{idx}\t1\n" for idx in range(1000)))
+    table = load_tsv(path)
+    assert (table.n_rows, table.truncated) == (1000, False)
+    assert table["onset"].dtype == "integer"
+
+    table = load_tsv(path, max_rows=10)
+    assert (table.n_rows, table.truncated) == (10, True)
+    assert table["onset"] == [str(idx) for idx in range(10)]
+
+
+def test_column_expressions():
+    table = TsvTable(
+        "participant_id\tage\tgroup\nsub-01\t34\tcontrol\nsub-02\tn/a\tpatient\n"
+        "sub-03\t90\tcontrol\n"
+    )
+    context = {"columns": table}
+
+    def evaluate(expression):
+        return expressions.compile(expression)(context)
+
+    assert evaluate("max(columns.age)") == 90
+    assert evaluate("min(columns.age)") == 34
+    assert evaluate("length(columns.age)") == 3
+    assert evaluate('count(columns.age, "n/a")') == 1
+    assert evaluate("type(columns.age)") == "array"
+    assert evaluate("columns.group[1]") == "patient"
+    assert evaluate("columns.group.index") is None
+    assert evaluate("unique(columns.group)") == ["control", "patient"]
+    assert evaluate('intersects(columns.participant_id, ["sub-02"])') == ["sub-02"]
+    assert evaluate('"sub-03" in columns.participant_id') is True
+    assert evaluate('allequal(sorted(columns.age, "numeric"), columns.age)') is True
+    assert evaluate("sorted(columns.group)") == ["control", "control", "patient"]
+    assert evaluate("columns.missing == null") is True
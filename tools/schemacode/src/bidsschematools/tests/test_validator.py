@@ -1,10 +1,11 @@
+import json
 import os
 import shutil
 
 import pytest
 
-from bidsschematools.conftest import BIDS_ERROR_SELECTION, BIDS_SELECTION
-from bidsschematools.validator import select_schema_path, validate_bids
+from bidsschematools.conftest import BIDS_ERROR_SELECTION, BIDS_SELECTION, write_tree
+from bidsschematools.validator import _get_paths, select_schema_path, validate_bids
 
 from ..data import load
 from .data import load_test_data
@@ -114,6 +115,48 @@ def test_write_report(tmp_path):
     assert report_path.read_text() == expected_report_path.read_text()
 
 
+@pytest.mark.parametrize("max_workers", [1, 4, None])
+def test_get_paths(tmp_path, max_workers):
+    write_tree(
+        tmp_path,
+        [
+            "dataset_description.json",
+            "README",
+            "dandiset.yaml",
+            ".datalad/config",
+            "sub-01/anat/sub-01_T1w.nii.gz",
+            "sub-01/anat/.sub-01_T1w.nii.gz.swp",
+            "sub-01/anat/sub-01_T1w.log",
+            "sub-01/micr/sub-01_sample-A_SEM.ome.zarr/.zattrs",
+            "sub-02/ses-1/func/sub-02_ses-1_task-rest_bold.nii.gz",
+            "derivatives/pipeline/dataset_description.json",
+            "derivatives/pipeline/sub-01/anat/sub-01_desc-preproc_T1w.nii.gz",
+        ],
+    )
+    (tmp_path / ".bidsignore").write_text("*.log\n")
+
+    path_list = _get_paths(
+        [str(tmp_path)],
+        pseudofile_suffixes=[".ome.zarr"],
+        exclude_files=["dandiset.yaml"],
+        max_workers=max_workers,
+    )
+    relative = sorted(path[len(tmp_path.as_posix()) + 1 :] for path in path_list)
+    assert relative == [
+        "README",
+        "dataset_description.json",
+        "sub-01/anat/sub-01_T1w.nii.gz",
+        "sub-01/micr/sub-01_sample-A_SEM.ome.zarr/",
+        "sub-02/ses-1/func/sub-02_ses-1_task-rest_bold.nii.gz",
+    ]
+    # Ordering does not depend on concurrency
+    assert path_list == _get_paths(
+        [str(tmp_path)],
+        pseudofile_suffixes=[".ome.zarr"],
+        exclude_files=["dandiset.yaml"],
+    )
+
+
 @pytest.mark.skipif(
     os.environ.get("SCHEMACODE_TESTS_NONETWORK") is not None,
     reason="no network",
@@ -282,3 +325,223 @@ def test_bids_schema_versioncheck(monkeypatch, schema_dir):
     assert bst.validator._bids_schema_versioncheck(schema_dir)
     monkeypatch.setattr(bst, "__version__", "99.99.99")
     assert not bst.validator._bids_schema_versioncheck(schema_dir)
+
+
+def test_bidsignore():
+    from bidsschematools.validator import BidsIgnore
+
+    bidsignore = BidsIgnore(
+        [
+            "# Comment",
+            "",
+            "**/*_meg.json",
+            "*.log",
+            "extra_data/",
+            "/sub-*/notes.txt",
+            "derivatives/**/figures",
+            "!important.log",
+        ]
+    )
+    ignored = [
+        "sub-01/meg/sub-01_task-rest_meg.json",
+        "task-rest_meg.json",
+        "run.log",
+        "sub-01/anat/run.log",
+        "extra_data/file.txt",
+        "sub-01/extra_data/file.txt",
+        "extra_data/",
+        "sub-01/notes.txt",
+        "derivatives/fmriprep/sub-01/figures/report.svg",
+        "derivatives/figures/report.svg",
+    ]
+    kept = [
+        "sub-01/meg/sub-01_task-rest_meg.fif",
+        "important.log",
+        "sub-01/important.log",
+        "extra_data",
+        "sub-01/ses-01/notes.txt",
+        "notes.txt",
+        "figures/report.svg",
+    ]
+    for path in ignored:
+        assert bidsignore.is_ignored(path), path
+    for path in kept:
+        assert not bidsignore.is_ignored(path), path
+    assert list(bidsignore.filter(ignored + kept)) == kept
+
+    # Files in ignored directories cannot be re-included
+    assert BidsIgnore(["extra_data/", "!keep.log"]).is_ignored("extra_data/keep.log")
+    assert BidsIgnore(["extra_data/", "!extra_data/"]).is_ignored("extra_data/keep.log") is False
+    # Negated directories do not re-include ignored files inside them
+    bidsignore = BidsIgnore(["*.log", "!/sub-01/"])
+    assert bidsignore.is_ignored("sub-01/anat/run.log")
+    assert not bidsignore.is_ignored("sub-01/")
+    assert BidsIgnore(["logs/**", "!logs/keep.txt"]).is_ignored("logs/keep.txt") is False
+
+    assert not BidsIgnore(["# Only comments", ""])
+    assert list(BidsIgnore([]).filter(kept)) == kept
+
+
+def test_iter_validate_bids(tmp_path):
+    from bidsschematools.validator import iter_validate_bids
+
+    write_tree(
+        tmp_path,
+        [
+            "dataset_description.json",
+            "sub-01/anat/sub-01_T1w.nii.gz",
+            "sub-01/anat/sub-01_T1w.nii.gz.bak",
+        ],
+    )
+
+    summary = {}
+    results = iter_validate_bids(str(tmp_path), summary=summary)
+    first = next(results)
+    # Results are available before the dataset is fully walked
+    assert summary["file_count"] == 1
+    assert first["path"].endswith("/dataset_description.json")
+    assert first["match"]
+    assert first["groups"] == {"path": "dataset_description.json"}
+
+    results = {result["path"].rsplit("/", 1)[-1]: result for result in [first, *results]}
+    assert results["sub-01_T1w.nii.gz"]["match"]
+    assert results["sub-01_T1w.nii.gz"]["groups"]["subject"] == "01"
+    assert not results["sub-01_T1w.nii.gz.bak"]["match"]
+    assert results["sub-01_T1w.nii.gz.bak"]["regex"] is None
+    assert summary["file_count"] == 3
+    assert summary["valid_file_count"] == 2
+    assert summary["missing_mandatory"] == []
+
+    summary = {}
+    results = list(
+        iter_validate_bids(["/sub-01/anat/sub-01_T1w.nii.gz"], dummy_paths=True, summary=summary)
+    )
+    assert results[0]["match"]
+    assert [entry["regex"] for entry in summary["missing_mandatory"]] == [
+        r"(?P<path>dataset_description\.json)(?:/.*)?\Z"
+    ]
+
+
+@pytest.mark.parametrize("trace", ["off", "failures", "full"])
+def test_validate_all_trace(trace):
+    from bidsschematools.rules import filename_matcher, regexify_all
+    from bidsschematools.validator import validate_all
+
+    regex_schema, _ = regexify_all()
+    paths = [
+        "/data/sub-01/ses-1/func/sub-01_ses-1_task-rest_run-1_bold.nii.gz",
+        "/data/sub-01/anat/sub-01_T1w.nii.gz.bak",
+    ]
+    match_index, _ = filename_matcher().match(paths[0])
+
+    result = validate_all(paths, regex_schema, trace=trace)
+    assert result["trace"] == trace
+    assert result["path_tracking"] == paths[1:]
+    if trace == "off":
+        assert "itemwise" not in result
+    elif trace == "failures":
+        assert len(result["itemwise"]) == len(regex_schema)
+        assert {comparison["path"] for comparison in result["itemwise"]} == {paths[1]}
+        assert not any(comparison["match"] for comparison in result["itemwise"])
+    else:
+        assert len(result["itemwise"]) == match_index + 1 + len(regex_schema)
+        assert result["itemwise"][match_index]["match"]
+        assert sum(comparison["match"] for comparison in result["itemwise"]) == 1
+
+    with pytest.raises(ValueError):
+        validate_all(paths, regex_schema, trace="verbose")
+
+
+def test_validate_all_tracking():
+    from bidsschematools.rules import filename_matcher, regexify_all
+    from bidsschematools.validator import validate_all
+
+    regex_schema, _ = regexify_all()
+    paths = [
+        "/data/sub-01/anat/sub-01_T1w.nii.gz",
+        "/data/sub-01/anat/sub-01_T1w.nii.gz.bak",
+        "/data/sub-02/anat/sub-02_T1w.nii.gz",
+        "/data/sub-01/anat/sub-01_T1w.nii.gz.bak",
+    ]
+    result = validate_all(paths, regex_schema)
+    assert result["path_listing"] == paths
+    assert result["path_tracking"] == [paths[1], paths[3]]
+    assert [entry["path"] for entry in result["match_listing"]] == [paths[0], paths[2]]
+
+    # Each rule that matched no file is tracked once
+    match_index, _ = filename_matcher().match(paths[0])
+    assert len(result["schema_tracking"]) == len(regex_schema) - 1
+    assert r"(?:.*/)?" + regex_schema[match_index]["regex"] not in {
+        entry["regex"] for entry in result["schema_tracking"]
+    }
+    # Missing mandatory files are reported
+    mandatory = [entry["regex"] for entry in result["schema_tracking"] if entry["mandatory"]]
+    assert mandatory == [r"(?:.*/)?(?P<path>dataset_description\.json)(?:/.*)?\Z"]
+
+
+def test_validate_bids_manifest(tmp_path, monkeypatch):
+    from bidsschematools.rules import FilenameMatcher
+
+    dataset = tmp_path / "ds"
+    manifest_path = tmp_path / "manifest.json"
+    write_tree(
+        dataset,
+        [
+            "dataset_description.json",
+            "sub-01/anat/sub-01_T1w.nii.gz",
+            "sub-01/anat/sub-01_T1w.nii.gz.bak",
+        ],
+    )
+
+    matched_paths = []
+    match = FilenameMatcher.match
+
+    def counting_match(self, path):
+        matched_paths.append(path.rsplit("/", 1)[-1])
+        return match(self, path)
+
+    monkeypatch.setattr(FilenameMatcher, "match", counting_match)
+
+    def validate():
+        matched_paths.clear()
+        return validate_bids(str(dataset), manifest_path=str(manifest_path))
+
+    full = validate()
+    assert sorted(matched_paths) == [
+        "dataset_description.json",
+        "sub-01_T1w.nii.gz",
+        "sub-01_T1w.nii.gz.bak",
+    ]
+    assert manifest_path.exists()
+
+    # Nothing changed: all results are reused
+    assert validate() == full
+    assert matched_paths == []
+
+    # Only new paths are matched again, and files are not stat-ed
+    write_tree(dataset, ["sub-02/anat/sub-02_T1w.nii.gz"])
+    (dataset / "sub-01/anat/sub-01_T1w.nii.gz").write_text("modified")
+    (dataset / "sub-01/anat/sub-01_T1w.nii.gz.bak").unlink()
+    result = validate()
+    assert matched_paths == ["sub-02_T1w.nii.gz"]
+    assert result == validate_bids(str(dataset))
+    assert len(result["match_listing"]) == 3
+    assert len(json.loads(manifest_path.read_text())["files"]) == 3
+
+    # Mandatory files are checked across reused and new results
+    (dataset / "dataset_description.json").unlink()
+    result = validate_bids(
+        str(dataset), manifest_path=str(manifest_path), accept_non_bids_dir=True
+    )
+    assert result == validate_bids(str(dataset), accept_non_bids_dir=True)
+    mandatory = [entry["regex"] for entry in result["schema_tracking"] if entry["mandatory"]]
+    assert mandatory == [r"(?:.*/)?(?P<path>dataset_description\.json)(?:/.*)?\Z"]
+
+    # Changed regexes invalidate the manifest
+    manifest_path.write_text(manifest_path.read_text().replace('"key": "', '"key": "x'))
+    matched_paths.clear()
+    validate_bids(str(dataset), manifest_path=str(manifest_path), accept_non_bids_dir=True)
+    assert sorted(matched_paths) == ["sub-01_T1w.nii.gz", "sub-02_T1w.nii.gz"]
+
+    with pytest.raises(ValueError):
+        validate_bids(["/a/b.txt"], dummy_paths=True, manifest_path=str(manifest_path))
@@ -5,8 +5,10 @@ from __future__ import annotations
 import logging
 import os
 import sys
+import tempfile
 import warnings
 from functools import wraps
+from pathlib import Path
 
 from . import _lazytypes as lt
 from . import data
@@ -30,6 +32,54 @@ def get_bundled_schema_path() -> str:
     return str(data.load("schema"))
 
 
+def get_cache_dir() -> Path | None:
+    """Get the directory for persistent, regenerable caches.
+
+    The ``BIDSSCHEMATOOLS_CACHE_DIR`` environment variable overrides the
+    platform default; setting it to an empty string disables on-disk caching.
+
+    Returns
+    -------
+    Path or None
+        The cache directory, which need not exist yet, or ``None`` if caching is disabled.
+    """
+    cache_dir = os.getenv("BIDSSCHEMATOOLS_CACHE_DIR")
+    if cache_dir is not None:
+        return Path(cache_dir) if cache_dir else None
+    if sys.platform == "win32":
+        base = os.getenv("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "bidsschematools"
+
+
+def write_text_atomic(path: str | os.PathLike, content: str) -> None:
+    """Write a text file atomically, creating parent directories as needed.
+
+    The content is written to a temporary file in the same directory, which then
+    replaces `path`, so that concurrent readers never observe a partial file.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Path of the file to write.
+    content : str
+        Text to write.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fobj:
+            fobj.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
 def get_logger(name: str | None = None, level: int | str | None = None) -> logging.Logger:
     """Return a logger to use.
 
@@ -0,0 +1,51 @@
+"""Tools for validating the contents of BIDS datasets with the rules of the schema."""
+
+from bidsschematools.validation.associations import AssociationIndex, Associations
+from bidsschematools.validation.checks import CheckRunner
+from bidsschematools.validation.context import DatasetContext, FileContext
+from bidsschematools.validation.fields import FieldValidator, compile_definition
+from bidsschematools.validation.gzip_header import (
+    parse_gzip_header,
+    read_gzip_header,
+    read_gzip_headers,
+)
+from bidsschematools.validation.issues import Issue, IssueReport, IssueSummary
+from bidsschematools.validation.microscopy import (
+    parse_ome_xml,
+    parse_tiff_header,
+    read_ome_tiff,
+    read_ome_zarr,
+    read_tiff_header,
+)
+from bidsschematools.validation.nifti import parse_nifti_header, read_nifti_header
+from bidsschematools.validation.sidecars import SidecarResolver
+from bidsschematools.validation.tabular import TabularValidator
+from bidsschematools.validation.tsv import Column, TsvTable, load_tsv
+
+__all__ = [
+    "AssociationIndex",
+    "Associations",
+    "CheckRunner",
+    "Column",
+    "DatasetContext",
+    "FieldValidator",
+    "FileContext",
+    "Issue",
+    "IssueReport",
+    "IssueSummary",
+    "SidecarResolver",
+    "TabularValidator",
+    "TsvTable",
+    "compile_definition",
+    "load_tsv",
+    "parse_gzip_header",
+    "parse_nifti_header",
+    "parse_ome_xml",
+    "parse_tiff_header",
+    "read_gzip_header",
+    "read_gzip_headers",
+    "read_nifti_header",
+    "read_ome_tiff",
+    "read_ome_zarr",
+    "read_tiff_header",
+]
@@ -0,0 +1,245 @@
+"""Discovery of associated files, as described in ``meta/associations.yaml``
+
+An association of a file, such as the events of a BOLD series, applies if all of its
+selectors are truthy in the context of the file.
+The associated file has the ``target`` suffix and extension, and entities that are a subset
+of the entities of the file, except for the ``target`` entities, which may take any value.
+It is found in the directory of the file or, if the association is inherited, in a parent
+directory, with the deepest and most specific match taking precedence.
+
+All files of a dataset are indexed once by directory, suffix and extension, so finding an
+associated file is a hash lookup followed by a comparison of entities with the few files
+in the bucket, rather than a listing of directories.
+"""
+
+from __future__ import annotations
+
+import posixpath
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+
+import bidsschematools as bst
+import bidsschematools.expressions
+from bidsschematools.rules import parse_entities, split_filename
+from bidsschematools.types import context as ctx
+
+from .. import _lazytypes as lt
+
+
+class AssociationIndex:
+    """Index of the files of a dataset, to find the files associated with another file
+
+    Parameters
+    ----------
+    paths : iterable of str
+        The files of the dataset, relative to its root.
+    rules : Mapping
+        The association rules, ``schema.meta.associations``.
+    entity_keys : Mapping, optional
+        A mapping of entity names to keys, as passed to
+        :func:`~bidsschematools.rules.parse_entities`.
+
+    Examples
+    --------
+    >>> rules = {
+    ...     "events": {
+    ...         "selectors": ["extension != '.json'"],
+    ...         "target": {"suffix": "events", "extension": ".tsv"},
+    ...         "inherit": True,
+    ...     }
+    ... }
+    >>> index = AssociationIndex(
+    ...     ["task-rest_events.tsv", "sub-01/func/sub-01_task-rest_bold.nii.gz"], rules
+    ... )
+    >>> index.find("events", "sub-01/func/sub-01_task-rest_bold.nii.gz")
+    ['task-rest_events.tsv']
+    >>> index.find("events", "sub-01/func/sub-01_task-nback_bold.nii.gz")
+    []
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str],
+        rules: Mapping[str, Mapping],
+        entity_keys: Mapping[str, str] | None = None,
+    ):
+        self.rules = rules
+        self._entity_keys = entity_keys
+        self._files = defaultdict(list)
+        for path in paths:
+            suffix, ext = split_filename(path)
+            directory = posixpath.dirname(path.rstrip("/"))
+            self._files[directory, suffix, ext].append((parse_entities(path, entity_keys), path))
+        for files in self._files.values():
+            # More specific files take precedence
+            files.sort(key=lambda file: -len(file[0]))
+        self._selectors = {
+            name: [bst.expressions.compile(selector) for selector in rule.get("selectors", [])]
+            for name, rule in rules.items()
+        }
+
+    def applies(self, name: str, context: lt.Any) -> bool:
+        """Check whether the selectors of an association are truthy in the context of a file"""
+        return all(bst.expressions.truthy(selector(context)) for selector in self._selectors[name])
+
+    def find(self, name: str, path: str, entities: Mapping[str, str] | None = None) -> list[str]:
+        """Find the files associated with a file, from the most to the least specific
+
+        Selectors are not evaluated; see :meth:`applies`.
+
+        Parameters
+        ----------
+        name : str
+            The name of the association, such as ``"events"``.
+        path : str
+            The path of the file, relative to the dataset root.
+        entities : Mapping, optional
+            The entities of the file, if already parsed.
+
+        Returns
+        -------
+        list of str
+            The paths of the associated files, relative to the dataset root.
+        """
+        path = path.strip("/")
+        rule = self.rules[name]
+        target = rule.get("target", {})
+        source_suffix, source_ext = split_filename(path)
+        if entities is None:
+            entities = parse_entities(path, self._entity_keys)
+        suffix = target.get("suffix", source_suffix)
+        extensions = target.get("extension", source_ext)
+        if isinstance(extensions, str):
+            extensions = [extensions]
+        free = set(target.get("entities", ()))
+
+        found = []
+        directory = posixpath.dirname(path)
+        while True:
+            for ext in extensions:
+                for file_entities, file_path in self._files.get((directory, suffix, ext), ()):
+                    if file_path != path and all(
+                        key in free or entities.get(key) == value
+                        for key, value in file_entities.items()
+                    ):
+                        found.append(file_path)
+            if not directory or not rule.get("inherit"):
+                return found
+            directory = posixpath.dirname(directory)
+
+
+def _load_rows(dataset, path):
+    with open(dataset.abspath(path), encoding="utf-8") as fobj:
+        return [line.split() for line in fobj.read().splitlines() if line.strip()]
+
+
+def _events(dataset, paths):
+    columns = dataset.load_tsv(paths[0])
+    return ctx.Events(
+        path=f"/{paths[0]}", onset=columns.get("onset"), sidecar=dataset.sidecars.resolve(paths[0])
+    )
+
+
+def _aslcontext(dataset, paths):
+    columns = dataset.load_tsv(paths[0])
+    return ctx.Aslcontext(
+        path=f"/{paths[0]}", n_rows=columns.n_rows, volume_type=columns.get("volume_type")
+    )
+
+
+def _bval(dataset, paths):
+    rows = _load_rows(dataset, paths[0])
+    return ctx.Bval(
+        path=f"/{paths[0]}",
+        n_cols=len(rows[0]) if rows else 0,
+        n_rows=len(rows),
+        values=[float(value) for row in rows for value in row],
+    )
+
+
+def _bvec(dataset, paths):
+    rows = _load_rows(dataset, paths[0])
+    return ctx.Bvec(path=f"/{paths[0]}", n_cols=len(rows[0]) if rows else 0, n_rows=len(rows))
+
+
+def _channels(dataset, paths):
+    columns = dataset.load_tsv(paths[0])
+    return ctx.Channels(
+        path=f"/{paths[0]}",
+        type=columns.get("type"),
+        short_channel=columns.get("short_channel"),
+        sampling_frequency=columns.get("sampling_frequency"),
+    )
+
+
+def _coordsystems(dataset, paths):
+    return ctx.Coordsystems(
+        paths=[f"/{path}" for path in paths],
+        spaces=[parse_entities(path).get("space") for path in paths],
+        ParentCoordinateSystems=[
+            dataset.sidecars.load(path).get("ParentCoordinateSystem") for path in paths
+        ],
+    )
+
+
+def _physio(dataset, paths):
+    return ctx.Physio(path=f"/{paths[0]}", sidecar=dataset.sidecars.resolve(paths[0]))
+
+
+def _path_only(cls):
+    return lambda dataset, paths: cls(path=f"/{paths[0]}")
+
+
+#: Functions that build the context of an association, given the dataset and the
+#: associated paths, by name
+ASSOCIATION_BUILDERS: dict[str, lt.Callable[[lt.Any, list[str]], lt.Any]] = {
+    "events": _events,
+    "aslcontext": _aslcontext,
+    "m0scan": _path_only(ctx.M0scan),
+    "magnitude": _path_only(ctx.Magnitude),
+    "magnitude1": _path_only(ctx.Magnitude1),
+    "bval": _bval,
+    "bvec": _bvec,
+    "channels": _channels,
+    "electrodes": _path_only(ctx.Electrodes),
+    "coordsystem": _path_only(ctx.Coordsystem),
+    "coordsystems": _coordsystems,
+    "physio": _physio,
+    "atlas_description": _path_only(ctx.AtlasDescription),
+}
+
+
+class Associations:
+    """The ``associations`` namespace of the context of a file
+
+    Each association is found, and its files are read, when it is first accessed.
+    Associations that do not apply to the file, or whose files are not found, are ``None``.
+
+    Parameters
+    ----------
+    dataset : DatasetContext
+        The dataset that contains the file.
+    context : FileContext
+        The context of the file.
+    """
+
+    def __init__(self, dataset: lt.Any, context: lt.Any):
+        self._dataset = dataset
+        self._context = context
+
+    def __getattr__(self, name):
+        builder = None if name.startswith("_") else ASSOCIATION_BUILDERS.get(name)
+        if builder is None:
+            raise AttributeError(name)
+        index = self._dataset.association_index
+        value = None
+        if name in index.rules and index.applies(name, self._context):
+            paths = index.find(name, self._context.path, self._context.entities)
+            if paths:
+                value = builder(self._dataset, paths)
+        setattr(self, name, value)
+        return value
+
+    def to_context(self) -> ctx.Associations:
+        """Find all associations, and build a complete associations dataclass"""
+        return ctx.Associations(**{name: getattr(self, name) for name in ASSOCIATION_BUILDERS})
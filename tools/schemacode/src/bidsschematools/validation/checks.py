@@ -0,0 +1,189 @@
+"""Running the checks of ``rules.checks`` over the files of a dataset
+
+The selectors and checks of every rule are compiled once, and the rules of each file are
+found with a :class:`~bidsschematools.rules.SelectorIndex`, so most rules are never
+evaluated for a file. A rule finds an issue in a file if any of its checks is not truthy.
+
+Files are validated in batches, and issues are added to an :class:`~.issues.IssueReport`,
+which counts issues by code and keeps only a few example locations of each code.
+Only the issues of a batch are kept in memory, so the memory used by a run does not
+grow with the size of the dataset, even if every file has an issue.
+"""
+
+from __future__ import annotations
+
+import struct
+import zlib
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import replace
+from itertools import islice
+
+import bidsschematools as bst
+import bidsschematools.expressions
+from bidsschematools.rules import SelectorIndex
+
+from .. import _lazytypes as lt
+from .context import DatasetContext
+from .issues import Issue, IssueReport
+from .tabular import _get
+
+#: The default number of files validated in a batch
+BATCH_SIZE = 1000
+
+# Errors raised by the readers of files, such as of compressed or binary headers
+_READ_ERRORS = (OSError, EOFError, ValueError, zlib.error, struct.error)
+
+
+class CheckRunner:
+    """Runner of the checks of ``rules.checks``
+
+    Parameters
+    ----------
+    schema : Mapping
+        The BIDS schema.
+    validators : iterable, optional
+        Other validators run with the checks, such as a :class:`~.tabular.TabularValidator`,
+        with a ``validate`` method that takes the context of a file and returns a list of
+        :class:`~.issues.Issue`.
+
+    Examples
+    --------
+    >>> from bidsschematools.schema import load_schema
+    >>> runner = CheckRunner(load_schema())
+    >>> context = {"suffix": "bold", "path": "/sub-01/func/sub-01_task-rest_bold.nii.gz"}
+    >>> context["sidecar"] = {"RepetitionTime": 2000}
+    >>> [(issue.code, issue.level) for issue in runner.check(context)]
+    [('REPETITION_TIME_GREATER_THAN', 'warning')]
+    """
+
+    def __init__(self, schema: Mapping, validators: Iterable[lt.Any] = ()):
+        self.schema = schema
+        self.validators = list(validators)
+        self.index = SelectorIndex.from_schema(schema, sections=("checks",))
+        self._rules = {}
+        for name, rule in self.index.rules.items():
+            issue = rule["issue"]
+            template = Issue(
+                code=issue["code"],
+                level=issue.get("level", "error"),
+                message=issue["message"].strip(),
+                rule=name,
+            )
+            checks = tuple(bst.expressions.compile(check) for check in rule.get("checks", []))
+            self._rules[name] = (template, checks)
+        self._file_read = Issue.from_schema(schema, "FileRead")
+
+    def check(self, context: lt.Any) -> list[Issue]:
+        """Run the checks of the rules that apply to a file
+
+        Parameters
+        ----------
+        context : Mapping or object
+            The context of a file, such as a :class:`~.context.FileContext`.
+
+        Returns
+        -------
+        list of Issue
+            One issue for each rule with a failing check.
+        """
+        location = _get(context, "path")
+        truthy = bst.expressions.truthy
+        issues = []
+        for name in self.index.select(context):
+            template, checks = self._rules[name]
+            for check in checks:
+                if not truthy(check(context)):
+                    issues.append(replace(template, location=location))
+                    break
+        return issues
+
+    def validate(self, context: lt.Any) -> list[Issue]:
+        """Run the checks and the other validators on a file
+
+        Files that cannot be read while they are validated have a ``FILE_READ`` issue,
+        besides the issues found by the checks and validators that could read them.
+        Other errors, which are bugs, are raised.
+        """
+        issues = []
+        read_error = None
+        for validate in (self.check, *(validator.validate for validator in self.validators)):
+            try:
+                issues.extend(validate(context))
+            except _READ_ERRORS as err:
+                read_error = read_error or err
+        if read_error is not None:
+            issues.append(
+                replace(
+                    self._file_read,
+                    location=_get(context, "path"),
+                    detail=f"{type(read_error).__name__}: {read_error}",
+                )
+            )
+        return issues
+
+    def iter_batches(
+        self,
+        dataset: DatasetContext,
+        paths: Iterable[str] | None = None,
+        *,
+        batch_size: int = BATCH_SIZE,
+    ) -> Iterator[tuple[list[str], list[Issue]]]:
+        """Validate the files of a dataset, and yield the issues of each batch of files
+
+        Issues may be written out as batches are validated, rather than kept in memory.
+
+        Parameters
+        ----------
+        dataset : DatasetContext
+            The dataset.
+        paths : iterable of str, optional
+            The files to validate, relative to the dataset root.
+            By default, all files that are not ignored.
+        batch_size : int, optional
+            The number of files validated in a batch.
+
+        Yields
+        ------
+        tuple of list of str and list of Issue
+            The files of a batch, and their issues.
+        """
+        paths = iter(dataset.files if paths is None else paths)
+        while batch := list(islice(paths, batch_size)):
+            issues = []
+            for path in batch:
+                issues.extend(self.validate(dataset.context(path)))
+            yield batch, issues
+
+    def run(
+        self,
+        dataset: DatasetContext,
+        paths: Iterable[str] | None = None,
+        *,
+        batch_size: int = BATCH_SIZE,
+        report: IssueReport | None = None,
+    ) -> IssueReport:
+        """Validate the files of a dataset, and aggregate their issues by code
+
+        Parameters
+        ----------
+        dataset : DatasetContext
+            The dataset.
+        paths : iterable of str, optional
+            The files to validate, relative to the dataset root.
+            By default, all files that are not ignored.
+        batch_size : int, optional
+            The number of files validated in a batch.
+        report : IssueReport, optional
+            A report to add issues to, for example to validate several datasets, or to
+            store more example locations. By default, a new report.
+
+        Returns
+        -------
+        IssueReport
+            The issues found, aggregated by code.
+        """
+        if report is None:
+            report = IssueReport()
+        for _, issues in self.iter_batches(dataset, paths, batch_size=batch_size):
+            report.update(issues)
+        return report
@@ -0,0 +1,421 @@
+"""Construction of the validation context described in ``meta/context.yaml``
+
+Contexts are built lazily. Each namespace of a :class:`FileContext` is computed when an
+expression first accesses it, so that selectors and checks that only depend on the name of
+a file never read its contents, or the contents of its sidecars.
+Dataset-wide namespaces are computed once per :class:`DatasetContext`.
+
+Namespaces are populated with the dataclasses of :mod:`bidsschematools.types.context`,
+and :meth:`FileContext.to_context` builds a complete context dataclass.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import posixpath
+import struct
+import zlib
+from collections.abc import Iterable, Mapping
+from functools import cached_property
+from pathlib import Path
+
+import bidsschematools as bst
+import bidsschematools.schema
+from bidsschematools.rules import parse_entities, split_filename
+from bidsschematools.types import context as ctx
+from bidsschematools.validator import BidsIgnore, _get_directory_suffixes, _iter_paths
+
+from .. import _lazytypes as lt
+from .associations import AssociationIndex, Associations
+from .gzip_header import read_gzip_headers
+from .microscopy import read_ome_tiff, read_ome_zarr, read_tiff_header
+from .nifti import read_nifti_header
+from .sidecars import SidecarResolver
+from .tsv import TsvTable, load_tsv
+
+
+def _build_tree(paths):
+    """Build a tree of nested dictionaries from a list of paths
+
+    >>> _build_tree(["README", "sub-01/anat/sub-01_T1w.nii", "sub-01/micr/sub-01_SEM.ome.zarr/"])
+    {'README': {}, 'sub-01': {'anat': {'sub-01_T1w.nii': {}}, 'micr': {'sub-01_SEM.ome.zarr': {}}}}
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        for component in path.rstrip("/").split("/"):
+            node = node.setdefault(component, {})
+    return tree
+
+
+class DatasetContext:
+    """Files and dataset-wide context of a BIDS dataset
+
+    Parameters
+    ----------
+    root : str or os.PathLike
+        The root directory of the dataset.
+    schema : Namespace, optional
+        The BIDS schema. By default, the schema bundled with bidsschematools.
+    paths : iterable of str, optional
+        The files of the dataset, relative to `root`, including ignored files.
+        By default, the dataset is walked the first time files are listed,
+        as by :func:`bidsschematools.validator.validate_bids`.
+    max_tsv_rows : int, optional
+        The maximum number of rows loaded from a TSV file. By default, all rows are loaded.
+    max_workers : int or None, optional
+        The number of threads used to walk the dataset, one task per subdirectory of `root`.
+        By default, the dataset is walked serially.
+
+    Examples
+    --------
+    >>> dataset = DatasetContext(
+    ...     "/data",
+    ...     paths=["dataset_description.json", "sub-01/anat/sub-01_T1w.nii.gz", "extra/notes.txt"],
+    ... )
+    >>> dataset.datatypes
+    ['anat']
+    >>> context = dataset.context("sub-01/anat/sub-01_T1w.nii.gz")
+    >>> context.path, context.suffix, context.extension, context.modality
+    ('/sub-01/anat/sub-01_T1w.nii.gz', 'T1w', '.nii.gz', 'mri')
+    """
+
+    def __init__(
+        self,
+        root: str | os.PathLike,
+        schema: Mapping | None = None,
+        paths: Iterable[str] | None = None,
+        max_tsv_rows: int | None = None,
+        max_workers: int | None = 1,
+    ):
+        self.root = os.path.abspath(root)
+        self.max_tsv_rows = max_tsv_rows
+        self.max_workers = max_workers
+        self.schema = bst.schema.load_schema() if schema is None else schema
+        self._subjects = {}
+        if paths is not None:
+            self.paths = [path.lstrip("/") for path in paths]
+
+    @cached_property
+    def paths(self) -> list[str]:
+        """All files of the dataset, relative to its root, including ignored files
+
+        Hidden files and nested datasets are not listed, and directories with the extension
+        of a file, such as ``.ome.zarr``, are listed with a trailing slash.
+        """
+        prefix = Path(self.root).as_posix().rstrip("/") + "/"
+        return [
+            path[len(prefix) :]
+            for path in _iter_paths(
+                [self.root],
+                pseudofile_suffixes=_get_directory_suffixes(self.schema),
+                max_workers=self.max_workers,
+                include_ignored=True,
+            )
+        ]
+
+    @cached_property
+    def bidsignore(self) -> BidsIgnore:
+        """The patterns of the ``.bidsignore`` file of the dataset"""
+        try:
+            return BidsIgnore.from_file(os.path.join(self.root, ".bidsignore"))
+        except FileNotFoundError:
+            return BidsIgnore([])
+
+    @cached_property
+    def ignored(self) -> list[str]:
+        """Files matched by ``.bidsignore``"""
+        return [path for path in self.paths if self.bidsignore.is_ignored(path)]
+
+    @cached_property
+    def files(self) -> list[str]:
+        """Files to validate, that is, files that are not ignored"""
+        return list(self.bidsignore.filter(self.paths))
+
+    @cached_property
+    def tree(self) -> dict[str, lt.Any]:
+        """All files of the dataset as nested dictionaries, with an empty dictionary per file"""
+        return _build_tree(self.paths)
+
+    @cached_property
+    def dataset_description(self) -> dict[str, lt.Any]:
+        """Contents of ``dataset_description.json``, or an empty dictionary if it is missing"""
+        try:
+            return self.sidecars.load("dataset_description.json")
+        except FileNotFoundError:
+            return {}
+
+    @cached_property
+    def datatypes(self) -> list[str]:
+        """Datatypes of the directories of subjects and sessions"""
+        datatypes = set()
+        for path in self.files:
+            parts = path.split("/")
+            if not parts[0].startswith("sub-"):
+                continue
+            idx = 2 if len(parts) > 2 and parts[1].startswith("ses-") else 1
+            if len(parts) > idx + 1 and parts[idx] in self._datatype_modalities:
+                datatypes.add(parts[idx])
+        return sorted(datatypes)
+
+    @cached_property
+    def modalities(self) -> list[str]:
+        """Modalities of the datatypes in the dataset"""
+        return sorted(
+            {
+                self._datatype_modalities[datatype]
+                for datatype in self.datatypes
+                if self._datatype_modalities[datatype] is not None
+            }
+        )
+
+    @cached_property
+    def subjects(self) -> ctx.Subjects:
+        """Subject directories and the ``participant_id`` column of ``participants.tsv``"""
+        sub_dirs = sorted(
+            name for name, node in self.tree.items() if name.startswith("sub-") and node
+        )
+        participant_id = None
+        if "participants.tsv" in self.tree:
+            participant_id = self.load_tsv("participants.tsv").get("participant_id")
+        return ctx.Subjects(sub_dirs=sub_dirs, participant_id=participant_id)
+
+    @cached_property
+    def dataset(self) -> ctx.Dataset:
+        """The ``dataset`` namespace of the context"""
+        return ctx.Dataset(
+            dataset_description=self.dataset_description,
+            tree=self.tree,
+            ignored=self.ignored,
+            datatypes=self.datatypes,
+            modalities=self.modalities,
+            subjects=self.subjects,
+        )
+
+    def subject(self, sub_dir: str) -> ctx.Subject:
+        """The ``subject`` namespace of the context of files of a subject
+
+        Parameters
+        ----------
+        sub_dir : str
+            The name of the subject directory, for example ``"sub-01"``.
+        """
+        try:
+            return self._subjects[sub_dir]
+        except KeyError:
+            pass
+        node = self.tree.get(sub_dir, {})
+        ses_dirs = sorted(
+            name for name, child in node.items() if name.startswith("ses-") and child
+        )
+        session_id = None
+        sessions_file = f"{sub_dir}_sessions.tsv"
+        if sessions_file in node:
+            session_id = self.load_tsv(f"{sub_dir}/{sessions_file}").get("session_id")
+        subject = ctx.Subject(sessions=ctx.Sessions(ses_dirs=ses_dirs, session_id=session_id))
+        self._subjects[sub_dir] = subject
+        return subject
+
+    @cached_property
+    def _entity_keys(self):
+        return {entity.name: key for key, entity in self.schema.objects.entities.items()}
+
+    @cached_property
+    def _datatype_modalities(self):
+        modalities = {datatype.value: None for datatype in self.schema.objects.datatypes.values()}
+        for modality, rule in self.schema.rules.modalities.items():
+            for datatype in rule.datatypes:
+                modalities[datatype] = modality
+        return modalities
+
+    @cached_property
+    def sidecars(self) -> SidecarResolver:
+        """The resolver of the sidecars of files, which also caches parsed JSON files"""
+        return SidecarResolver(
+            self.files, self.load_json, self._entity_keys, self.schema.rules.entities
+        )
+
+    @cached_property
+    def association_index(self) -> AssociationIndex:
+        """The index of files used to find the associations of files"""
+        return AssociationIndex(self.files, self.schema.meta.associations, self._entity_keys)
+
+    @cached_property
+    def gzip_headers(self) -> dict[str, ctx.Gzip | None]:
+        """The headers of all gzip files to validate, read together, by path
+
+        Headers are ``None`` for files that are not valid gzip files.
+        """
+        paths = [path for path in self.files if path.endswith(".gz")]
+        headers = read_gzip_headers(self.abspath(path) for path in paths)
+        return dict(zip(paths, headers.values()))
+
+    def abspath(self, path: str) -> str:
+        """Find the absolute path of a file of the dataset"""
+        return os.path.join(self.root, *path.strip("/").split("/"))
+
+    def load_json(self, path: str) -> lt.Any:
+        """Load a JSON file of the dataset"""
+        with open(self.abspath(path), encoding="utf-8") as fobj:
+            return json.load(fobj)
+
+    def load_tsv(self, path: str) -> TsvTable:
+        """Load the columns of a TSV file of the dataset, indexed by column name
+
+        Columns are parsed when first accessed, as described in :mod:`.tsv`.
+        """
+        return load_tsv(self.abspath(path), self.max_tsv_rows)
+
+    def context(self, path: str) -> FileContext:
+        """Create the context of a file of the dataset
+
+        Parameters
+        ----------
+        path : str
+            The path of the file, relative to the dataset root.
+        """
+        return FileContext(self, path)
+
+
+class FileContext:
+    """The validation context of a file, with namespaces computed when first accessed
+
+    The attributes of this class are the namespaces of ``meta/context.yaml``, so it may
+    be passed as the context of :func:`bidsschematools.expressions.evaluate` or of
+    compiled expressions.
+    The ``associations`` namespace is an :class:`~.associations.Associations`,
+    whose associations are also found when first accessed.
+    The ``nifti_header``, ``gzip``, ``ome`` and ``tiff`` namespaces are ``None`` if the
+    header of a file cannot be read. The headers of all gzip files to validate are read
+    together, when the ``gzip`` namespace of any file is first accessed.
+
+    Parameters
+    ----------
+    dataset : DatasetContext
+        The dataset that contains the file.
+    path : str
+        The path of the file, relative to the dataset root.
+    """
+
+    def __init__(self, dataset: DatasetContext, path: str):
+        self._dataset = dataset
+        self._relpath = path.lstrip("/")
+        self.path = f"/{self._relpath}"
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.path}>"
+
+    @property
+    def schema(self) -> Mapping:
+        return self._dataset.schema
+
+    @property
+    def dataset(self) -> ctx.Dataset:
+        return self._dataset.dataset
+
+    @cached_property
+    def subject(self) -> ctx.Subject | None:
+        sub_dir = self._relpath.partition("/")[0]
+        if not sub_dir.startswith("sub-") or sub_dir == self._relpath:
+            return None
+        return self._dataset.subject(sub_dir)
+
+    @cached_property
+    def size(self) -> int:
+        path = self._dataset.abspath(self._relpath)
+        if not self._relpath.endswith("/"):
+            return os.stat(path).st_size
+        return sum(
+            os.stat(os.path.join(dirpath, name)).st_size
+            for dirpath, _, filenames in os.walk(path)
+            for name in filenames
+        )
+
+    @cached_property
+    def _split_filename(self):
+        return split_filename(self._relpath)
+
+    @cached_property
+    def entities(self) -> dict[str, str]:
+        return parse_entities(self._relpath, self._dataset._entity_keys)
+
+    @cached_property
+    def datatype(self) -> str | None:
+        parent = posixpath.basename(posixpath.dirname(self._relpath.rstrip("/")))
+        return parent if parent in self._dataset._datatype_modalities else None
+
+    @property
+    def suffix(self) -> str | None:
+        return self._split_filename[0]
+
+    @property
+    def extension(self) -> str | None:
+        return self._split_filename[1]
+
+    @cached_property
+    def modality(self) -> str | None:
+        return self._dataset._datatype_modalities.get(self.datatype)
+
+    @cached_property
+    def sidecar(self) -> dict[str, lt.Any]:
+        return self._dataset.sidecars.resolve(self._relpath, self.entities)
+
+    @cached_property
+    def associations(self) -> Associations:
+        return Associations(self._dataset, self)
+
+    @cached_property
+    def columns(self) -> TsvTable | None:
+        if self.extension != ".tsv":
+            return None
+        return self._dataset.load_tsv(self._relpath)
+
+    @cached_property
+    def json(self) -> lt.Any:
+        if self.extension != ".json":
+            return None
+        return self._dataset.sidecars.load(self._relpath)
+
+    @cached_property
+    def nifti_header(self) -> ctx.NiftiHeader | None:
+        if self.extension not in (".nii", ".nii.gz"):
+            return None
+        try:
+            return read_nifti_header(self._dataset.abspath(self._relpath))
+        except (OSError, EOFError, ValueError, zlib.error, struct.error):
+            return None
+
+    @cached_property
+    def gzip(self) -> ctx.Gzip | None:
+        return self._dataset.gzip_headers.get(self._relpath)
+
+    @cached_property
+    def ome(self) -> ctx.Ome | None:
+        path = self._dataset.abspath(self._relpath)
+        try:
+            if self.extension in (".ome.tif", ".ome.btf"):
+                return read_ome_tiff(path)
+            if self.extension == ".ome.zarr/":
+                return read_ome_zarr(path)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    @cached_property
+    def tiff(self) -> ctx.Tiff | None:
+        if not self._relpath.endswith((".tif", ".tiff", ".btf")):
+            return None
+        try:
+            return read_tiff_header(self._dataset.abspath(self._relpath))
+        except (OSError, ValueError):
+            return None
+
+    def to_context(self) -> ctx.Context:
+        """Compute all namespaces, and build a :class:`~bidsschematools.types.context.Context`"""
+        namespaces = {
+            field.name: getattr(self, field.name) for field in dataclasses.fields(ctx.Context)
+        }
+        namespaces["associations"] = self.associations.to_context()
+        return ctx.Context(**namespaces)
@@ -0,0 +1,381 @@
+"""Validation of JSON files and sidecars with the rules of ``rules.sidecars`` and ``rules.json``
+
+The definitions of ``objects.metadata`` are a subset of JSON Schema, with ``format`` naming
+a pattern of ``objects.formats``. Each definition is compiled once per schema, when it is
+first used, into a function that checks a value and describes why it is invalid, and each
+rule is compiled into a list of its fields, their levels and their checks.
+Validating a file is then a loop over the fields of its rules, with no JSON Schema
+validator built or traversed per file.
+
+The rules of ``rules.sidecars`` apply to the merged sidecar of a file, ``context.sidecar``,
+and the rules of ``rules.json`` to the contents of a JSON file, ``context.json``.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Mapping
+from dataclasses import replace
+
+from bidsschematools.rules import SelectorIndex
+
+from .. import _lazytypes as lt
+from .issues import Issue
+from .tabular import _get
+
+_TYPES = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: (
+        isinstance(value, int)
+        and not isinstance(value, bool)
+        or isinstance(value, float)
+        and value.is_integer()
+    ),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, Mapping),
+    "null": lambda value: value is None,
+}
+
+_ARTICLES = {"array": "an array", "integer": "an integer", "object": "an object"}
+
+# The issues of missing fields, by section and level
+_MISSING = {
+    ("sidecars", "required"): "SidecarKeyRequired",
+    ("sidecars", "recommended"): "SidecarKeyRecommended",
+    ("json", "required"): "JsonKeyRequired",
+    ("json", "recommended"): "JsonKeyRecommended",
+}
+
+# The issues of invalid values, by section
+_INVALID = {"sidecars": "SidecarFieldValueInvalid", "json": "JsonSchemaValidationError"}
+
+
+def _json_equal(a, b):
+    """Compare JSON values, in which booleans are not numbers, but 1 and 1.0 are equal"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(map(_json_equal, a, b))
+    if isinstance(a, Mapping) and isinstance(b, Mapping):
+        return a.keys() == b.keys() and all(_json_equal(a[key], b[key]) for key in a)
+    return a == b
+
+
+def _sequence(checks):
+    """Combine checks, returning the reason of the first failure"""
+    if len(checks) == 1:
+        return checks[0]
+
+    def check(value):
+        for part in checks:
+            reason = part(value)
+            if reason is not None:
+                return reason
+        return None
+
+    return check
+
+
+def _type_check(name):
+    is_type = _TYPES[name]
+    reason = f"must be {_ARTICLES.get(name, f'a {name}')}"
+    return lambda value: None if is_type(value) else reason
+
+
+def _number_check(definition):
+    bounds = []
+    for key, fails, text in (
+        ("minimum", float.__lt__, "at least"),
+        ("exclusiveMinimum", float.__le__, "greater than"),
+        ("maximum", float.__gt__, "at most"),
+        ("exclusiveMaximum", float.__ge__, "less than"),
+    ):
+        if key in definition:
+            bound = definition[key]
+            bounds.append((float(bound), fails, f"must be {text} {bound}"))
+    if not bounds:
+        return None
+    is_number = _TYPES["number"]
+
+    def check(value):
+        if is_number(value):
+            for bound, fails, reason in bounds:
+                if fails(float(value), bound):
+                    return reason
+        return None
+
+    return check
+
+
+def _array_check(definition, formats):
+    min_items = definition.get("minItems")
+    max_items = definition.get("maxItems")
+    items = definition.get("items")
+    item_check = compile_definition(items, formats) if isinstance(items, Mapping) else None
+    if min_items is None and max_items is None and item_check is None:
+        return None
+
+    def check(value):
+        if not isinstance(value, list):
+            return None
+        if min_items is not None and len(value) < min_items:
+            return f"must have at least {min_items} items"
+        if max_items is not None and len(value) > max_items:
+            return f"must have at most {max_items} items"
+        if item_check is not None:
+            for idx, item in enumerate(value):
+                reason = item_check(item)
+                if reason is not None:
+                    return f"item {idx} {reason}"
+        return None
+
+    return check
+
+
+def _object_check(definition, formats):
+    properties = {
+        key: compile_definition(prop, formats)
+        for key, prop in (definition.get("properties") or {}).items()
+    }
+    required = list(definition.get("required") or [])
+    additional = definition.get("additionalProperties")
+    additional_check = (
+        compile_definition(additional, formats) if isinstance(additional, Mapping) else None
+    )
+    if not properties and not required and additional_check is None and additional is not False:
+        return None
+
+    def check(value):
+        if not isinstance(value, Mapping):
+            return None
+        for key in required:
+            if key not in value:
+                return f"must have property {key!r}"
+        for key, item in value.items():
+            prop_check = properties.get(key, additional_check)
+            if prop_check is None:
+                if additional is False and key not in properties:
+                    return f"must not have property {key!r}"
+                continue
+            reason = prop_check(item)
+            if reason is not None:
+                return f"property {key!r} {reason}"
+        return None
+
+    return check
+
+
+def compile_definition(definition: Mapping, formats: Mapping) -> lt.Callable:
+    """Compile a definition of ``objects.metadata`` into a check of values
+
+    Parameters
+    ----------
+    definition : Mapping
+        A definition, with the JSON Schema keywords ``type``, ``enum``, ``minimum``,
+        ``maximum``, ``exclusiveMinimum``, ``exclusiveMaximum``, ``items``, ``minItems``,
+        ``maxItems``, ``properties``, ``required``, ``additionalProperties``, ``anyOf``
+        and ``format``, whose patterns are found in `formats`.
+    formats : Mapping
+        The formats of values, ``objects.formats``.
+
+    Returns
+    -------
+    callable
+        A function of a value, which returns ``None`` if the value is valid,
+        or else the reason it is invalid.
+
+    Examples
+    --------
+    >>> check = compile_definition(
+    ...     {"type": "array", "items": {"type": "number", "minimum": 0}}, {}
+    ... )
+    >>> check([0, 1.5]) is None
+    True
+    >>> check([0, -1])
+    'item 1 must be at least 0'
+    >>> check(0)
+    'must be an array'
+    """
+    if "anyOf" in definition:
+        options = [compile_definition(option, formats) for option in definition["anyOf"]]
+
+        def check_any(value):
+            reasons = []
+            for option in options:
+                reason = option(value)
+                if reason is None:
+                    return None
+                reasons.append(reason)
+            return " or ".join(dict.fromkeys(reasons))
+
+        return check_any
+
+    checks = []
+    if "type" in definition:
+        checks.append(_type_check(definition["type"]))
+    if "enum" in definition:
+        enum = list(definition["enum"])
+        enum_reason = f"must be one of {enum}"
+        checks.append(
+            lambda value: None if any(_json_equal(value, item) for item in enum) else enum_reason
+        )
+    if "format" in definition or "pattern" in definition:
+        fmt = definition.get("format")
+        pattern = re.compile(formats[fmt]["pattern"] if fmt else definition["pattern"])
+        pattern_reason = (
+            f"must match the format {fmt!r}" if fmt else f"must match {pattern.pattern!r}"
+        )
+        checks.append(
+            lambda value: (
+                pattern_reason if isinstance(value, str) and not pattern.fullmatch(value) else None
+            )
+        )
+    checks.extend(
+        check
+        for check in (
+            _number_check(definition),
+            _array_check(definition, formats),
+            _object_check(definition, formats),
+        )
+        if check is not None
+    )
+    if not checks:
+        return lambda value: None
+    return _sequence(checks)
+
+
+class FieldValidator:
+    """Validator of the fields of JSON files and sidecars
+
+    The values of fields are checked with the definitions of ``objects.metadata``.
+    Units, ``unit`` in definitions, describe values and are not checked.
+
+    Parameters
+    ----------
+    schema : Mapping
+        The BIDS schema.
+
+    Examples
+    --------
+    >>> from bidsschematools.schema import load_schema
+    >>> validator = FieldValidator(load_schema())
+    >>> validator.check("RepetitionTime", 2)
+    >>> validator.check("RepetitionTime", -2)
+    'must be greater than 0'
+    >>> context = {
+    ...     "path": "/dataset_description.json",
+    ...     "json": {"Name": "Example", "BIDSVersion": 1.9, "DatasetType": "raw"},
+    ... }
+    >>> for issue in validator.validate(context):
+    ...     print(issue.code, issue.subcode, issue.detail)  # doctest: +ELLIPSIS
+    JSON_SCHEMA_VALIDATION_ERROR BIDSVersion BIDSVersion must be a string
+    JSON_KEY_RECOMMENDED HEDVersion None
+    ...
+    """
+
+    def __init__(self, schema: Mapping):
+        self.schema = schema
+        self.index = SelectorIndex.from_schema(schema, sections=("sidecars", "json"))
+        self._checks = {}
+        # Issues are copies of templates, rather than looked up in the schema for each file
+        self._issues = {
+            name: Issue.from_schema(schema, name)
+            for name in (*_MISSING.values(), *_INVALID.values())
+        }
+        metadata = schema["objects"]["metadata"]
+        self._rules = {}
+        for name, rule in self.index.rules.items():
+            section = name.partition(".")[0]
+            fields = []
+            for key, field in rule.get("fields", {}).items():
+                if isinstance(field, str):
+                    field = {"level": field}
+                fields.append(
+                    (key, metadata[key]["name"], self._missing(section, field["level"], field))
+                )
+            self._rules[name] = (section, fields)
+
+    def _missing(self, section, level, field):
+        """The issue of a missing field, defined by its rule or by its level"""
+        issue = field.get("issue")
+        if issue is not None:
+            return Issue(
+                code=issue["code"],
+                level=issue.get("level", "error" if level == "required" else "warning"),
+                message=issue["message"].strip(),
+            )
+        name = _MISSING.get((section, level))
+        return self._issues[name] if name is not None else None
+
+    def _check(self, key):
+        try:
+            return self._checks[key]
+        except KeyError:
+            pass
+        check = compile_definition(
+            self.schema["objects"]["metadata"][key], self.schema["objects"]["formats"]
+        )
+        self._checks[key] = check
+        return check
+
+    def check(self, key: str, value: lt.Any) -> str | None:
+        """Check a value of a field
+
+        Parameters
+        ----------
+        key : str
+            The key of the field in ``objects.metadata``, such as ``"EchoTime__fmap"``.
+        value : Any
+            The value of the field.
+
+        Returns
+        -------
+        str or None
+            ``None`` if the value is valid, or else the reason it is invalid.
+        """
+        return self._check(key)(value)
+
+    def validate(self, context: lt.Any) -> list[Issue]:
+        """Validate the fields of the sidecar or the contents of a JSON file
+
+        Parameters
+        ----------
+        context : Mapping or object
+            The context of a file, such as a :class:`~.context.FileContext`.
+
+        Returns
+        -------
+        list of Issue
+            The issues found, without duplicates.
+        """
+        location = _get(context, "path")
+        issues = []
+        # Fields of several rules are checked once per definition, as rules may define the
+        # same field differently, such as EchoTime and EchoTime__fmap
+        checked = set()
+        for name in self.index.select(context):
+            section, fields = self._rules[name]
+            values = _get(context, "sidecar" if section == "sidecars" else "json")
+            if not isinstance(values, Mapping):
+                continue
+            for key, field, missing in fields:
+                if field in values:
+                    if (section, key) in checked:
+                        continue
+                    checked.add((section, key))
+                    reason = self._check(key)(values[field])
+                    if reason is not None:
+                        issues.append(
+                            replace(
+                                self._issues[_INVALID[section]],
+                                location=location,
+                                rule=name,
+                                subcode=field,
+                                detail=f"{field} {reason}",
+                            )
+                        )
+                elif missing is not None:
+                    issues.append(replace(missing, location=location, rule=name, subcode=field))
+        return list(dict.fromkeys(issues))
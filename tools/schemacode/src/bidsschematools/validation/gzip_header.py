@@ -0,0 +1,171 @@
+"""Reading of gzip member headers for ``context.gzip``
+
+Only the header of the first member of a gzip file, as described in :rfc:`1952`, is read.
+The compressed data is never read or decompressed, so a header costs a read of a few
+hundred bytes, even for very large files.
+Headers are cached by path and modification time, and the headers of all the gzip files
+of a dataset may be read in a thread pool with :func:`read_gzip_headers`.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from bidsschematools.types import context as ctx
+
+#: Number of bytes read at a time from the start of a file
+CHUNK_SIZE = 512
+
+#: Maximum number of bytes read to find the end of a header with long extra fields,
+#: file names or comments
+MAX_HEADER_SIZE = 1 << 20
+
+# Header flags
+_FHCRC = 0x02
+_FEXTRA = 0x04
+_FNAME = 0x08
+_FCOMMENT = 0x10
+
+# ID1, ID2, CM, FLG, MTIME, XFL and OS
+_FIXED_HEADER = struct.Struct("<BBBBIBB")
+
+
+def _parse(data):
+    """Parse a gzip header, or return ``None`` if `data` ends before the header does"""
+    if len(data) < _FIXED_HEADER.size:
+        if not b"\x1f\x8b\x08".startswith(data[:3]):
+            raise ValueError("Data does not start with a gzip header")
+        return None
+    id1, id2, method, flags, mtime, _, _ = _FIXED_HEADER.unpack_from(data)
+    if (id1, id2) != (0x1F, 0x8B):
+        raise ValueError("Data does not start with a gzip header")
+    if method != 8:
+        raise ValueError(f"Unknown gzip compression method: {method}")
+
+    offset = _FIXED_HEADER.size
+    if flags & _FEXTRA:
+        if len(data) < offset + 2:
+            return None
+        offset += 2 + struct.unpack_from("<H", data, offset)[0]
+    fields = {}
+    for flag, name in ((_FNAME, "filename"), (_FCOMMENT, "comment")):
+        if flags & flag:
+            end = data.find(b"\x00", offset)
+            if end < 0:
+                return None
+            fields[name] = data[offset:end].decode("latin-1")
+            offset = end + 1
+    if flags & _FHCRC:
+        offset += 2
+    if len(data) < offset:
+        return None
+    return ctx.Gzip(timestamp=mtime, **fields)
+
+
+def parse_gzip_header(data: bytes) -> ctx.Gzip:
+    """Parse the header of a gzip member
+
+    Parameters
+    ----------
+    data : bytes
+        The start of a gzip file, including at least the header.
+
+    Returns
+    -------
+    Gzip
+        The header fields of ``context.gzip``.
+        The file name and comment are ``None`` if they are absent from the header.
+
+    Raises
+    ------
+    ValueError
+        If `data` does not start with a complete gzip header.
+
+    Examples
+    --------
+    >>> parse_gzip_header(b"\\x1f\\x8b\\x08\\x08\\x00\\x00\\x00\\x00\\x00\\x03T1w.nii\\x00")
+    Gzip(timestamp=0, filename='T1w.nii', comment=None)
+    """
+    header = _parse(data)
+    if header is None:
+        raise ValueError("Data ends before the end of the gzip header")
+    return header
+
+
+@lru_cache(maxsize=4096)
+def _read_gzip_header(path, mtime_ns, size):
+    data = b""
+    with open(path, "rb") as fobj:
+        while True:
+            chunk = fobj.read(max(CHUNK_SIZE, len(data)))
+            data += chunk
+            header = _parse(data)
+            if header is not None:
+                return header
+            if not chunk or len(data) >= MAX_HEADER_SIZE:
+                raise ValueError(f"{path} ends before the end of the gzip header")
+
+
+def read_gzip_header(path: str | os.PathLike) -> ctx.Gzip:
+    """Read the header of a gzip file
+
+    The result is cached, and read again only if the modification time or the size
+    of the file changes.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of a gzip file.
+
+    Returns
+    -------
+    Gzip
+        The header fields of ``context.gzip``.
+
+    Raises
+    ------
+    ValueError
+        If the file does not start with a gzip header.
+    OSError
+        If the file cannot be read.
+    """
+    path = os.fspath(path)
+    stat = os.stat(path)
+    return _read_gzip_header(path, stat.st_mtime_ns, stat.st_size)
+
+
+def _read_or_none(path):
+    try:
+        return read_gzip_header(path)
+    except (OSError, ValueError):
+        return None
+
+
+def read_gzip_headers(
+    paths: Iterable[str | os.PathLike], max_workers: int | None = None
+) -> dict[str | os.PathLike, ctx.Gzip | None]:
+    """Read the headers of many gzip files, overlapping reads in a pool of threads
+
+    Parameters
+    ----------
+    paths : iterable of str or os.PathLike
+        The paths of gzip files.
+    max_workers : int, optional
+        The number of threads. By default, the default of
+        :class:`~concurrent.futures.ThreadPoolExecutor`.
+
+    Returns
+    -------
+    dict
+        The header of each file, or ``None`` if the file cannot be read or is not
+        a gzip file, by path.
+    """
+    paths = list(paths)
+    if len(paths) < 2:
+        return {path: _read_or_none(path) for path in paths}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(_read_or_none, paths)))
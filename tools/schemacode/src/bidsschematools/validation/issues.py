@@ -0,0 +1,256 @@
+"""Issues found by validation, as described in ``rules/errors.yaml``, and reports of issues"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+
+# Issues found by the validators of this package that are not (yet) defined in
+# ``rules.errors``, with the codes used by the BIDS validator
+_ISSUES = {
+    "TsvColumnMissing": {
+        "code": "TSV_COLUMN_MISSING",
+        "message": "A required column is missing from this TSV file.",
+        "level": "error",
+    },
+    "TsvColumnOrderIncorrect": {
+        "code": "TSV_COLUMN_ORDER_INCORRECT",
+        "message": (
+            "Some TSV columns are in the incorrect order.\n"
+            "The initial columns of a TSV file MUST be in the order defined by the specification."
+        ),
+        "level": "error",
+    },
+    "TsvColumnHeaderDuplicate": {
+        "code": "TSV_COLUMN_HEADER_DUPLICATE",
+        "message": (
+            "Two columns in this TSV file have the same name.\nColumn names MUST be unique."
+        ),
+        "level": "error",
+    },
+    "TsvAdditionalColumnsNotAllowed": {
+        "code": "TSV_ADDITIONAL_COLUMNS_NOT_ALLOWED",
+        "message": (
+            "A column was found that is not defined for this TSV file,\n"
+            "and additional columns are not allowed."
+        ),
+        "level": "error",
+    },
+    "TsvAdditionalColumnsMustDefine": {
+        "code": "TSV_ADDITIONAL_COLUMNS_MUST_DEFINE",
+        "message": (
+            "A column was found that is not defined for this TSV file.\n"
+            "Additional columns MUST be defined in a JSON sidecar."
+        ),
+        "level": "error",
+    },
+    "TsvIndexValueNotUnique": {
+        "code": "TSV_INDEX_VALUE_NOT_UNIQUE",
+        "message": (
+            "The values of the index columns of this TSV file are not unique.\n"
+            "Each row MUST have a distinct combination of index values."
+        ),
+        "level": "error",
+    },
+    "TsvValueIncorrectType": {
+        "code": "TSV_VALUE_INCORRECT_TYPE",
+        "message": (
+            "A value of a required column does not match the type, format or levels\n"
+            "defined for the column."
+        ),
+        "level": "error",
+    },
+    "TsvValueIncorrectTypeNonrequired": {
+        "code": "TSV_VALUE_INCORRECT_TYPE_NONREQUIRED",
+        "message": (
+            "A value of an optional or recommended column does not match the type, format\n"
+            "or levels defined for the column."
+        ),
+        "level": "warning",
+    },
+    "JsonKeyRequired": {
+        "code": "JSON_KEY_REQUIRED",
+        "message": "A JSON file is missing a key listed as required.",
+        "level": "error",
+    },
+    "JsonKeyRecommended": {
+        "code": "JSON_KEY_RECOMMENDED",
+        "message": "A JSON file is missing a key listed as recommended.",
+        "level": "warning",
+    },
+    "SidecarKeyRequired": {
+        "code": "SIDECAR_KEY_REQUIRED",
+        "message": "A data file's JSON sidecar is missing a key listed as required.",
+        "level": "error",
+    },
+    "SidecarKeyRecommended": {
+        "code": "SIDECAR_KEY_RECOMMENDED",
+        "message": "A data file's JSON sidecar is missing a key listed as recommended.",
+        "level": "warning",
+    },
+    "SidecarFieldValueInvalid": {
+        "code": "SIDECAR_FIELD_VALUE_INVALID",
+        "message": (
+            "A value of a data file's JSON sidecar does not match the type, format or range\n"
+            "defined for the field."
+        ),
+        "level": "error",
+    },
+}
+
+
+@dataclass(frozen=True)
+class Issue:
+    """An issue found in a file of a dataset
+
+    Parameters
+    ----------
+    code : str
+        The issue code, such as ``"TSV_COLUMN_MISSING"``.
+    level : str
+        ``"error"`` or ``"warning"``.
+    location : str, optional
+        The path of the file, relative to the dataset root, with a leading slash.
+    message : str, optional
+        A description of the issue.
+    rule : str, optional
+        The name of the schema rule that found the issue,
+        such as ``"tabular_data.modality_agnostic.Participants"``.
+    subcode : str, optional
+        The column or field with the issue.
+    detail : str, optional
+        The values or lines with the issue.
+    """
+
+    code: str
+    level: str
+    location: str | None = None
+    message: str | None = None
+    rule: str | None = None
+    subcode: str | None = None
+    detail: str | None = None
+
+    @classmethod
+    def from_schema(cls, schema: Mapping, name: str, **fields) -> Issue:
+        """Create an issue with the code, level and message of a rule of ``rules.errors``
+
+        Issues found by this package that ``rules.errors`` does not define, such as
+        ``"TsvColumnMissing"``, are defined by the package.
+
+        Parameters
+        ----------
+        schema : Mapping
+            The BIDS schema.
+        name : str
+            The name of the rule, such as ``"EmptyFile"`` or ``"TsvColumnMissing"``.
+        **fields
+            The other fields of the issue.
+
+        Examples
+        --------
+        >>> from bidsschematools.schema import load_schema
+        >>> issue = Issue.from_schema(
+        ...     load_schema(), "EmptyFile", location="/sub-01/anat/sub-01_T1w.nii.gz"
+        ... )
+        >>> issue.code, issue.level
+        ('EMPTY_FILE', 'error')
+        """
+        errors = schema["rules"]["errors"]
+        error = errors[name] if name in errors else _ISSUES[name]
+        fields.setdefault("message", error["message"].strip())
+        return cls(code=error["code"], level=error.get("level", "error"), **fields)
+
+
+@dataclass
+class IssueSummary:
+    """The issues of one code, found in any number of files
+
+    Parameters
+    ----------
+    code : str
+        The issue code.
+    level : str
+        ``"error"`` or ``"warning"``.
+    message : str, optional
+        A description of the issue.
+    count : int
+        The number of issues.
+    locations : list of str
+        The locations of the first issues, up to a maximum number.
+    """
+
+    code: str
+    level: str
+    message: str | None = None
+    count: int = 0
+    locations: list[str] = field(default_factory=list)
+
+
+class IssueReport(Mapping):
+    """Issues aggregated by code, with counts and examples of locations
+
+    Only the locations of the first issues of each code are stored, so the memory used
+    by a report depends on the number of distinct codes, not on the number of issues.
+
+    Parameters
+    ----------
+    max_locations : int, optional
+        The maximum number of locations stored for each code.
+
+    Examples
+    --------
+    >>> report = IssueReport(max_locations=2)
+    >>> report.update(
+    ...     Issue("EMPTY_FILE", "error", location=f"/sub-0{idx}/anat/sub-0{idx}_T1w.nii.gz")
+    ...     for idx in range(1, 5)
+    ... )
+    >>> summary = report["EMPTY_FILE"]
+    >>> summary.count, summary.locations
+    (4, ['/sub-01/anat/sub-01_T1w.nii.gz', '/sub-02/anat/sub-02_T1w.nii.gz'])
+    >>> report.counts()
+    {'error': 4, 'warning': 0}
+    """
+
+    def __init__(self, max_locations: int = 10):
+        self.max_locations = max_locations
+        self._summaries = {}
+
+    def add(self, issue: Issue) -> None:
+        """Add an issue to the report"""
+        summary = self._summaries.get(issue.code)
+        if summary is None:
+            summary = IssueSummary(issue.code, issue.level, issue.message)
+            self._summaries[issue.code] = summary
+        summary.count += 1
+        locations = summary.locations
+        if (
+            issue.location is not None
+            and len(locations) < self.max_locations
+            and issue.location not in locations
+        ):
+            locations.append(issue.location)
+
+    def update(self, issues: Iterable[Issue]) -> None:
+        """Add issues to the report"""
+        for issue in issues:
+            self.add(issue)
+
+    def counts(self) -> dict[str, int]:
+        """Count the issues of each level"""
+        counts = {"error": 0, "warning": 0}
+        for summary in self._summaries.values():
+            counts[summary.level] = counts.get(summary.level, 0) + summary.count
+        return counts
+
+    def __getitem__(self, code: str) -> IssueSummary:
+        return self._summaries[code]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._summaries)
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def __repr__(self):
+        counts = ", ".join(f"{count} {level}s" for level, count in self.counts().items())
+        return f"<{self.__class__.__name__} {len(self)} codes, {counts}>"
@@ -0,0 +1,368 @@
+"""Reading of TIFF and OME metadata for ``context.tiff`` and ``context.ome``
+
+Only the metadata of microscopy images is read, never the image data:
+
+* The TIFF version is found in the first 16 bytes of a file.
+* In OME-TIFF files, the OME-XML metadata is the ``ImageDescription`` tag of the first
+  image file directory (IFD). Only the file header, the first IFD and the description are
+  read, with seeks, and the description is parsed incrementally, a chunk at a time,
+  until the first ``Pixels`` element.
+* In OME-Zarr directories, the physical sizes are found in the ``multiscales`` metadata
+  of ``.zattrs`` (or ``zarr.json``), or else in the OME-XML of ``OME/METADATA.ome.xml``.
+
+TIFF headers and OME-TIFF metadata are cached by path and modification time.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from collections.abc import Iterable
+from functools import lru_cache
+from xml.etree import ElementTree
+
+from bidsschematools.types import context as ctx
+
+#: Number of bytes of OME-XML read and parsed at a time
+CHUNK_SIZE = 1 << 16
+
+#: Maximum number of entries of an image file directory
+MAX_IFD_ENTRIES = 1 << 12
+
+#: The TIFF tag of image descriptions
+IMAGE_DESCRIPTION_TAG = 270
+
+#: The default unit of physical sizes in OME-XML
+DEFAULT_OME_UNIT = "µm"
+
+_BYTE_ORDERS = {b"II": "<", b"MM": ">"}
+
+# The formats of the entry count and of an entry of an IFD, and the number of bytes
+# that fit in the value of an entry, of classic TIFF and BigTIFF files
+_IFD_FORMATS = {
+    42: ("H", "HHII", 4),
+    43: ("Q", "HHQQ", 8),
+}
+
+# Names of units of OME-Zarr axes, and the corresponding OME-XML symbols
+_ZARR_UNITS = {
+    "meter": "m",
+    "centimeter": "cm",
+    "millimeter": "mm",
+    "micrometer": "µm",
+    "nanometer": "nm",
+    "picometer": "pm",
+    "angstrom": "Å",
+}
+
+
+def _tiff_layout(data):
+    """Find the byte order, version and first IFD offset of a TIFF file"""
+    byteorder = _BYTE_ORDERS.get(data[:2])
+    if byteorder is None or len(data) < 8:
+        raise ValueError("Data does not start with a TIFF header")
+    (version,) = struct.unpack_from(byteorder + "H", data, 2)
+    if version == 42:
+        (offset,) = struct.unpack_from(byteorder + "I", data, 4)
+    elif version == 43 and len(data) >= 16:
+        (offset,) = struct.unpack_from(byteorder + "Q", data, 8)
+    else:
+        raise ValueError(f"Unknown TIFF version: {version}")
+    return byteorder, version, offset
+
+
+def parse_tiff_header(data: bytes) -> ctx.Tiff:
+    """Parse the header of a TIFF file
+
+    Parameters
+    ----------
+    data : bytes
+        The start of a TIFF file, including at least the 8-byte header,
+        or the 16-byte header of BigTIFF files.
+
+    Returns
+    -------
+    Tiff
+        The header fields of ``context.tiff``.
+
+    Raises
+    ------
+    ValueError
+        If `data` does not start with a TIFF header.
+
+    Examples
+    --------
+    >>> parse_tiff_header(b"II*\\x00\\x08\\x00\\x00\\x00")
+    Tiff(version=42)
+    >>> parse_tiff_header(b"MM\\x00+\\x00\\x08\\x00\\x00" + bytes(8))
+    Tiff(version=43)
+    """
+    return ctx.Tiff(version=_tiff_layout(data)[1])
+
+
+def _pixels_attributes(chunks):
+    """Find the attributes of the first ``Pixels`` element of an XML document"""
+    parser = ElementTree.XMLPullParser(events=("start",))
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                if element.tag.rpartition("}")[2] == "Pixels":
+                    return element.attrib
+        parser.close()
+    except ElementTree.ParseError as err:
+        raise ValueError(f"Invalid OME-XML: {err}") from None
+    return None
+
+
+def parse_ome_xml(data: bytes | str | Iterable[bytes | str]) -> ctx.Ome | None:
+    """Parse the physical sizes of the first image of OME-XML metadata
+
+    The XML is parsed incrementally, and parsing stops at the first ``Pixels`` element,
+    so the rest of `data` is not parsed, or, if `data` is an iterable, read.
+    Units default to ``"µm"``, as in the OME schema.
+
+    Parameters
+    ----------
+    data : bytes, str or iterable of bytes or str
+        An OME-XML document, or chunks of it.
+
+    Returns
+    -------
+    Ome or None
+        The fields of ``context.ome``, or ``None`` if the document has no ``Pixels``.
+
+    Raises
+    ------
+    ValueError
+        If the document is not valid XML.
+
+    Examples
+    --------
+    >>> parse_ome_xml(
+    ...     '<OME><Image><Pixels PhysicalSizeX="0.5" PhysicalSizeY="0.5" '
+    ...     'PhysicalSizeZ="2" PhysicalSizeZUnit="mm"/></Image></OME>'
+    ... )  # doctest: +NORMALIZE_WHITESPACE
+    Ome(PhysicalSizeX=0.5, PhysicalSizeY=0.5, PhysicalSizeZ=2.0,
+        PhysicalSizeXUnit='µm', PhysicalSizeYUnit='µm', PhysicalSizeZUnit='mm')
+    """
+    attributes = _pixels_attributes([data] if isinstance(data, (bytes, str)) else data)
+    if attributes is None:
+        return None
+    fields = {}
+    for axis in "XYZ":
+        size = attributes.get(f"PhysicalSize{axis}")
+        if size is not None:
+            fields[f"PhysicalSize{axis}"] = float(size)
+            fields[f"PhysicalSize{axis}Unit"] = attributes.get(
+                f"PhysicalSize{axis}Unit", DEFAULT_OME_UNIT
+            )
+    return ctx.Ome(**fields)
+
+
+def _image_description(fobj, data):
+    """Find the offset and size of the description of the first image of a TIFF file"""
+    byteorder, version, offset = _tiff_layout(data)
+    count_format, entry_format, inline_size = _IFD_FORMATS[version]
+    count_struct = struct.Struct(byteorder + count_format)
+    entry_struct = struct.Struct(byteorder + entry_format)
+
+    fobj.seek(offset)
+    count_data = fobj.read(count_struct.size)
+    if len(count_data) < count_struct.size:
+        raise ValueError("TIFF file ends before its first image file directory")
+    (n_entries,) = count_struct.unpack(count_data)
+    ifd = fobj.read(min(n_entries, MAX_IFD_ENTRIES) * entry_struct.size)
+    for entry_offset in range(0, len(ifd) - entry_struct.size + 1, entry_struct.size):
+        tag, _, count, value = entry_struct.unpack_from(ifd, entry_offset)
+        if tag != IMAGE_DESCRIPTION_TAG:
+            continue
+        if count <= inline_size:
+            # The description is the value of the entry itself
+            value_offset = offset + count_struct.size + entry_offset + entry_struct.size
+            return value_offset - inline_size, count
+        return value, count
+    return None
+
+
+def _read_chunks(fobj, offset, size):
+    """Read `size` bytes from `offset`, a chunk at a time, without trailing NULs"""
+    fobj.seek(offset)
+    while size > 0:
+        chunk = fobj.read(min(size, CHUNK_SIZE))
+        if not chunk:
+            return
+        size -= len(chunk)
+        yield chunk if size > 0 else chunk.rstrip(b"\x00")
+
+
+@lru_cache(maxsize=4096)
+def _read_tiff_header(path, mtime_ns, size):
+    with open(path, "rb") as fobj:
+        return parse_tiff_header(fobj.read(16))
+
+
+def read_tiff_header(path: str | os.PathLike) -> ctx.Tiff:
+    """Read the header of a TIFF file
+
+    The result is cached, and read again only if the modification time or the size
+    of the file changes.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of a TIFF file.
+
+    Returns
+    -------
+    Tiff
+        The header fields of ``context.tiff``.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a TIFF file.
+    OSError
+        If the file cannot be read.
+    """
+    path = os.fspath(path)
+    stat = os.stat(path)
+    return _read_tiff_header(path, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=4096)
+def _read_ome_tiff(path, mtime_ns, size):
+    with open(path, "rb") as fobj:
+        description = _image_description(fobj, fobj.read(16))
+        if description is None:
+            return None
+        return parse_ome_xml(_read_chunks(fobj, *description))
+
+
+def read_ome_tiff(path: str | os.PathLike) -> ctx.Ome | None:
+    """Read the OME-XML metadata of an OME-TIFF file
+
+    The result is cached, and read again only if the modification time or the size
+    of the file changes.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of a TIFF or BigTIFF file.
+
+    Returns
+    -------
+    Ome or None
+        The fields of ``context.ome``, or ``None`` if the first image has no description
+        or its description has no ``Pixels``.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a TIFF file, or its description is not valid XML.
+    OSError
+        If the file cannot be read.
+    """
+    path = os.fspath(path)
+    stat = os.stat(path)
+    return _read_ome_tiff(path, stat.st_mtime_ns, stat.st_size)
+
+
+def _load_json(path):
+    try:
+        with open(path, encoding="utf-8") as fobj:
+            attributes = json.load(fobj)
+    except FileNotFoundError:
+        return {}
+    return _mapping(attributes, os.path.basename(path))
+
+
+def _mapping(value, name):
+    if not isinstance(value, dict):
+        raise ValueError(f"Invalid OME-Zarr metadata: {name} must be an object")
+    return value
+
+
+def _list(value, name, items=None):
+    if not isinstance(value, list) or (
+        items is not None and not all(isinstance(item, items) for item in value)
+    ):
+        raise ValueError(f"Invalid OME-Zarr metadata: {name} must be an array")
+    return value
+
+
+def _scales(transforms):
+    """Combine the scales of a list of coordinate transformations"""
+    scales = None
+    for transform in _list(transforms or [], "coordinateTransformations", dict):
+        if transform.get("type") == "scale" and "scale" in transform:
+            scale = _list(transform["scale"], "scale", (int, float))
+            if any(isinstance(value, bool) for value in scale):
+                raise ValueError("Invalid OME-Zarr metadata: scale must be an array of numbers")
+            scales = scale if scales is None else [a * b for a, b in zip(scales, scale)]
+    return scales
+
+
+def _multiscales_ome(multiscales):
+    """Find the physical sizes of the full resolution image of OME-Zarr multiscales"""
+    multiscale = _list(multiscales, "multiscales", dict)[0]
+    axes = _list(multiscale.get("axes", []), "axes", (dict, str))
+    datasets = _list(multiscale.get("datasets", []), "datasets", dict)
+    scales = _scales(datasets[0].get("coordinateTransformations")) if datasets else None
+    global_scales = _scales(multiscale.get("coordinateTransformations"))
+    if global_scales is not None:
+        scales = (
+            global_scales if scales is None else [a * b for a, b in zip(scales, global_scales)]
+        )
+    fields = {}
+    for idx, axis in enumerate(axes):
+        name = axis.get("name", "") if isinstance(axis, dict) else axis
+        unit = axis.get("unit") if isinstance(axis, dict) else None
+        if not isinstance(name, str) or not isinstance(unit, (str, type(None))):
+            raise ValueError("Invalid OME-Zarr metadata: axis names and units must be strings")
+        name = name.upper()
+        if name not in ("X", "Y", "Z") or scales is None or idx >= len(scales):
+            continue
+        fields[f"PhysicalSize{name}"] = float(scales[idx])
+        if unit is not None:
+            fields[f"PhysicalSize{name}Unit"] = _ZARR_UNITS.get(unit, unit)
+    return ctx.Ome(**fields)
+
+
+def read_ome_zarr(path: str | os.PathLike) -> ctx.Ome | None:
+    """Read the physical sizes of the full resolution image of an OME-Zarr directory
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of an OME-Zarr directory.
+
+    Returns
+    -------
+    Ome or None
+        The fields of ``context.ome``, or ``None`` if no OME metadata is found.
+
+    Raises
+    ------
+    ValueError
+        If the metadata is not valid JSON or XML, or does not have the structure of
+        OME-Zarr metadata.
+    OSError
+        If the metadata cannot be read.
+    """
+    path = os.fspath(path)
+    attributes = _load_json(os.path.join(path, ".zattrs"))
+    if not attributes:
+        # Zarr v3 stores attributes in zarr.json, and OME-Zarr 0.5 nests them under "ome"
+        zarr_json = _load_json(os.path.join(path, "zarr.json"))
+        attributes = _mapping(zarr_json.get("attributes", {}), "attributes")
+        attributes = _mapping(attributes.get("ome", attributes), "ome")
+    if attributes.get("multiscales"):
+        return _multiscales_ome(attributes["multiscales"])
+
+    xml_path = os.path.join(path, "OME", "METADATA.ome.xml")
+    if not os.path.exists(xml_path):
+        return None
+    with open(xml_path, "rb") as fobj:
+        return parse_ome_xml(iter(lambda: fobj.read(CHUNK_SIZE), b""))
@@ -0,0 +1,243 @@
+"""Reading of NIfTI-1 and NIfTI-2 headers for ``context.nifti_header``
+
+Only the header, and any header extensions, are read from an image, so a header costs
+a single small read, even for large or compressed images.
+For ``.nii.gz`` files, only the start of the gzip stream is decompressed.
+Headers are cached by path and modification time.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import math
+import os
+import struct
+from functools import lru_cache
+
+from bidsschematools.types import context as ctx
+
+#: Number of bytes read from the start of an image, enough for a NIfTI-2 header
+#: and the extension flags that follow either header
+HEADER_SIZE = 544
+
+#: Maximum number of bytes of header extensions read before the image data
+MAX_EXTENSIONS_SIZE = 1 << 20
+
+#: The extension code of NIfTI-MRS JSON headers
+MRS_EXTENSION_CODE = 44
+
+# The size of each header version, and the offsets and struct formats, without byte order,
+# of dim_info, dim, pixdim, vox_offset, xyzt_units, qform_code, sform_code, the quaternion
+# parameters and srow_x, srow_y and srow_z
+_LAYOUTS = {
+    1: (
+        348,
+        (39, "B"),
+        (40, "8h"),
+        (76, "8f"),
+        (108, "f"),
+        (123, "B"),
+        (252, "h"),
+        (254, "h"),
+        (256, "6f"),
+        (280, "12f"),
+    ),
+    2: (
+        540,
+        (524, "B"),
+        (16, "8q"),
+        (104, "8d"),
+        (168, "q"),
+        (500, "i"),
+        (344, "i"),
+        (348, "i"),
+        (352, "6d"),
+        (400, "12d"),
+    ),
+}
+
+_XYZ_UNITS = {0: "unknown", 1: "meter", 2: "mm", 3: "um"}
+_T_UNITS = {0: "unknown", 8: "sec", 16: "msec", 24: "usec"}
+
+
+def _compile_layouts():
+    structs = {}
+    for version, (size, *fields) in _LAYOUTS.items():
+        for byteorder in "<>":
+            structs[version, byteorder] = [
+                (offset, struct.Struct(byteorder + fmt)) for offset, fmt in fields
+            ]
+    return structs
+
+
+_STRUCTS = _compile_layouts()
+
+
+def _axis_codes(matrix):
+    """Find the anatomical direction to which each data axis points most closely
+
+    >>> _axis_codes([[-2, 0, 0], [0, 2, 0], [0, 0.1, 2]])
+    ['L', 'A', 'S']
+    >>> _axis_codes([[0, 0, 1], [-1, 0, 0], [0, 1, 0]])
+    ['P', 'S', 'R']
+    """
+    codes = []
+    for col in range(3):
+        column = [matrix[row][col] for row in range(3)]
+        row = max(range(3), key=lambda row: abs(column[row]))
+        codes.append("RAS"[row] if column[row] >= 0 else "LPI"[row])
+    return codes
+
+
+def _qform_matrix(quatern, pixdim):
+    """The rotation and scaling of the qform, as in the NIfTI-1 specification"""
+    b, c, d = quatern[:3]
+    a = math.sqrt(max(0.0, 1.0 - (b * b + c * c + d * d)))
+    rotation = [
+        [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+        [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+        [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - c * c - b * b],
+    ]
+    qfac = pixdim[0] if pixdim[0] in (-1, 1) else 1
+    scale = (pixdim[1], pixdim[2], pixdim[3] * qfac)
+    return [[rotation[row][col] * scale[col] for col in range(3)] for row in range(3)]
+
+
+def _parse_mrs(extensions, byteorder):
+    """Find the NIfTI-MRS JSON header in the header extensions"""
+    offset = 0
+    while offset + 8 <= len(extensions):
+        esize, ecode = struct.unpack_from(byteorder + "2i", extensions, offset)
+        if esize < 8:
+            break
+        if ecode == MRS_EXTENSION_CODE:
+            content = extensions[offset + 8 : offset + esize].rstrip(b"\x00")
+            try:
+                return json.loads(content)
+            except ValueError:
+                return None
+        offset += esize
+    return None
+
+
+def _header_format(data):
+    """Find the version and byte order of a header from its size, the first field"""
+    for version, (size, *_) in _LAYOUTS.items():
+        if len(data) >= size:
+            for byteorder in "<>":
+                if struct.unpack_from(byteorder + "i", data)[0] == size:
+                    return version, byteorder
+    raise ValueError("Data does not start with a NIfTI-1 or NIfTI-2 header")
+
+
+def parse_nifti_header(data: bytes, extensions: bytes = b"") -> ctx.NiftiHeader:
+    """Parse a NIfTI-1 or NIfTI-2 header
+
+    Parameters
+    ----------
+    data : bytes
+        The start of an image, including at least the header.
+    extensions : bytes, optional
+        The header extensions, which follow the header and the four extension flags.
+
+    Returns
+    -------
+    NiftiHeader
+        The header fields of ``context.nifti_header``.
+
+    Raises
+    ------
+    ValueError
+        If `data` does not start with a NIfTI header.
+    """
+    version, byteorder = _header_format(data)
+    values = [
+        unpacker.unpack_from(data, offset) for offset, unpacker in _STRUCTS[version, byteorder]
+    ]
+    (dim_info,), dim, pixdim, _, (xyzt_units,), (qform_code,), (sform_code,) = values[:7]
+    quatern, srow = values[7:]
+    ndim = dim[0]
+    if not 0 <= ndim <= 7:
+        raise ValueError(f"Invalid number of dimensions in NIfTI header: {ndim}")
+
+    if sform_code > 0:
+        matrix = [srow[0:3], srow[4:7], srow[8:11]]
+    elif qform_code > 0:
+        matrix = _qform_matrix(quatern, pixdim)
+    else:
+        matrix = [[-pixdim[1], 0, 0], [0, pixdim[2], 0], [0, 0, pixdim[3]]]
+
+    return ctx.NiftiHeader(
+        dim_info=ctx.DimInfo(
+            freq=dim_info & 3, phase=(dim_info >> 2) & 3, slice=(dim_info >> 4) & 3
+        ),
+        dim=list(dim),
+        pixdim=list(pixdim),
+        shape=list(dim[1 : ndim + 1]),
+        voxel_sizes=list(pixdim[1 : ndim + 1]),
+        xyzt_units=ctx.XyztUnits(
+            xyz=_XYZ_UNITS.get(xyzt_units & 0x07, "unknown"),
+            t=_T_UNITS.get(xyzt_units & 0x38, "unknown"),
+        ),
+        qform_code=qform_code,
+        sform_code=sform_code,
+        axis_codes=_axis_codes(matrix),
+        mrs=_parse_mrs(extensions, byteorder) if extensions else None,
+    )
+
+
+def _read_extensions(fobj, data):
+    """Read the header extensions that follow the header, if the extension flag is set"""
+    try:
+        version, byteorder = _header_format(data)
+    except ValueError:
+        return b""
+    size = _LAYOUTS[version][0]
+    if len(data) < size + 4 or not data[size]:
+        return b""
+    offset, unpacker = _STRUCTS[version, byteorder][3]
+    vox_offset = int(unpacker.unpack_from(data, offset)[0])
+    # Extensions end where the image data begins
+    end = min(vox_offset, size + 4 + MAX_EXTENSIONS_SIZE)
+    extensions = data[size + 4 : end]
+    if end > len(data):
+        extensions += fobj.read(end - len(data))
+    return extensions
+
+
+@lru_cache(maxsize=4096)
+def _read_nifti_header(path, mtime_ns, size):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as fobj:
+        data = fobj.read(HEADER_SIZE)
+        extensions = _read_extensions(fobj, data)
+    return parse_nifti_header(data, extensions)
+
+
+def read_nifti_header(path: str | os.PathLike) -> ctx.NiftiHeader:
+    """Read the header of a NIfTI-1 or NIfTI-2 image
+
+    The result is cached, and read again only if the modification time or the size
+    of the file changes.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of a ``.nii`` or ``.nii.gz`` file.
+
+    Returns
+    -------
+    NiftiHeader
+        The header fields of ``context.nifti_header``.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a NIfTI image.
+    OSError
+        If the file cannot be read, or is not a valid gzip file.
+    """
+    path = os.fspath(path)
+    stat = os.stat(path)
+    return _read_nifti_header(path, stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,188 @@
+"""Resolution of JSON sidecars by the inheritance principle
+
+A data file inherits the metadata of every JSON file with the same suffix, and a subset
+of its entities, in its directory or any parent directory.
+More specific sidecars, in deeper directories or with more entities, take precedence.
+
+Many data files share the same sidecars, such as a ``task-rest_bold.json`` at the root
+of a dataset, so each JSON file is parsed only once, and merged sidecars are cached
+for each directory.
+"""
+
+from __future__ import annotations
+
+import posixpath
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+
+from bidsschematools.rules import parse_entities, split_filename
+
+from .. import _lazytypes as lt
+
+
+class SidecarResolver:
+    """Merge the JSON sidecars that apply to files of a dataset
+
+    All JSON files are indexed by directory and suffix when the resolver is created.
+    Sidecars are merged from the dataset root down to the directory of a file, and the
+    merged sidecar of each directory is cached, keyed by the values of the entities
+    that select sidecars in that directory and its parents.
+    Files that share those values, such as the runs of a task, share the cached sidecar.
+
+    Parameters
+    ----------
+    paths : iterable of str
+        The files of the dataset, relative to its root. Only JSON files are used.
+    load_json : callable
+        A function that loads a JSON file, given its path.
+    entity_keys : Mapping, optional
+        A mapping of entity names to keys, as passed to
+        :func:`~bidsschematools.rules.parse_entities`.
+    entity_order : iterable of str, optional
+        The order of entity keys, such as ``schema.rules.entities``, used to build
+        cache keys. Entities that are not listed follow in alphabetical order.
+
+    Examples
+    --------
+    >>> sidecars = {
+    ...     "task-rest_bold.json": {"RepetitionTime": 2, "TaskName": "rest"},
+    ...     "sub-01/func/sub-01_task-rest_run-2_bold.json": {"RepetitionTime": 1.5},
+    ... }
+    >>> resolver = SidecarResolver(sidecars, sidecars.__getitem__)
+    >>> resolver.resolve("sub-01/func/sub-01_task-rest_run-1_bold.nii.gz")
+    {'RepetitionTime': 2, 'TaskName': 'rest'}
+    >>> resolver.resolve("sub-01/func/sub-01_task-rest_run-2_bold.nii.gz")
+    {'RepetitionTime': 1.5, 'TaskName': 'rest'}
+    >>> resolver.sidecar_paths("sub-01/func/sub-01_task-rest_run-2_bold.nii.gz")
+    ['task-rest_bold.json', 'sub-01/func/sub-01_task-rest_run-2_bold.json']
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str],
+        load_json: lt.Callable[[str], lt.Any],
+        entity_keys: Mapping[str, str] | None = None,
+        entity_order: Iterable[str] = (),
+    ):
+        self._load_json = load_json
+        self._entity_keys = entity_keys
+        self._entity_rank = {key: idx for idx, key in enumerate(entity_order)}
+        self._sidecars = defaultdict(list)
+        for path in paths:
+            if not path.endswith(".json"):
+                continue
+            suffix, ext = split_filename(path)
+            if ext == ".json":
+                entities = parse_entities(path, entity_keys)
+                self._sidecars[posixpath.dirname(path), suffix].append((entities, path))
+        for sidecars in self._sidecars.values():
+            # Less specific sidecars are applied first
+            sidecars.sort(key=lambda sidecar: len(sidecar[0]))
+        self._contents = {}
+        self._keys = {}
+        self._merged = {}
+
+    def load(self, path: str) -> lt.Any:
+        """Load a JSON file, parsing it only the first time it is loaded"""
+        try:
+            return self._contents[path]
+        except KeyError:
+            pass
+        contents = self._contents[path] = self._load_json(path)
+        return contents
+
+    def _selecting_keys(self, directory, suffix):
+        """Find the entities that select sidecars in a directory and its parents"""
+        try:
+            return self._keys[directory, suffix]
+        except KeyError:
+            pass
+        keys = {
+            key for entities, _ in self._sidecars.get((directory, suffix), ()) for key in entities
+        }
+        if directory:
+            keys.update(self._selecting_keys(posixpath.dirname(directory), suffix))
+        ranked = tuple(
+            sorted(keys, key=lambda key: (self._entity_rank.get(key, len(self._entity_rank)), key))
+        )
+        self._keys[directory, suffix] = ranked
+        return ranked
+
+    def _applicable(self, directory, suffix, entities, exclude=None):
+        return [
+            path
+            for sidecar_entities, path in self._sidecars.get((directory, suffix), ())
+            if path != exclude
+            and all(entities.get(key) == value for key, value in sidecar_entities.items())
+        ]
+
+    def _merge(self, directory, suffix, entities):
+        key = tuple(entities.get(key) for key in self._selecting_keys(directory, suffix))
+        cache_key = (directory, suffix, key)
+        try:
+            return self._merged[cache_key]
+        except KeyError:
+            pass
+        merged = self._merge(posixpath.dirname(directory), suffix, entities) if directory else {}
+        paths = self._applicable(directory, suffix, entities)
+        if paths:
+            merged = merged.copy()
+            for path in paths:
+                merged.update(self.load(path))
+        self._merged[cache_key] = merged
+        return merged
+
+    def sidecar_paths(self, path: str, entities: Mapping[str, str] | None = None) -> list[str]:
+        """Find the sidecars that apply to a file, from the least to the most specific
+
+        Parameters
+        ----------
+        path : str
+            The path of the file, relative to the dataset root.
+        entities : Mapping, optional
+            The entities of the file, if already parsed.
+        """
+        path = path.strip("/")
+        suffix, _ = split_filename(path)
+        if entities is None:
+            entities = parse_entities(path, self._entity_keys)
+        directories = [posixpath.dirname(path)]
+        while directories[-1]:
+            directories.append(posixpath.dirname(directories[-1]))
+        return [
+            sidecar
+            for directory in reversed(directories)
+            for sidecar in self._applicable(directory, suffix, entities, exclude=path)
+        ]
+
+    def resolve(self, path: str, entities: Mapping[str, str] | None = None) -> dict[str, lt.Any]:
+        """Merge the sidecars that apply to a file
+
+        A JSON file does not inherit from itself, but does inherit from less specific
+        JSON files.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file, relative to the dataset root.
+        entities : Mapping, optional
+            The entities of the file, if already parsed.
+
+        Returns
+        -------
+        dict
+            The merged metadata. A new dictionary is returned for each call.
+        """
+        path = path.strip("/")
+        suffix, _ = split_filename(path)
+        if entities is None:
+            entities = parse_entities(path, self._entity_keys)
+        directory = posixpath.dirname(path)
+        if not path.endswith(".json"):
+            return self._merge(directory, suffix, entities).copy()
+        # Sidecars in the directory of a JSON file must exclude the file itself
+        merged = self._merge(posixpath.dirname(directory), suffix, entities) if directory else {}
+        merged = merged.copy()
+        for sidecar in self._applicable(directory, suffix, entities, exclude=path):
+            merged.update(self.load(sidecar))
+        return merged
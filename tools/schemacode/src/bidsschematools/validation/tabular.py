@@ -0,0 +1,340 @@
+"""Validation of TSV files with the rules of ``rules.tabular_data``
+
+Each rule of ``rules.tabular_data`` is compiled once, into the header names of its columns
+and a check of the values of each column, built from the column definitions of
+``objects.columns`` or, for columns such as ``age``, from their ``definition``.
+The rules of a TSV file are found with a :class:`~bidsschematools.rules.SelectorIndex`.
+
+Values are checked a column at a time, with the compact columns of
+:class:`~.tsv.TsvTable`: the type and range of a numeric column are checked with its
+type and minimum and maximum, and the values of other columns are checked once per
+distinct value. Index columns are checked for duplicate rows with a set of their rows.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from collections.abc import Mapping
+
+from bidsschematools.rules import SelectorIndex
+
+from .. import _lazytypes as lt
+from .issues import Issue
+from .tsv import MISSING, Column
+
+#: Types of values whose format is defined in ``objects.formats``
+_TYPES = ("integer", "number", "boolean", "string")
+
+
+class _ValueCheck:
+    """A check of the values of a column
+
+    Values are the strings of the cells of a :class:`~.tsv.Column`,
+    and missing values are always valid.
+    """
+
+    __slots__ = ("type", "type_pattern", "pattern", "levels", "minimum", "maximum", "any_of")
+
+    def __init__(
+        self,
+        formats,
+        type=None,
+        pattern=None,
+        levels=None,
+        minimum=None,
+        maximum=None,
+        any_of=None,
+    ):
+        self.type = type
+        self.type_pattern = re.compile(formats[type]["pattern"]) if type in _TYPES else None
+        self.pattern = re.compile(pattern) if pattern is not None else None
+        self.levels = frozenset(levels) if levels is not None else None
+        self.minimum = minimum
+        self.maximum = maximum
+        self.any_of = tuple(any_of) if any_of is not None else None
+
+    def accepts(self, value: str) -> bool:
+        """Check the text of a value, which is not missing"""
+        if self.any_of is not None:
+            return any(check.accepts(value) for check in self.any_of)
+        if self.type_pattern is not None and not self.type_pattern.fullmatch(value):
+            return False
+        if self.levels is not None and value not in self.levels:
+            return False
+        if self.pattern is not None and not self.pattern.fullmatch(value):
+            return False
+        if self.type in ("integer", "number"):
+            number = float(value)
+            if self.minimum is not None and number < self.minimum:
+                return False
+            if self.maximum is not None and number > self.maximum:
+                return False
+        return True
+
+    def first_invalid(self, column: Column) -> int | None:
+        """Find the row of the first invalid value of a column, or ``None``"""
+        if column.categories is not None:
+            data = column.data
+            invalid = {
+                code
+                for code, value in enumerate(column.categories)
+                if value is not None and value != MISSING and not self.accepts(value)
+            }
+        elif self._accepts_numbers(column):
+            return None
+        else:
+            # Levels and patterns apply to the text of numbers, such as 1.50
+            data = list(column)
+            invalid = {
+                value for value in set(data) if value != MISSING and not self.accepts(value)
+            }
+        if not invalid:
+            return None
+        return next(row for row, item in enumerate(data) if item in invalid)
+
+    def _accepts_numbers(self, column):
+        """Check a numeric column as a whole, if possible without checking each value"""
+        if self.any_of is not None or self.levels is not None or self.pattern is not None:
+            return False
+        if self.type == "boolean" or (self.type == "integer" and column.dtype != "integer"):
+            return False
+        if self.minimum is None and self.maximum is None:
+            return True
+        numbers = column.data
+        if numbers.typecode == "d":
+            numbers = [number for number in numbers if number == number]
+        if not numbers:
+            return True
+        return (self.minimum is None or min(numbers) >= self.minimum) and (
+            self.maximum is None or max(numbers) <= self.maximum
+        )
+
+
+def _get(context, name):
+    """Get a namespace of a context, which may be a mapping or an object"""
+    if isinstance(context, Mapping):
+        return context.get(name)
+    return getattr(context, name, None)
+
+
+def _keys(column):
+    """The items of a column that are equal if and only if their cells are equal"""
+    return column.data if column.text is None else column.text
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _definition_check(formats, definition):
+    """Compile a check from a sidecar-style definition, with ``Format`` and ``Levels``"""
+    fmt = definition.get("Format")
+    if not isinstance(fmt, str) or fmt not in formats:
+        fmt = None
+    levels = definition.get("Levels")
+    return _ValueCheck(
+        formats,
+        type=fmt if fmt in _TYPES else None,
+        pattern=formats[fmt]["pattern"] if fmt is not None and fmt not in _TYPES else None,
+        levels=list(levels) if isinstance(levels, Mapping) else None,
+        minimum=_number(definition.get("Minimum")),
+        maximum=_number(definition.get("Maximum")),
+    )
+
+
+def _column_check(formats, column):
+    """Compile a check from a column of ``objects.columns``"""
+    if "definition" in column:
+        return _definition_check(formats, column["definition"])
+    if "anyOf" in column:
+        return _ValueCheck(
+            formats, any_of=[_column_check(formats, option) for option in column["anyOf"]]
+        )
+    pattern = column.get("pattern")
+    if pattern is None and "format" in column:
+        pattern = formats[column["format"]]["pattern"]
+    return _ValueCheck(
+        formats,
+        type=column.get("type"),
+        pattern=pattern,
+        levels=column.get("enum"),
+        minimum=column.get("minimum"),
+        maximum=column.get("maximum"),
+    )
+
+
+class _TableRule:
+    """A compiled rule of ``rules.tabular_data``"""
+
+    def __init__(self, name, rule, schema):
+        objects = schema["objects"]["columns"]
+        formats = schema["objects"]["formats"]
+        self.name = name
+        self.columns = {}
+        self.required = []
+        self.defined = set()
+        for key, column in rule.get("columns", {}).items():
+            level = column if isinstance(column, str) else column.get("level")
+            header = objects[key]["name"]
+            required = level == "required"
+            if required:
+                self.required.append(header)
+            self.columns[header] = (required, _column_check(formats, objects[key]))
+            if "definition" in objects[key]:
+                self.defined.add(header)
+        self.initial_columns = [objects[key]["name"] for key in rule.get("initial_columns", [])]
+        self.index_columns = [objects[key]["name"] for key in rule.get("index_columns", [])]
+        self.additional_columns = rule.get("additional_columns", "allowed")
+
+    def validate(self, validator, table, context):
+        sidecar = _get(context, "sidecar") or {}
+        issues = []
+
+        def issue(name, **fields):
+            return validator._issue(name, context, rule=self.name, **fields)
+
+        header = table.header
+        for idx, name in enumerate(self.initial_columns):
+            if name in table and (idx >= len(header) or header[idx] != name):
+                issues.append(
+                    issue(
+                        "TsvColumnOrderIncorrect",
+                        subcode=name,
+                        detail=f"Column {idx + 1} must be {name!r}",
+                    )
+                )
+        for name in self.required:
+            if name not in table:
+                issues.append(issue("TsvColumnMissing", subcode=name))
+        if self.additional_columns in ("not_allowed", "allowed_if_defined"):
+            for name in table:
+                if name in self.columns:
+                    continue
+                if self.additional_columns == "not_allowed":
+                    issues.append(issue("TsvAdditionalColumnsNotAllowed", subcode=name))
+                elif name not in sidecar:
+                    issues.append(issue("TsvAdditionalColumnsMustDefine", subcode=name))
+
+        if self.index_columns and all(name in table for name in self.index_columns):
+            rows = zip(*(_keys(table[name]) for name in self.index_columns))
+            if len(set(rows)) < table.n_rows:
+                issues.append(issue("TsvIndexValueNotUnique", detail=self._duplicate(table)))
+
+        for name, (required, check) in self.columns.items():
+            if name not in table:
+                continue
+            if name in self.defined and isinstance(sidecar.get(name), Mapping):
+                # Definitions in sidecars replace the definitions of the schema
+                check = validator._sidecar_check(sidecar[name])
+            column = table[name]
+            row = check.first_invalid(column)
+            if row is not None:
+                issues.append(
+                    issue(
+                        "TsvValueIncorrectType"
+                        if required
+                        else "TsvValueIncorrectTypeNonrequired",
+                        subcode=name,
+                        detail=f"Line {row + 2}: {column[row]!r}",
+                    )
+                )
+        return issues
+
+    def _duplicate(self, table):
+        """Describe the first duplicate row of the index columns"""
+        columns = [table[name] for name in self.index_columns]
+        seen = {}
+        for row, key in enumerate(zip(*map(_keys, columns))):
+            first = seen.setdefault(key, row)
+            if first != row:
+                values = ", ".join(repr(column[row]) for column in columns)
+                return f"Lines {first + 2} and {row + 2}: {values}"
+        return None
+
+
+class TabularValidator:
+    """Validator of TSV files with the rules of ``rules.tabular_data``
+
+    Besides the rules of the schema, the header of every TSV file is checked for
+    duplicate column names. Issue codes are those of the BIDS validator, as created by
+    :meth:`~.issues.Issue.from_schema`.
+
+    Parameters
+    ----------
+    schema : Mapping
+        The BIDS schema.
+
+    Examples
+    --------
+    >>> from bidsschematools.schema import load_schema
+    >>> from bidsschematools.validation import TsvTable
+    >>> validator = TabularValidator(load_schema())
+    >>> context = {
+    ...     "path": "/participants.tsv",
+    ...     "extension": ".tsv",
+    ...     "sidecar": {},
+    ...     "columns": TsvTable("age\\tparticipant_id\\nn/a\\tsub-01\\n200\\tsub-01\\n"),
+    ... }
+    >>> for issue in validator.validate(context):
+    ...     print(issue.code, issue.subcode, issue.detail)
+    TSV_COLUMN_ORDER_INCORRECT participant_id Column 1 must be 'participant_id'
+    TSV_INDEX_VALUE_NOT_UNIQUE None Lines 2 and 3: 'sub-01'
+    TSV_VALUE_INCORRECT_TYPE_NONREQUIRED age Line 3: '200'
+    """
+
+    def __init__(self, schema: Mapping):
+        self.schema = schema
+        self.index = SelectorIndex.from_schema(schema, sections=("tabular_data",))
+        self._rules = {
+            name: _TableRule(name, rule, schema) for name, rule in self.index.rules.items()
+        }
+        self._sidecar_checks = {}
+
+    def _sidecar_check(self, definition):
+        """Compile a check from the definition of a column in a sidecar, once per definition"""
+        levels = definition.get("Levels")
+        key = (
+            definition.get("Format"),
+            tuple(levels) if isinstance(levels, Mapping) else None,
+            definition.get("Minimum"),
+            definition.get("Maximum"),
+        )
+        try:
+            return self._sidecar_checks[key]
+        except KeyError:
+            check = _definition_check(self.schema["objects"]["formats"], definition)
+        except TypeError:
+            # Unhashable values are invalid, and are not used by checks
+            return _definition_check(self.schema["objects"]["formats"], definition)
+        self._sidecar_checks[key] = check
+        return check
+
+    def _issue(self, name, context, **fields):
+        return Issue.from_schema(self.schema, name, location=_get(context, "path"), **fields)
+
+    def validate(self, context: lt.Any) -> list[Issue]:
+        """Validate the columns of a TSV file
+
+        Parameters
+        ----------
+        context : Mapping or object
+            The context of a TSV file, such as a :class:`~.context.FileContext`,
+            whose ``columns`` are a :class:`~.tsv.TsvTable`.
+
+        Returns
+        -------
+        list of Issue
+            The issues found, without duplicates.
+        """
+        table = _get(context, "columns")
+        if table is None:
+            return []
+        issues = [
+            self._issue("TsvColumnHeaderDuplicate", context, subcode=name)
+            for name, count in Counter(table.header).items()
+            if count > 1
+        ]
+        for name in self.index.select(context):
+            issues.extend(self._rules[name].validate(self, table, context))
+        return list(dict.fromkeys(issues))
@@ -0,0 +1,300 @@
+"""Column-wise loading of TSV files for ``context.columns``
+
+A TSV file is read once, and each of its columns is parsed when it is first accessed,
+so that expressions only pay for the columns they use.
+The cells of a column are extracted from the whole file with a single regular expression,
+and numeric columns are recognized by searching their joined cells for characters that
+cannot be part of numbers, before conversion.
+Columns are stored in compact typed arrays of the :mod:`array` module:
+
+* Columns of integers are arrays of 64-bit integers, or of doubles if values are missing.
+* Other numeric columns are arrays of doubles.
+* Missing values, ``n/a``, are stored as NaN in numeric columns.
+* Other columns are arrays of codes into a list of their distinct values, so repeated
+  values, such as the ``trial_type`` of events, are stored once.
+
+As sequences, columns hold the original strings of their cells, as declared for
+``columns`` in ``meta.context``, and the arrays are used by validators to check the
+values of numeric columns as a whole.
+Numeric cells that the numbers do not format back to, such as ``1.50``, are also kept,
+and integers with leading zeros, such as ``01``, are not converted.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+from array import array
+from collections.abc import Iterator, Mapping, Sequence
+from functools import lru_cache
+from itertools import islice
+
+from .. import _lazytypes as lt
+
+#: The representation of missing values
+MISSING = "n/a"
+
+# Characters that cannot be part of integers or decimal numbers of distinct values of
+# a column, joined by tabs, and integers with leading zeros
+_NON_INTEGER = re.compile(r"[^0-9+\t-]")
+_NON_NUMBER = re.compile(r"[^0-9.eE+\t-]")
+_LEADING_ZERO = re.compile(r"(?<![^\t])[+-]?0[0-9]")
+
+_EMPTY_LINES = re.compile(r"\n{2,}")
+
+# Integers beyond this magnitude may not be represented exactly by doubles
+_MAX_EXACT_INTEGER = 2**53
+
+
+@lru_cache(maxsize=64)
+def _cell_pattern(idx):
+    """Match the cell of each row in a column, if the row has enough cells
+
+    >>> _cell_pattern(1).findall("a\\tb\\tc\\nd\\te\\n")
+    ['b', 'e']
+    """
+    # The lookahead excludes the empty match at the end of the last line
+    return re.compile(f"^(?:[^\t\n]*\t){{{idx}}}([^\t\n]*)(?=[\t\n])", re.MULTILINE)
+
+
+class Column(Sequence):
+    """A column of a TSV file
+
+    Columns are read-only sequences of the cells of the file, equal to lists of the same
+    strings.
+
+    Parameters
+    ----------
+    values : iterable of str or None
+        The cells of the column, or ``None`` for cells missing from short rows.
+
+    Attributes
+    ----------
+    dtype : str
+        ``"integer"``, ``"number"`` or ``"string"``.
+    data : array.array
+        The numbers of a numeric column, with NaN for missing values,
+        or the codes of the values of a string column.
+    categories : list or None
+        The distinct values of a string column, by code.
+    text : list of str or None
+        The cells of a numeric column, if they are not the formatted numbers of `data`,
+        such as ``1.50`` or ``n/a``.
+
+    Examples
+    --------
+    >>> column = Column(["0.50", "1", "n/a"])
+    >>> column.dtype, list(column.data)[:2], list(column)
+    ('number', [0.5, 1.0], ['0.50', '1', 'n/a'])
+    >>> column = Column(["go", "stop", "go"])
+    >>> column.categories, list(column.data)
+    (['go', 'stop'], [0, 1, 0])
+    """
+
+    __slots__ = ("dtype", "data", "categories", "text")
+
+    def __init__(self, values: lt.Iterable[str | None]):
+        values = values if isinstance(values, list) else list(values)
+        self.categories = None
+        self.text = None
+        if self._store_numbers(values):
+            return
+        index = {}
+        self.dtype = "string"
+        self.data = array("I", [index.setdefault(value, len(index)) for value in values])
+        self.categories = list(index)
+
+    def _store_numbers(self, values):
+        """Store the values as numbers, if they are all numbers or missing"""
+        if None in values:
+            return False
+        joined = "\t".join(values)
+        missing = MISSING in joined
+        if missing:
+            joined = joined.replace(MISSING, "")
+        if not joined.strip("\t") or _NON_NUMBER.search(joined) or _LEADING_ZERO.search(joined):
+            return False
+        integer = _NON_INTEGER.search(joined) is None
+        convert = int if integer else float
+        try:
+            if missing:
+                numbers = [math.nan if value == MISSING else convert(value) for value in values]
+                data = array("d", numbers)
+            else:
+                data = array("q" if integer else "d", map(convert, values))
+        except (ValueError, OverflowError):
+            # Strings of the characters of numbers, such as "1-2" or "e", are not numbers,
+            # and integers beyond 64 bits are kept as strings
+            return False
+        if integer and missing:
+            if max(abs(number) for number in numbers if number == number) > _MAX_EXACT_INTEGER:
+                return False
+        self.dtype = "integer" if integer else "number"
+        self.data = data
+        # The cells are only kept if the numbers do not format back to them
+        if missing or "\t".join(map(str, data)) != joined:
+            self.text = values
+        return True
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[idx] for idx in range(*index.indices(len(self)))]
+        if self.categories is not None:
+            return self.categories[self.data[index]]
+        if self.text is not None:
+            return self.text[index]
+        return str(self.data[index])
+
+    def __iter__(self) -> Iterator[str | None]:
+        if self.categories is not None:
+            return map(self.categories.__getitem__, self.data)
+        if self.text is not None:
+            return iter(self.text)
+        return map(str, self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, (Column, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+    def to_numpy(self) -> lt.Any:
+        """Convert the column to a NumPy array
+
+        Numeric columns are converted without copies, to arrays of integers, or of floats
+        with NaN for missing values. String columns are converted to arrays of objects.
+
+        Raises
+        ------
+        RuntimeError
+            If NumPy is not installed.
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise RuntimeError(
+                "The `numpy` package is required to convert columns to arrays. "
+                "Please install it with `pip install numpy`."
+            ) from e
+
+        if self.categories is None:
+            return np.frombuffer(self.data, dtype=np.int64 if self.data.typecode == "q" else float)
+        categories = np.empty(len(self.categories), dtype=object)
+        categories[:] = self.categories
+        return categories[np.frombuffer(self.data, dtype=np.uint32)]
+
+
+class TsvTable(Mapping):
+    """The columns of a TSV file, indexed by name, each parsed when first accessed
+
+    Parameters
+    ----------
+    text : str
+        The contents of the file.
+    max_rows : int, optional
+        The maximum number of rows to load. By default, all rows are loaded.
+
+    Attributes
+    ----------
+    header : list of str
+        The names of the columns, in order, including any duplicates.
+    n_rows : int
+        The number of rows loaded, excluding the header and empty lines.
+    truncated : bool
+        Whether rows were not loaded because of `max_rows`.
+
+    Examples
+    --------
+    >>> table = TsvTable("onset\\tduration\\ttrial_type\\n1.5\\t1\\tgo\\n3\\tn/a\\tstop\\n")
+    >>> table.header, table.n_rows
+    (['onset', 'duration', 'trial_type'], 2)
+    >>> table["onset"], table["trial_type"]
+    (Column(['1.5', '3']), Column(['go', 'stop']))
+    >>> table["duration"].dtype, list(table["duration"])
+    ('integer', ['1', 'n/a'])
+    """
+
+    def __init__(self, text: str, max_rows: int | None = None):
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        header, _, body = text.partition("\n")
+        self.header = header.split("\t") if header else []
+        # Rows are stored as one string, with one row per line and no empty lines
+        if "\n\n" in body or body.startswith("\n"):
+            body = _EMPTY_LINES.sub("\n", body).lstrip("\n")
+        if body and not body.endswith("\n"):
+            body += "\n"
+        self.truncated = False
+        if max_rows is not None:
+            rows = re.match(f"(?:[^\n]*\n){{0,{max_rows}}}", body).group()
+            self.truncated = len(rows) < len(body)
+            body = rows
+        self._body = body
+        self.n_rows = body.count("\n")
+        self._indices = {name: idx for idx, name in enumerate(self.header)}
+        self._columns = {}
+
+    def __getitem__(self, name: str) -> Column:
+        try:
+            return self._columns[name]
+        except KeyError:
+            pass
+        idx = self._indices[name]
+        column = Column(self._cells(idx))
+        self._columns[name] = column
+        if len(self._columns) == len(self._indices):
+            # All columns are parsed, so the rows are no longer needed
+            self._body = None
+        return column
+
+    def _cells(self, idx):
+        cells = _cell_pattern(idx).findall(self._body)
+        if len(cells) == self.n_rows:
+            return cells
+        # Some rows are too short
+        return [
+            parts[idx] if len(parts) > idx else None
+            for parts in (row.split("\t", idx + 1) for row in self._body.splitlines())
+        ]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._indices)
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {list(self._indices)}, {self.n_rows} rows>"
+
+
+def load_tsv(path: str | os.PathLike, max_rows: int | None = None) -> TsvTable:
+    """Load a TSV file, whose columns are parsed when first accessed
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of a TSV file.
+    max_rows : int, optional
+        The maximum number of rows to load. By default, all rows are loaded.
+        Only the rows that are loaded are read.
+
+    Returns
+    -------
+    TsvTable
+        The columns of the file, indexed by name.
+    """
+    with open(path, encoding="utf-8") as fobj:
+        if max_rows is None:
+            text = fobj.read()
+        else:
+            # The header and any empty lines do not count as rows
+            text = "".join(islice((line for line in fobj if line != "\n"), max_rows + 2))
+    return TsvTable(text, max_rows)
@@ -1,11 +1,13 @@
 """A partial implementation of schema-based validation in Python."""
 
 import datetime
-import fnmatch
+import hashlib
 import json
 import os
+import posixpath
 import re
-from copy import deepcopy
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import bidsschematools as bst
@@ -18,6 +20,14 @@ lgr = bst.utils.get_logger()
 
 VALIDATOR_SCHEMA_COMPATIBILITY_LEVEL = "minor"
 
+#: Levels of detail for recording itemwise comparisons in `validate_all()`
+TRACE_LEVELS = ("off", "failures", "full")
+
+#: Version of the manifest file written by incremental validation in `validate_bids()`
+MANIFEST_FORMAT = 2
+
+_MISSING = object()
+
 
 def _bids_schema_versioncheck(schema_dir, compatibility=VALIDATOR_SCHEMA_COMPATIBILITY_LEVEL):
     """
@@ -133,11 +143,202 @@ def _get_directory_suffixes(my_schema):
     ]
 
 
+def _iter_tree(
+    top,
+    state,
+    pseudofile_suffixes=(),
+    exclude_files=(),
+    executor=None,
+    max_pending=None,
+):
+    """
+    Walk a directory tree top-down with `os.scandir`, yielding paths to validate.
+
+    Parameters
+    ----------
+    top : str
+        Directory to walk.
+    state : dict
+        Dataset-level state shared between calls, with keys "bids_root_found", "bids_root",
+        "bidsignore" and "include_ignored". It is updated when the dataset root is found.
+    pseudofile_suffixes : tuple of str
+        Directory suffixes prompting the validation of the directory name and limiting further
+        directory walk.
+    exclude_files : list, optional
+        Files to exclude from listing.
+    executor : concurrent.futures.Executor, optional
+        If provided, and the dataset root has been found at `top` or earlier, each
+        subdirectory of `top` (e.g., each subject directory) is walked as a separate task.
+    max_pending : int, optional
+        Maximum number of subdirectory tasks submitted to `executor` ahead of the one whose
+        paths are being yielded. Defaults to no limit.
+
+    Yields
+    ------
+    str
+        Paths in the order they would be visited by a top-down `os.walk`.
+
+    Notes
+    -----
+    * Once the dataset root is found, any further `dataset_description.json` indicates a nested
+        dataset, which is not walked. Subdirectories are only walked concurrently after this point,
+        so the state is never modified by concurrent tasks.
+    """
+    stack = [(top, Path(top).as_posix())]
+    while stack:
+        root, posix_root = stack.pop()
+        dirs = []
+        file_names = []
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        file_names.append(entry.name)
+                    # Like os.walk, list but do not descend into symbolic links to directories.
+                    elif not entry.is_symlink():
+                        dirs.append(entry.name)
+        except OSError:
+            # Like os.walk, silently skip directories that cannot be listed.
+            continue
+
+        if "dataset_description.json" in file_names:
+            if state["bids_root_found"]:
+                # No nested BIDS.
+                dirs = []
+                file_names = []
+            else:
+                if not state["include_ignored"]:
+                    try:
+                        state["bidsignore"] = BidsIgnore.from_file(
+                            os.path.join(root, ".bidsignore")
+                        )
+                    except FileNotFoundError:
+                        pass
+                state["bids_root"] = posix_root
+                state["bids_root_found"] = True
+        if root.endswith(pseudofile_suffixes):
+            # Add the directory name to the validation paths list.
+            yield posix_root + "/"
+            # Do not index the contents of the directory.
+            continue
+        if os.path.basename(root).startswith("."):
+            continue
+        bidsignore = state["bidsignore"]
+        if bidsignore:
+            # .bidsignore patterns apply to paths relative to the dataset root
+            bids_root = state["bids_root"]
+            if posix_root == bids_root:
+                relative_root = ""
+            elif posix_root.startswith(bids_root + "/"):
+                relative_root = posix_root[len(bids_root) + 1 :] + "/"
+            else:
+                relative_root = posix_root + "/"
+            dirs = [name for name in dirs if not bidsignore.is_ignored(f"{relative_root}{name}/")]
+        for file_name in file_names:
+            if file_name in exclude_files or file_name.startswith("."):
+                continue
+            if bidsignore and bidsignore.is_ignored(relative_root + file_name):
+                continue
+            yield posixpath.join(posix_root, file_name)
+
+        children = [(os.path.join(root, name), posixpath.join(posix_root, name)) for name in dirs]
+        if executor is not None and root == top and state["bids_root_found"]:
+            yield from _iter_subtrees(
+                executor,
+                [child for child, _ in children],
+                max_pending,
+                state,
+                pseudofile_suffixes,
+                exclude_files,
+            )
+        else:
+            stack.extend(reversed(children))
+
+
+def _list_tree(top, state, pseudofile_suffixes, exclude_files):
+    return list(_iter_tree(top, state, pseudofile_suffixes, exclude_files))
+
+
+def _iter_subtrees(executor, subdirs, max_pending, *args):
+    """Walk subdirectories concurrently, yielding their paths in order."""
+    if max_pending is None:
+        max_pending = len(subdirs)
+    pending = deque()
+    for subdir in subdirs:
+        pending.append(executor.submit(_list_tree, subdir, *args))
+        if len(pending) > max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def _iter_paths(
+    bids_paths,
+    pseudofile_suffixes=None,
+    dummy_paths=False,
+    exclude_files=None,
+    max_workers=1,
+    include_ignored=False,
+):
+    """
+    Iterate over all paths from a list of directories, as described in `_get_paths()`.
+
+    Paths are yielded as directories are walked, so memory use does not grow with the
+    number of files. If `max_workers` is not 1, at most `2 * max_workers` subdirectories
+    are walked ahead of the paths being consumed.
+    """
+
+    if exclude_files is None:
+        exclude_files = []
+    if pseudofile_suffixes is None:
+        pseudofile_suffixes = []
+    pseudofile_suffixes = tuple(pseudofile_suffixes)
+
+    state = {
+        "bids_root_found": False,
+        "bids_root": None,
+        "bidsignore": None,
+        "include_ignored": include_ignored,
+    }
+    executor = None if max_workers == 1 else ThreadPoolExecutor(max_workers)
+    max_pending = 2 * (max_workers or (os.cpu_count() or 1) + 4)
+    try:
+        for bids_path in bids_paths:
+            if not dummy_paths:
+                bids_path = os.path.abspath(os.path.expanduser(bids_path))
+            if os.path.isdir(bids_path):
+                yield from _iter_tree(
+                    bids_path,
+                    state,
+                    pseudofile_suffixes=pseudofile_suffixes,
+                    exclude_files=exclude_files,
+                    executor=executor,
+                    max_pending=max_pending,
+                )
+            elif os.path.isfile(bids_path) or dummy_paths:
+                yield Path(bids_path).as_posix()
+            else:
+                raise FileNotFoundError(
+                    f"The input path `{bids_path}` could not be located. If this is a string "
+                    "intended for path validation which does not correspond to an actual "
+                    "path, please set the `dummy_paths` parameter to True."
+                )
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
 def _get_paths(
     bids_paths,
     pseudofile_suffixes=None,
     dummy_paths=False,
     exclude_files=None,
+    max_workers=1,
+    include_ignored=False,
 ):
     """
     Get all paths from a list of directories, excluding hidden subdirectories from distribution.
@@ -155,6 +356,15 @@ def _get_paths(
     exclude_files : list, optional
         Files to exclude from listing.
         Dot files (`.*`) do not need to be explicitly listed, as these are excluded by default.
+    max_workers : int or None, optional
+        Number of threads used to walk directories, one task per subdirectory of the dataset root
+        (e.g., per subject). If 1 (the default), directories are walked serially. If None, the
+        default of `concurrent.futures.ThreadPoolExecutor` is used.
+        Concurrency mostly benefits network filesystems, where listing directories is slow.
+        The resulting paths are in the same order, regardless of this value.
+    include_ignored : bool, optional
+        Whether to list paths matched by the `.bidsignore` file of the dataset.
+        By default, they are skipped, and ignored directories are not walked.
 
     Notes
     -----
@@ -164,105 +374,215 @@ def _get_paths(
         that.
     * The `dataset_description.json` and `.bidsignore` handling should be split out of the main
         loop, since we now have BIDS root detection called before file detection. This is
-        non-critical however, since the topdown `os.walk` makes sure top-level files are detected
+        non-critical however, since the topdown walk makes sure top-level files are detected
         first.
     """
+    return list(
+        _iter_paths(
+            bids_paths,
+            pseudofile_suffixes=pseudofile_suffixes,
+            dummy_paths=dummy_paths,
+            exclude_files=exclude_files,
+            max_workers=max_workers,
+            include_ignored=include_ignored,
+        )
+    )
 
-    if exclude_files is None:
-        exclude_files = []
-    if pseudofile_suffixes is None:
-        pseudofile_suffixes = []
 
-    path_list = []
-    bidsignore_list = []
-    bids_root_found = False
-    for bids_path in bids_paths:
-        if not dummy_paths:
-            bids_path = os.path.abspath(os.path.expanduser(bids_path))
-        if os.path.isdir(bids_path):
-            for root, dirs, file_names in os.walk(bids_path, topdown=True):
-                if "dataset_description.json" in file_names:
-                    if bids_root_found:
-                        # No nested BIDS.
-                        dirs[:] = []
-                        file_names[:] = []
-                    else:
-                        try:
-                            with open(os.path.join(root, ".bidsignore")) as f:
-                                bidsignore_list = f.read().splitlines()
-                        except FileNotFoundError:
-                            pass
-                        bids_root_found = True
-                if root.endswith(tuple(pseudofile_suffixes)):
-                    # Add the directory name to the validation paths list.
-                    path_list.append(Path(root).as_posix() + "/")
-                    # Do not index the contents of the directory.
-                    dirs[:] = []
-                    file_names[:] = []
-                if os.path.basename(root).startswith("."):
-                    dirs[:] = []
-                    file_names[:] = []
-                for file_name in file_names:
-                    if file_name in exclude_files or file_name.startswith("."):
-                        continue
-                    if bidsignore_list:
-                        ignored = False
-                        for ignore_expression in bidsignore_list:
-                            ignored = _bidsignore_check(ignore_expression, file_name, root)
-                            if ignored:
-                                break
-                        if ignored:
-                            continue
-                    file_path = os.path.join(root, file_name)
-                    path_list.append(Path(file_path).as_posix())
-        elif os.path.isfile(bids_path) or dummy_paths:
-            path_list.append(Path(bids_path).as_posix())
+def _translate_ignore_segment(segment):
+    """Translate one path segment of a `.bidsignore` pattern to a regular expression.
+
+    >>> _translate_ignore_segment("*_[!a-c]?.json")
+    '[^/]*_[^a-c][^/]\\\\.json'
+    """
+    regex = []
+    i, n = 0, len(segment)
+    while i < n:
+        char = segment[i]
+        i += 1
+        if char == "*":
+            regex.append("[^/]*")
+        elif char == "?":
+            regex.append("[^/]")
+        elif char == "\\" and i < n:
+            regex.append(re.escape(segment[i]))
+            i += 1
+        elif char == "[" and (end := segment.find("]", i + 1)) != -1:
+            chars = segment[i:end].replace("\\", "\\\\")
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            regex.append(f"[{chars}]")
+            i = end + 1
         else:
-            raise FileNotFoundError(
-                f"The input path `{bids_path}` could not be located. If this is a string "
-                "intended for path validation which does not correspond to an actual "
-                "path, please set the `dummy_paths` parameter to True."
-            )
+            regex.append(re.escape(char))
+    return "".join(regex)
 
-    return path_list
 
+def _translate_ignore_pattern(pattern):
+    """Translate a `.bidsignore` line into a regular expression.
 
-def _bidsignore_check(ignore_expression, file_name, file_root):
+    Returns
+    -------
+    tuple of (bool, str) or None
+        Whether the pattern is negated and a regular expression matching the paths it ignores,
+        relative to the dataset root, with directories ending in `/`. The contents of
+        directories are not matched. `None` for blank lines and comments.
+
+    >>> _translate_ignore_pattern("**/*_meg.json")
+    (False, '(?:.*/)?[^/]*_meg\\\\.json/?\\\\Z')
+    >>> _translate_ignore_pattern("!/code/")
+    (True, 'code/\\\\Z')
+    >>> _translate_ignore_pattern("# comment") is None
+    True
     """
-    Check whether a file is set to be ignored as per `.bidsignore`
+    pattern = pattern.rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith(("\\#", "\\!")):
+        pattern = pattern[1:]
+
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # A separator at the beginning or middle anchors the pattern to the dataset root.
+    anchored = "/" in pattern
+    segments = pattern.lstrip("/").split("/")
+    if segments == [""]:
+        return None
+
+    regex = [] if anchored else ["(?:.*/)?"]
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            # A trailing "**" matches everything inside, but not the directory itself
+            regex.append(".+" if last else "(?:.*/)?")
+        else:
+            regex.append(_translate_ignore_segment(segment) + ("" if last else "/"))
+    regex.append("/\\Z" if directory_only else "/?\\Z")
+    return negated, "".join(regex)
+
+
+class BidsIgnore:
+    """A compiled set of `.bidsignore` patterns.
+
+    Patterns follow `.gitignore` conventions:
+
+    * Blank lines and lines starting with `#` are skipped.
+    * A pattern without a separator (other than a trailing one) matches a file or directory
+        at any level, while a pattern with a separator is relative to the dataset root.
+    * A trailing `/` matches only directories.
+    * `*` and `?` do not match `/`; a `**` segment matches any number of directories.
+    * A leading `!` re-includes paths matched by an earlier pattern; the last matching pattern
+        decides whether a path is ignored.
+    * Ignoring a directory ignores all of its contents, which cannot be re-included.
+
+    All patterns are translated once, and consecutive patterns of the same polarity are
+    combined into a single regular expression.
 
     Parameters
     ----------
-    ignore_expression : str
-        A string following git-wildcard conventions (including `**/`).
-    file_name : str
-        A string which represents a filename.
-    file_root : str
-        The directory containing the file specifiled in `file_name`.
+    patterns : iterable of str
+        Lines of a `.bidsignore` file.
 
-    Returns
-    -------
-    bool:
-        Whether the file should be ignored.
-
-    Notes
-    -----
-    * We cannot use `glob` since that would preempt working with theoretical or non-local
-        paths, therefore we use `fnmatch`.
-    * `fnmatch` does not support `**/` matching as that is an optional convention from e.g.
-        globstar and git, and not part of the standard Unix shell. As we formalize `.bidsignore`
-        we may choose drop it, since we already treat simple filenames as to-be-ignored in
-        all directories, and with BIDS having only up to 4 hierarchical levels, the utility of
-        other usage is limited and expansion to `..*/*..` would only mean at maximum a duplication
-        of entries.
+    Examples
+    --------
+    >>> bidsignore = BidsIgnore(["*.log", "extra_data/", "!keep.log"])
+    >>> bidsignore.is_ignored("sub-01/anat/sub-01_T1w.log")
+    True
+    >>> bidsignore.is_ignored("keep.log")
+    False
+    >>> bidsignore.is_ignored("extra_data/sub-01/notes.txt")
+    True
+    >>> bidsignore.is_ignored("extra_data/keep.log")
+    True
+    >>> list(bidsignore.filter(["README", "run.log", "extra_data/"]))
+    ['README']
     """
 
-    if ignore_expression.startswith("**/"):
-        ignore_expression = ignore_expression.lstrip("**/")
-    elif any(i in ignore_expression for i in ["/", "\\"]):
-        file_name = os.path.join(file_root, file_name)
-
-    return fnmatch.fnmatch(file_name, ignore_expression)
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        runs = []
+        for pattern in self.patterns:
+            translated = _translate_ignore_pattern(pattern)
+            if translated is None:
+                continue
+            negated, regex = translated
+            if runs and runs[-1][0] == negated:
+                runs[-1][1].append(regex)
+            else:
+                runs.append((negated, [regex]))
+        # Later patterns take precedence, so check them first.
+        self._runs = [
+            (negated, re.compile("|".join(f"(?:{regex})" for regex in regexes)))
+            for negated, regexes in reversed(runs)
+        ]
+        self._directories = {}
+
+    @classmethod
+    def from_file(cls, path):
+        """Load patterns from a `.bidsignore` file."""
+        with open(path) as f:
+            return cls(f.read().splitlines())
+
+    def __bool__(self):
+        return bool(self._runs)
+
+    def is_ignored(self, path):
+        """
+        Check whether a path is ignored.
+
+        Parameters
+        ----------
+        path : str
+            A path relative to the dataset root, using `/` as separator.
+            Directories may be indicated with a trailing `/`.
+
+        Returns
+        -------
+        bool
+            Whether the path should be ignored.
+        """
+        # Files in ignored directories are ignored, whatever the later patterns
+        end = path.find("/")
+        while end != -1 and end < len(path) - 1:
+            if self._is_ignored_directory(path[: end + 1]):
+                return True
+            end = path.find("/", end + 1)
+        return self._matches(path)
+
+    def _is_ignored_directory(self, path):
+        try:
+            return self._directories[path]
+        except KeyError:
+            ignored = self._directories[path] = self._matches(path)
+            return ignored
+
+    def _matches(self, path):
+        """Check whether the last pattern that matches a path ignores it"""
+        for negated, regex in self._runs:
+            if regex.match(path):
+                return not negated
+        return False
+
+    def filter(self, paths):
+        """
+        Remove ignored paths from an iterable of paths.
+
+        Parameters
+        ----------
+        paths : iterable of str
+            Paths relative to the dataset root, using `/` as separator.
+
+        Returns
+        -------
+        iterator of str
+            The paths that are not ignored, in their original order.
+        """
+        if not self._runs:
+            return iter(paths)
+        return (path for path in paths if not self.is_ignored(path))
 
 
 def log_errors(validation_result):
@@ -387,6 +707,9 @@ def select_schema_path(
 def validate_all(
     paths_list,
     regex_schema,
+    matcher=None,
+    trace="off",
+    match_cache=None,
 ):
     """
     Validate `bids_paths` based on a `regex_schema` dictionary list, including regexes.
@@ -400,14 +723,29 @@ def validate_all(
         separately).
     regex_schema : list of dict
         A list of dictionaries as generated by `regexify_all()`.
+    matcher : FilenameMatcher, optional
+        A matcher compiled from `regex_schema`, as generated by `filename_matcher()`.
+        If not provided, one will be compiled.
+    trace : {"off", "failures", "full"}, optional
+        Which itemwise comparisons of paths to regexes to record.
+        "off" (the default) records none, "failures" records the comparisons for paths that
+        did not match any regex, and "full" records every comparison up to the matching regex.
+        Recording comparisons allocates one dictionary per comparison, and is only needed for
+        `write_report()`.
+    match_cache : dict, optional
+        Results of `matcher.match()` for paths known to be unchanged, e.g., from a previous run,
+        keyed by path. These are used instead of matching the paths again, and the results
+        for all other paths are added to the dictionary.
 
     Returns
     -------
     results : dict
         A dictionary reporting the target files for validation, the unmatched files and unmatched
         regexes, and optionally the itemwise comparison results.
-        Keys include "schema_tracking", "path_tracking", "path_listing", "match_listing", and
-        optionally "itemwise"
+        Keys include "schema_tracking", "path_tracking", "path_listing", "match_listing",
+        "trace", and, unless `trace` is "off", "itemwise".
+        "path_tracking" lists the paths that did not match any regex, in input order, and
+        "schema_tracking" lists the regex entries that did not match any path.
 
     Notes
     -----
@@ -417,50 +755,55 @@ def validate_all(
         groups as well.
     """
 
-    tracking_paths = deepcopy(paths_list)
-    tracking_schema = []
+    if trace not in TRACE_LEVELS:
+        raise ValueError(f"Trace level must be one of {TRACE_LEVELS}, not {trace!r}.")
+    if matcher is None:
+        matcher = bst.rules.FilenameMatcher(regex_schema)
+    target_regexes = [matcher.prefix + regex_entry["regex"] for regex_entry in regex_schema]
+
+    matched_rules = set()
+    unmatched_paths = []
     itemwise_results = []
-    matched = False
     match_listing = []
     for target_path in paths_list:
         lgr.debug("Checking file `%s`.", target_path)
-        lgr.debug("Trying file types:")
-        for regex_entry in regex_schema:
-            target_regex = r"(?:.*/)?" + regex_entry["regex"]
-            # We need to record the actual expressions we query.
-            _regex_entry = deepcopy(regex_entry)
-            _regex_entry.update({"regex": target_regex})
-            lgr.debug("\t* `%s`, with pattern: `%s`", target_path, target_regex)
-            matched = re.match(target_regex, target_path)
-            itemwise_result = {}
-            itemwise_result["path"] = target_path
-            itemwise_result["regex"] = target_regex
+        if match_cache is None:
+            matched = matcher.match(target_path)
+        elif (matched := match_cache.get(target_path, _MISSING)) is _MISSING:
+            matched = match_cache[target_path] = matcher.match(target_path)
+        if trace == "full" or (trace == "failures" and matched is None):
+            # Record the comparisons that would have been made by trying each regex in turn.
+            n_attempts = len(target_regexes) if matched is None else matched[0] + 1
+            for target_regex in target_regexes[:n_attempts]:
+                itemwise_results.append(
+                    {"path": target_path, "regex": target_regex, "match": False}
+                )
             if matched:
-                lgr.debug("Match identified.")
-                itemwise_result["match"] = True
-                itemwise_results.append(itemwise_result)
-                break
-            itemwise_result["match"] = False
-            itemwise_results.append(itemwise_result)
+                itemwise_results[-1]["match"] = True
         if matched:
-            tracking_paths.remove(target_path)
-            # Might be fragile since it relies on where the loop broke:
-            if not regex_entry["mandatory"]:
-                tracking_schema.append(_regex_entry)
-            match_entry = matched.groupdict()
-            match_entry["path"] = target_path
-            match_listing.append(match_entry)
+            lgr.debug("Match identified.")
+            idx, groups = matched
+            matched_rules.add(idx)
+            match_listing.append({**groups, "path": target_path})
         else:
-            tracking_schema.append(_regex_entry)
+            unmatched_paths.append(target_path)
             lgr.debug(
                 "The `%s` file could not be matched to any regex schema entry.",
                 target_path,
             )
+    # Rules not matched by any file, recording the actual expressions we queried.
+    tracking_schema = [
+        {**regex_entry, "regex": target_regex}
+        for idx, (regex_entry, target_regex) in enumerate(zip(regex_schema, target_regexes))
+        if idx not in matched_rules
+    ]
     results = {}
-    results["itemwise"] = itemwise_results
+    results["trace"] = trace
+    if trace != "off":
+        results["itemwise"] = itemwise_results
     results["schema_tracking"] = tracking_schema
     results["schema_listing"] = regex_schema
-    results["path_tracking"] = tracking_paths
+    results["path_tracking"] = unmatched_paths
     results["path_listing"] = paths_list
     results["match_listing"] = match_listing
 
@@ -478,9 +821,9 @@ def write_report(
     ----------
     validation_result : dict
         A dictionary as returned by `validate_all()` with keys including "schema_tracking",
-        "path_tracking", "path_listing", and, optionally "itemwise".
+        "path_tracking", "path_listing", and, optionally "itemwise" and "trace".
         The "itemwise" value, if present, should be a list of dictionaries, with keys including
-        "path", "regex", and "match".
+        "path", "regex", and "match". If it is absent, only the summary is written.
     report_path : str, optional
         A path under which the report is to be saved, `datetime`, and `pid`
         are available as variables for string formatting, and will be expanded to the
@@ -508,18 +851,17 @@ def write_report(
     total_file_count = len(validation_result["path_listing"])
     validated_files_count = total_file_count - len(validation_result["path_tracking"])
     with open(report_path, "w") as f:
-        try:
-            for comparison in validation_result["itemwise"]:
-                if comparison["match"]:
-                    comparison_result = "A MATCH"
-                else:
-                    comparison_result = "no match"
-                f.write(
-                    f"- Comparing the `{comparison['path']}` path to the `{comparison['regex']}` "
-                    f"pattern resulted in {comparison_result}.\n"
-                )
-        except KeyError:
-            pass
+        for comparison in validation_result.get("itemwise", ()):
+            if comparison["match"]:
+                comparison_result = "A MATCH"
+            else:
+                comparison_result = "no match"
+            f.write(
+                f"- Comparing the `{comparison['path']}` path to the `{comparison['regex']}` "
+                f"pattern resulted in {comparison_result}.\n"
+            )
+        if validation_result.get("trace") == "off":
+            f.write("Itemwise comparisons were not recorded (trace level `off`).\n")
         f.write(
             f"\nSUMMARY:\n{validated_files_count} out of {total_file_count} files were "
             "successfully validated, using the following regular expressions:"
@@ -545,6 +887,78 @@ def write_report(
     lgr.info("BIDS validation log written to %s", report_path)
 
 
+def _select_schema(
+    in_paths,
+    dummy_paths,
+    bids_reference_root,
+    schema_path,
+    bids_version,
+    accept_non_bids_dir,
+):
+    """Select the schema path for `validate_bids()` and `iter_validate_bids()`."""
+    # Are we dealing with real paths?
+    if dummy_paths:
+        bids_root = None
+    else:
+        bids_root = _find_bids_root(in_paths, accept_non_bids_dir)
+
+    # Select schema path:
+    if not schema_path:
+        schema_path = select_schema_path(
+            bids_version,
+            bids_root,
+            bids_reference_root=bids_reference_root,
+        )
+    return schema_path
+
+
+def _manifest_key(regex_schema, matcher):
+    """Hash the regexes used for matching, which invalidate a manifest when they change."""
+    content = json.dumps([matcher.prefix, regex_schema], sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _read_manifest(manifest_path, key, paths):
+    """
+    Read the match results of paths from a manifest written by `_write_manifest()`.
+
+    Results only depend on the path strings and the regexes, so the results of all paths
+    in the manifest are reused, unless the manifest is missing, unreadable or was written
+    with different regexes.
+    """
+    try:
+        with open(manifest_path) as fobj:
+            manifest = json.load(fobj)
+        if manifest.get("format") != MANIFEST_FORMAT or manifest.get("key") != key:
+            lgr.info("Manifest %s is out of date, validating all files.", manifest_path)
+            return {}
+        files = manifest["files"]
+        paths = set(paths)
+        return {
+            path: None if matched is None else tuple(matched)
+            for path, matched in files.items()
+            if path in paths
+        }
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, AttributeError, TypeError) as e:
+        lgr.warning("Could not read manifest %s, validating all files: %s", manifest_path, e)
+        return {}
+
+
+def _write_manifest(manifest_path, key, paths, match_cache):
+    """Write the match result of each path to a manifest."""
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "key": key,
+        "files": {path: match_cache[path] for path in sorted(paths)},
+    }
+    try:
+        bst.utils.write_text_atomic(manifest_path, json.dumps(manifest))
+    except OSError as e:
+        lgr.warning("Could not write manifest %s: %s", manifest_path, e)
+
+
 def validate_bids(
     in_paths,
     dummy_paths=False,
@@ -555,6 +969,9 @@ def validate_bids(
     suppress_errors=False,
     accept_non_bids_dir=False,
     exclude_files=None,
+    max_workers=1,
+    trace=None,
+    manifest_path=None,
 ):
     """
     Validate paths according to BIDS schema.
@@ -585,6 +1002,20 @@ def validate_bids(
         standard which requires the presence of archive-specific files (e.g. DANDI requiring
         `dandiset.yaml`).
         Dot files (`.*`) do not need to be explicitly listed, as these are excluded by default.
+    max_workers : int or None, optional
+        Number of threads used to walk directories, as in `_get_paths()`. Values other than 1
+        walk subject directories concurrently, which can help on network filesystems.
+    trace : {"off", "failures", "full"} or None, optional
+        Which itemwise comparisons to record, as in `validate_all()`.
+        If None, comparisons are fully traced only if a report is written.
+    manifest_path : str, optional
+        Path to a manifest file for incremental validation.
+        If the file exists, the paths recorded in it are not matched again, but reuse the
+        recorded results, since results only depend on paths. Files are not read or stat-ed.
+        Missing mandatory files are always determined from the results for all paths.
+        The manifest is then rewritten with the current results.
+        It is disregarded if the regexes used for validation have changed.
+        Incremental validation requires real paths, not `dummy_paths`.
 
     Returns
     -------
@@ -612,25 +1043,17 @@ def validate_bids(
 
     if exclude_files is None:
         exclude_files = []
+    if manifest_path and dummy_paths:
+        raise ValueError("Incremental validation with a manifest requires real paths.")
 
     if isinstance(in_paths, str):
         in_paths = [in_paths]
 
-    # Are we dealing with real paths?
-    if dummy_paths:
-        bids_root = None
-    else:
-        bids_root = _find_bids_root(in_paths, accept_non_bids_dir)
-
-    # Select schema path:
-    if not schema_path:
-        schema_path = select_schema_path(
-            bids_version,
-            bids_root,
-            bids_reference_root=bids_reference_root,
-        )
-
+    schema_path = _select_schema(
+        in_paths, dummy_paths, bids_reference_root, schema_path, bids_version, accept_non_bids_dir
+    )
     regex_schema, my_schema = bst.rules.regexify_all(schema_path)
+    matcher = bst.rules.filename_matcher(schema_path)
     pseudofile_suffixes = _get_directory_suffixes(my_schema)
 
     # Get list of all paths since inputs can be directories.
@@ -639,14 +1062,30 @@ def validate_bids(
         dummy_paths=dummy_paths,
         pseudofile_suffixes=pseudofile_suffixes,
         exclude_files=exclude_files,
+        max_workers=max_workers,
     )
 
+    if trace is None:
+        trace = "full" if report_path else "off"
+
+    match_cache = None
+    if manifest_path:
+        manifest_key = _manifest_key(regex_schema, matcher)
+        match_cache = _read_manifest(manifest_path, manifest_key, bids_paths)
+        lgr.info("Reusing results for %d of %d files.", len(match_cache), len(bids_paths))
+
     # Go!
     validation_result = validate_all(
         bids_paths,
         regex_schema,
+        matcher=matcher,
+        trace=trace,
+        match_cache=match_cache,
     )
 
+    if manifest_path:
+        _write_manifest(manifest_path, manifest_key, bids_paths, match_cache)
+
     # Record schema version.
     validation_result["bids_version"] = my_schema["bids_version"]
 
@@ -659,3 +1098,108 @@ def validate_bids(
             write_report(validation_result)
 
     return validation_result
+
+
+def iter_validate_bids(
+    in_paths,
+    dummy_paths=False,
+    bids_reference_root=None,
+    schema_path=None,
+    bids_version=None,
+    accept_non_bids_dir=False,
+    exclude_files=None,
+    max_workers=1,
+    summary=None,
+):
+    """
+    Validate paths according to BIDS schema, yielding one result per file.
+
+    Unlike `validate_bids()`, no lists of paths or comparisons are accumulated:
+    directories are walked, and each file is matched and yielded, one at a time.
+    Memory use is therefore independent of the number of files.
+
+    Parameters
+    ----------
+    in_paths : str or list of str
+        Paths which to validate, may be individual files or directories.
+    dummy_paths, bids_reference_root, schema_path, bids_version, accept_non_bids_dir : optional
+        As in `validate_bids()`.
+    exclude_files, max_workers : optional
+        As in `validate_bids()`.
+    summary : dict, optional
+        If provided, this dictionary is updated as files are validated, with keys
+        "bids_version", "file_count" and "valid_file_count". Once the generator is exhausted,
+        "missing_mandatory" lists the mandatory regex schema entries that did not match any file.
+
+    Yields
+    ------
+    result : dict
+        A dictionary with keys "path", "match" (whether a regex schema entry matched),
+        "regex" (the pattern of the matching entry, or None) and "groups" (the named groups
+        captured by the match, or None).
+
+    Examples
+    --------
+
+    ::
+
+        from bidsschematools import validator
+        summary = {}
+        for result in validator.iter_validate_bids('~/datasets/ds000001', summary=summary):
+            if not result["match"]:
+                print(result["path"])
+        print(summary["valid_file_count"], "of", summary["file_count"], "files are valid")
+    """
+
+    if exclude_files is None:
+        exclude_files = []
+    if summary is None:
+        summary = {}
+
+    if isinstance(in_paths, str):
+        in_paths = [in_paths]
+
+    schema_path = _select_schema(
+        in_paths, dummy_paths, bids_reference_root, schema_path, bids_version, accept_non_bids_dir
+    )
+    regex_schema, my_schema = bst.rules.regexify_all(schema_path)
+    matcher = bst.rules.filename_matcher(schema_path)
+
+    summary.update(bids_version=my_schema["bids_version"], file_count=0, valid_file_count=0)
+    matched_rules = set()
+    for target_path in _iter_paths(
+        in_paths,
+        dummy_paths=dummy_paths,
+        pseudofile_suffixes=_get_directory_suffixes(my_schema),
+        exclude_files=exclude_files,
+        max_workers=max_workers,
+    ):
+        summary["file_count"] += 1
+        matched = matcher.match(target_path)
+        if matched is None:
+            lgr.warning("The `%s` file was not matched by any regex schema entry.", target_path)
+            yield {"path": target_path, "match": False, "regex": None, "groups": None}
+            continue
+        idx, groups = matched
+        summary["valid_file_count"] += 1
+        matched_rules.add(idx)
+        yield {
+            "path": target_path,
+            "match": True,
+            "regex": matcher.prefix + regex_schema[idx]["regex"],
+            "groups": groups,
+        }
+
+    summary["missing_mandatory"] = [
+        regex_entry
+        for idx, regex_entry in enumerate(regex_schema)
+        if regex_entry["mandatory"] and idx not in matched_rules
+    ]
+    if summary["valid_file_count"] == 0:
+        lgr.error("No valid BIDS files were found.")
+    else:
+        for regex_entry in summary["missing_mandatory"]:
+            lgr.error(
+                "The `%s` regex pattern file required by BIDS was not found.",
+                regex_entry["regex"],
+            )